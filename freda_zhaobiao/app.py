@@ -5,7 +5,7 @@ from flask_login import LoginManager, current_user
 from flask_caching import Cache
 from flask_wtf import CSRFProtect
 from datetime import timedelta
-from app.middleware.error_handlers import register_error_handlers, monitor_performance, handle_errors, APIResponse
+from app.middleware.error_handlers import register_error_handlers, monitor_performance, handle_errors, APIResponse, performance_monitor
 from app.middleware.security import register_security_headers, rate_limit, api_rate_limit, sanitize_params, require_content_type
 from app.utils.cache import cache_manager
 from app.services.logger_service import logger_service
@@ -60,6 +60,27 @@ def before_request():
 
 from app.models import User, Tender, CrawlerTask, Favorite, SearchHistory, SystemLog, CrawlHistory, GovernmentWebsite
 from app.routes import auth, tenders, crawler, admin, api
+from app.services.progress_service import crawl_progress_store, stream_limiter
+from app.services.task_executor import task_executor
+from app.services.fingerprint_service import fingerprint_index
+from app.services.near_duplicate_service import near_duplicate_index
+from app.services.staging_service import staging_service
+from app.services.search_service import search_service
+from app.services.search_cache import search_cache
+from app.services.facet_service import facet_service
+from app.services.suggest_service import suggest_service
+from app.services.percolator_service import percolator
+from app.utils.schema import ensure_schema
+
+crawl_progress_store.init_app(app)
+stream_limiter.init_app(app)
+task_executor.init_app(app)
+fingerprint_index.init_app(app)
+near_duplicate_index.init_app(app)
+staging_service.init_app(app)
+search_cache.init_app(app)
+facet_service.init_app(app)
+percolator.init_app(app)
 
 app.register_blueprint(auth.bp, url_prefix='/auth')
 app.register_blueprint(tenders.bp)
@@ -87,7 +108,17 @@ def health_check():
 def api_status():
     return APIResponse.success({
         'stats': cache_manager.get_stats(),
-        'performance': __import__('middleware.error_handlers', fromlist=['performance_monitor']).performance_monitor.get_stats()
+        'performance': performance_monitor.get_stats(),
+        'progress_store': crawl_progress_store.stats(),
+        'streams': stream_limiter.stats(),
+        'fingerprint_index': fingerprint_index.stats(),
+        'near_duplicate_index': near_duplicate_index.stats(),
+        'staging': staging_service.stats(),
+        'search': search_service.stats(),
+        'search_cache': search_cache.stats(),
+        'facets': facet_service.stats(),
+        'suggest': suggest_service.stats(),
+        'saved_searches': percolator.stats()
     })
 
 @app.errorhandler(404)
@@ -114,6 +145,9 @@ def internal_error(error):
 
 with app.app_context():
     db.create_all()
+    ensure_schema()
+    search_service.init_app(app)
+    suggest_service.init_app(app)
     
     admin_user = User.query.filter_by(username='admin').first()
     if not admin_user:
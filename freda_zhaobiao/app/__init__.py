@@ -18,6 +18,21 @@ csrf = CSRFProtect(app)
 
 from .models import User, Tender, CrawlerTask, Favorite, SearchHistory, SystemLog
 from .routes import auth, tenders, crawler, admin, api
+from .services.progress_service import crawl_progress_store, stream_limiter
+from .services.task_executor import task_executor
+from .services.fingerprint_service import fingerprint_index
+from .services.near_duplicate_service import near_duplicate_index
+from .services.staging_service import staging_service
+from .services.search_service import search_service
+from .services.search_cache import search_cache
+from .services.facet_service import facet_service
+from .services.suggest_service import suggest_service
+from .services.percolator_service import percolator
+from .utils.schema import ensure_schema
+
+crawl_progress_store.init_app(app)
+stream_limiter.init_app(app)
+task_executor.init_app(app)
 
 app.register_blueprint(auth.bp)
 app.register_blueprint(tenders.bp)
@@ -25,8 +40,33 @@ app.register_blueprint(crawler.bp)
 app.register_blueprint(admin.bp, url_prefix='/admin')
 app.register_blueprint(api.bp)
 
+@app.route('/api/status')
+def api_status():
+    return {
+        'progress_store': crawl_progress_store.stats(),
+        'streams': stream_limiter.stats(),
+        'fingerprint_index': fingerprint_index.stats(),
+        'near_duplicate_index': near_duplicate_index.stats(),
+        'staging': staging_service.stats(),
+        'search': search_service.stats(),
+        'search_cache': search_cache.stats(),
+        'facets': facet_service.stats(),
+        'suggest': suggest_service.stats(),
+        'saved_searches': percolator.stats()
+    }
+
 with app.app_context():
     db.create_all()
+    ensure_schema()
+
+fingerprint_index.init_app(app)
+near_duplicate_index.init_app(app)
+staging_service.init_app(app)
+search_service.init_app(app)
+search_cache.init_app(app)
+facet_service.init_app(app)
+percolator.init_app(app)
+suggest_service.init_app(app)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
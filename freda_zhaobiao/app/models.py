@@ -2,6 +2,35 @@ from datetime import datetime
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from .extensions import db
+import hashlib
+
+class BinaryDigest(db.TypeDecorator):
+    """
+    以定长二进制保存的摘要（SQLite 为 BLOB，PostgreSQL 为 bytea），
+    对外仍是十六进制字符串；不是十六进制的旧值先做一次 BLAKE2b 哈希
+    """
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def __init__(self, length=16):
+        super().__init__(length)
+        self.digest_size = length
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        try:
+            data = bytes.fromhex(value)
+        except ValueError:
+            data = b''
+        if len(data) != self.digest_size:
+            data = hashlib.blake2b(str(value).encode('utf-8'), digest_size=self.digest_size).digest()
+        return data
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return bytes(value).hex()
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -39,6 +68,9 @@ class Tender(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    source_key = db.Column(db.String(32), nullable=True, index=True)  # 站点 + 规范化地址的哈希
+    content_hash = db.Column(db.String(32), nullable=True)  # 内容字段的哈希，用于判断是否有更新
+    url_hash = db.Column(db.String(32), nullable=True, index=True)  # 规范化 source_url 的哈希，按地址查找和判重
     
     fingerprints = db.relationship('TenderFingerprint', backref='tender', lazy='dynamic')
     favorites = db.relationship('Favorite', backref='tender', lazy='dynamic')
@@ -61,9 +93,48 @@ class Tender(db.Model):
 class TenderFingerprint(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tender_id = db.Column(db.Integer, db.ForeignKey('tender.id'), nullable=False)
-    fingerprint = db.Column(db.String(64), unique=True, nullable=False)
+    fingerprint = db.Column(BinaryDigest(16), unique=True, nullable=False)  # 16 字节二进制
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TenderSignature(db.Model):
+    """招标信息的 MinHash 签名（标题 + 招标单位），用于近似重复检测"""
+    tender_id = db.Column(db.Integer, db.ForeignKey('tender.id'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+class TenderDuplicate(db.Model):
+    """其他站点转载的同一条招标信息，不单独建记录，链接到规范记录"""
+    id = db.Column(db.Integer, primary_key=True)
+    tender_id = db.Column(db.Integer, db.ForeignKey('tender.id'), nullable=False, index=True)
+    source_key = db.Column(db.String(32), nullable=True, index=True)
+    source_url = db.Column(db.String(1000), nullable=True)
+    source_website = db.Column(db.String(100), nullable=True)
+    title = db.Column(db.String(500), nullable=False)
+    similarity = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TenderStaging(db.Model):
+    """爬虫追加写入的待合并记录，只有主键索引，由后台合并到 tender"""
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON 格式的爬取结果
+    default_category = db.Column(db.String(50), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TenderStagingError(db.Model):
+    """合并时逐条重试仍然写入失败的暂存记录，移到这里后不再阻塞后面的合并"""
+    id = db.Column(db.Integer, primary_key=True)
+    staging_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    default_category = db.Column(db.String(50), nullable=True)
+    error = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class MergeWatermark(db.Model):
+    """后台合并的进度：已经合并到的暂存记录 id"""
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, default=0, nullable=False)
+    merged_total = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class CrawlerTask(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -97,6 +168,28 @@ class SearchHistory(db.Model):
     result_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class SavedSearch(db.Model):
+    """保存的搜索：新入库的招标信息写入时就与所有保存的搜索匹配，命中的记录追加到 SavedSearchMatch"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    name = db.Column(db.String(100), nullable=False)
+    keywords = db.Column(db.String(500), nullable=False)
+    category = db.Column(db.String(50), nullable=True)
+    last_seen_match_id = db.Column(db.Integer, default=0)  # 上次查看时最新的匹配 id，之后的都是新结果
+    last_viewed_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SavedSearchMatch(db.Model):
+    """保存的搜索命中的招标信息，按 id 递增追加；(saved_search_id, id) 索引上的范围查询即可得到新结果"""
+    __table_args__ = (db.Index('ix_saved_search_match_search_id', 'saved_search_id', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    saved_search_id = db.Column(db.Integer, db.ForeignKey('saved_search.id'), nullable=False)
+    tender_id = db.Column(db.Integer, db.ForeignKey('tender.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    tender = db.relationship('Tender')
+
 class SystemLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     level = db.Column(db.String(20), nullable=False)
@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from ..models import Tender, TenderFingerprint, SystemLog, GovernmentWebsite
 from ..extensions import db
+from ..utils.fingerprint import url_hash
+from ..services.ingest_service import ingest_service
+from ..services.search_cache import search_cache, search_key
 import pandas as pd
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
@@ -36,7 +39,7 @@ def admin_index():
 
 @bp.route('/tenders')
 def manage_tenders():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
     status = request.args.get('status')
     category = request.args.get('category')
@@ -47,8 +50,8 @@ def manage_tenders():
     if category:
         query = query.filter_by(category=category)
     
-    tenders = query.order_by(Tender.publish_date.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    tenders = search_cache.keyset(query, [Tender.publish_date, Tender.id], cursor, per_page,
+                                  key=search_key('admin_tenders', status=status, category=category))
     
     return render_template('admin/tenders.html', 
                          pagination=tenders,
@@ -289,17 +292,23 @@ def upload():
                 imported_count = 0
                 skipped_count = 0
                 
+                # 按规范化地址的哈希一次查出已收录的地址，文件内重复的地址也只导入一次
+                url_hashes = {url_hash(str(url).strip()) for url in df['url'] if pd.notna(url)}
+                seen_urls = ingest_service.existing_url_hashes(url_hashes)
+                
                 for _, row in df.iterrows():
                     if pd.isna(row.get('url')):
                         skipped_count += 1
                         continue
                     
                     source_url = str(row['url']).strip()
-                    existing_url = Tender.query.filter_by(source_url=source_url).first()
+                    source_hash = url_hash(source_url)
                     
-                    if existing_url:
+                    if source_hash in seen_urls:
                         skipped_count += 1
                         continue
+                    if source_hash:
+                        seen_urls.add(source_hash)
                     
                     tender = Tender(
                         title=str(row['title'])[:500] if pd.notna(row['title']) else '无标题',
@@ -1,17 +1,115 @@
-from flask import Blueprint, request, jsonify
-from ..models import Tender, TenderFingerprint
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from ..models import Tender, TenderFingerprint, SavedSearch, SavedSearchMatch
 from ..extensions import db
-import hashlib
+from ..services.crawl_item import as_dict
+from ..utils.fingerprint import tender_fingerprint
+from ..services.fingerprint_service import fingerprint_index
+from ..services.search_service import search_service
+from ..services.search_cache import search_cache, search_key
+from ..services.facet_service import facet_service
+from ..services.suggest_service import suggest_service
+from ..services.percolator_service import percolator
+from ..utils.pagination import keyset_paginate
+from ..services.progress_service import (
+    progress_events, progress_status, results_offset, results_count, changed_sites, stream_limiter, FINAL_STATUSES
+)
+import time
 import re
 
 bp = Blueprint('api', __name__)
 
-def generate_fingerprint(title, organization, publish_date):
-    content = f"{title}{organization}{publish_date}"
-    return hashlib.md5(content.encode('utf-8')).hexdigest()
+def task_summary(task_id, progress):
+    return {
+        'task_id': task_id,
+        'status': progress.get('status'),
+        'total': progress.get('total', 0),
+        'completed': progress.get('completed', 0),
+        'message': progress.get('message', ''),
+        'websites': progress.get('websites', []),
+        'current_website': progress.get('current_website'),
+        'start_time': progress.get('start_time'),
+        'elapsed_time': progress.get('elapsed_time', ''),
+        'estimated_remaining': progress.get('estimated_remaining'),
+        'estimated_completion': progress.get('estimated_completion'),
+        'progress_percentage': progress.get('progress_percentage', 0),
+        'results_count': results_count(progress),
+        'version': progress.get('version', 0)
+    }
+
+def results_preview(progress):
+    """进度响应中只带前 CRAWL_RESULTS_PREVIEW 条结果，完整结果通过预览/下载接口分页读取"""
+    results = progress.get('results', [])[:current_app.config.get('CRAWL_RESULTS_PREVIEW', 20)]
+    return [as_dict(item) for item in results]
+
+def progress_payload(task_id, progress):
+    return {
+        'task_id': task_id,
+        'status': progress.get('status'),
+        'total': progress.get('total', 0),
+        'completed': progress.get('completed', 0),
+        'message': progress.get('message', ''),
+        'websites': progress.get('websites', []),
+        'results': results_preview(progress),
+        'results_count': results_count(progress),
+        'current_website': progress.get('current_website'),
+        'start_time': progress.get('start_time'),
+        'elapsed_time': progress.get('elapsed_time', ''),
+        'estimated_remaining': progress.get('estimated_remaining'),
+        'estimated_completion': progress.get('estimated_completion'),
+        'progress_percentage': progress.get('progress_percentage', 0),
+        'saved_count': progress.get('saved_count'),
+        'skipped_count': progress.get('skipped_count'),
+        'total_in_db': progress.get('total_in_db'),
+        'version': progress.get('version', 0)
+    }
+
+def progress_delta(task_id, progress, since):
+    """since 版本之后的增量：整体状态、发生变化的网站以及预览范围内新增的结果"""
+    results = results_preview(progress)
+    offset = min(results_offset(progress, since), len(results))
+    delta = progress_status(progress)
+    delta.update({
+        'task_id': task_id,
+        'since': since,
+        'websites_changed': changed_sites(progress, since),
+        'results_offset': offset,
+        'results': results[offset:]
+    })
+    return delta
+
+def progress_etag(task_id, progress):
+    return f"{task_id}-{progress.get('version', 0)}"
+
+def sse_message(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {current_app.json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+def sse_response(generator):
+    """推送连接数达到上限时返回 503，EventSource 收到非 200 响应后不再重连，页面改用轮询"""
+    if not stream_limiter.acquire():
+        generator.close()
+        response = jsonify({'status': 'busy', 'message': '进度推送连接已满，请改用轮询'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    response = Response(
+        stream_with_context(generator),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    response.call_on_close(stream_limiter.release)
+    return response
 
 def is_duplicate(fingerprint):
-    return TenderFingerprint.query.filter_by(fingerprint=fingerprint).first() is not None
+    return fingerprint_index.contains(fingerprint)
 
 @bp.route('/api/tenders', methods=['GET'])
 def get_tenders():
@@ -22,28 +120,86 @@ def get_tenders():
     
     base_query = Tender.query.filter(Tender.status == 'active')
     
-    if query:
-        search_pattern = f'%{query}%'
-        base_query = base_query.filter(
-            db.or_(
-                Tender.title.ilike(search_pattern),
-                Tender.summary.ilike(search_pattern),
-                Tender.organization.ilike(search_pattern)
-            )
-        )
+    base_query = search_service.apply(base_query, query, sort=sort)
     
-    if sort == 'date':
-        base_query = base_query.order_by(Tender.publish_date.desc())
+    cache_key = search_key('search', query)
+    # facets 参数指定要统计的分面（逗号分隔），不传时统计全部，传空字符串时不统计
+    facets = facet_service.facets(base_query, key=cache_key, fields=facet_service.parse(request.args.get('facets')))
     
-    pagination = base_query.paginate(page=page, per_page=per_page, error_out=False)
+    # 按相关度排序或显式指定 page 时按页码分页（返回总数），否则用 (publish_date, id) 的键集游标
+    if sort == 'relevance' or 'page' in request.args:
+        if sort == 'date':
+            base_query = base_query.order_by(Tender.publish_date.desc(), Tender.id.desc())
+        pagination = search_cache.paginate(base_query, page, per_page, key=cache_key,
+                                           estimate=search_service.estimate(query), order=sort)
+        return jsonify({
+            'tenders': [t.to_dict() for t in pagination.items],
+            'total': pagination.total,
+            'total_capped': pagination.total.capped,
+            'pages': pagination.pages,
+            'current_page': pagination.page,
+            'facets': facets
+        })
     
+    pagination = search_cache.keyset(base_query, [Tender.publish_date, Tender.id], request.args.get('cursor'), per_page,
+                                     key=cache_key, count=False)
     return jsonify({
         'tenders': [t.to_dict() for t in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': pagination.page
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor,
+        'has_next': pagination.has_next,
+        'has_prev': pagination.has_prev,
+        'facets': facets
     })
 
+@bp.route('/api/suggest', methods=['GET'])
+def suggest():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'query': query,
+        'suggestions': suggest_service.suggest(query, limit)
+    })
+
+@bp.route('/api/saved-searches', methods=['GET'])
+def get_saved_searches():
+    searches = SavedSearch.query.order_by(SavedSearch.created_at.desc()).all()
+    new_counts = percolator.new_counts(searches)
+    return jsonify({
+        'saved_searches': [
+            {
+                'id': search.id,
+                'name': search.name,
+                'keywords': search.keywords,
+                'category': search.category,
+                'new_count': new_counts[search.id],
+                'last_viewed_at': search.last_viewed_at.isoformat() if search.last_viewed_at else None
+            }
+            for search in searches
+        ]
+    })
+
+@bp.route('/api/saved-searches/<int:search_id>/results', methods=['GET'])
+def get_saved_search_results(search_id):
+    """保存的搜索的结果，最新命中的在前；new=true 时只返回上次查看之后的新结果，mark_seen=true 时更新查看位置"""
+    search = SavedSearch.query.get_or_404(search_id)
+    per_page = request.args.get('per_page', 20, type=int)
+    query = percolator.results(search)
+    if request.args.get('new', 'false').lower() == 'true':
+        query = query.filter(SavedSearchMatch.id > (search.last_seen_match_id or 0))
+    pagination = keyset_paginate(query, [SavedSearchMatch.id], request.args.get('cursor'), per_page)
+    response = {
+        'tenders': [match.tender.to_dict() for match in pagination.items],
+        'new_count': percolator.new_count(search),
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor,
+        'has_next': pagination.has_next,
+        'has_prev': pagination.has_prev
+    }
+    if request.args.get('mark_seen', 'false').lower() == 'true':
+        percolator.mark_seen(search)
+    return jsonify(response)
+
 @bp.route('/api/tenders/<int:tender_id>', methods=['GET'])
 def get_tender(tender_id):
     tender = Tender.query.get_or_404(tender_id)
@@ -56,10 +212,10 @@ def create_tender():
     if not data:
         return jsonify({'error': '无效的数据'}), 400
     
-    fingerprint = generate_fingerprint(
+    fingerprint = tender_fingerprint(
         data.get('title', ''),
         data.get('organization', ''),
-        str(data.get('publish_date', ''))
+        data.get('publish_date', '')
     )
     
     if is_duplicate(fingerprint):
@@ -153,59 +309,192 @@ def get_stats():
 @bp.route('/crawl/tasks', methods=['GET'])
 def get_all_crawl_tasks():
     from .tenders import crawl_progress_store
-    import uuid
     
-    tasks = []
-    for task_id, progress in crawl_progress_store.items():
-        task_info = {
-            'task_id': task_id,
-            'status': progress.get('status'),
-            'total': progress.get('total', 0),
-            'completed': progress.get('completed', 0),
-            'message': progress.get('message', ''),
-            'websites': progress.get('websites', []),
-            'current_website': progress.get('current_website'),
-            'start_time': progress.get('start_time'),
-            'elapsed_time': progress.get('elapsed_time', ''),
-            'estimated_remaining': progress.get('estimated_remaining'),
-            'estimated_completion': progress.get('estimated_completion'),
-            'progress_percentage': progress.get('progress_percentage', 0),
-            'results_count': len(progress.get('results', []))
-        }
-        tasks.append(task_info)
+    since = request.args.get('since', type=int)
+    entries = list(crawl_progress_store.items())
+    version = max((progress.get('version', 0) for _, progress in entries), default=0)
+    
+    if since is not None:
+        if since >= version:
+            return '', 304
+        entries = [(task_id, progress) for task_id, progress in entries if progress.get('version', 0) > since]
+    
+    tasks = [task_summary(task_id, progress) for task_id, progress in entries]
     
     return jsonify({
         'count': len(tasks),
-        'tasks': tasks
+        'tasks': tasks,
+        'version': version,
+        'since': since
     })
 
+@bp.route('/crawl/tasks/stream', methods=['GET'])
+def stream_all_crawl_tasks():
+    """SSE：连接时推送全部任务概要，之后只推送发生变化的任务"""
+    from .tenders import crawl_progress_store
+    
+    heartbeat = current_app.config.get('CRAWL_STREAM_HEARTBEAT', 15)
+    max_seconds = current_app.config.get('CRAWL_STREAM_MAX_SECONDS', 300)
+    remote_poll = current_app.config.get('CRAWL_PROGRESS_REMOTE_POLL', 1)
+    
+    def remote_changes(seen):
+        """共享后端中由其他进程执行、版本发生变化的任务"""
+        changed = []
+        for task_id, version in crawl_progress_store.backend.versions().items():
+            if seen.get(task_id) != version and not crawl_progress_store.is_local(task_id):
+                changed.append(task_id)
+            seen[task_id] = version
+        return changed
+    
+    def generate():
+        last_id = progress_events.last_event_id
+        tasks = [task_summary(task_id, progress) for task_id, progress in list(crawl_progress_store.items())]
+        seen = {task['task_id']: task['version'] for task in tasks}
+        yield 'retry: 3000\n\n'
+        yield sse_message('tasks', {'count': len(tasks), 'tasks': tasks}, last_id)
+        
+        deadline = time.time() + max_seconds
+        last_sent = time.time()
+        while time.time() < deadline:
+            wait = min(heartbeat, remote_poll) if crawl_progress_store.shared else heartbeat
+            last_id, changed = progress_events.wait_for_any(last_id, wait)
+            if crawl_progress_store.shared:
+                changed = changed + remote_changes(seen)
+            if not changed:
+                if time.time() - last_sent >= heartbeat:
+                    last_sent = time.time()
+                    yield ': keep-alive\n\n'
+                continue
+            for task_id in changed:
+                progress = crawl_progress_store.get(task_id)
+                if progress is not None:
+                    last_sent = time.time()
+                    yield sse_message('task', task_summary(task_id, progress), last_id)
+    
+    return sse_response(generate())
+
 @bp.route('/crawl/progress/<task_id>', methods=['GET'])
 def get_crawl_progress(task_id):
     from .tenders import crawl_progress_store
     
     if task_id in crawl_progress_store:
         progress = crawl_progress_store[task_id]
+        etag = progress_etag(task_id, progress)
+        since = request.args.get('since', type=int)
+        
+        if request.if_none_match.contains(etag) or (since is not None and since >= progress.get('version', 0)):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        
+        if since is not None:
+            response = jsonify(progress_delta(task_id, progress, since))
+        else:
+            response = jsonify(progress_payload(task_id, progress))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    else:
         return jsonify({
             'task_id': task_id,
-            'status': progress.get('status'),
-            'total': progress.get('total', 0),
-            'completed': progress.get('completed', 0),
-            'message': progress.get('message', ''),
-            'websites': progress.get('websites', []),
-            'results': progress.get('results', []),
-            'current_website': progress.get('current_website'),
-            'start_time': progress.get('start_time'),
-            'elapsed_time': progress.get('elapsed_time', ''),
-            'estimated_remaining': progress.get('estimated_remaining'),
-            'estimated_completion': progress.get('estimated_completion'),
-            'progress_percentage': progress.get('progress_percentage', 0)
-        })
-    else:
+            'status': 'not_found',
+            'message': '未找到该爬取任务'
+        }), 404
+
+@bp.route('/crawl/stream/<task_id>', methods=['GET'])
+def stream_crawl_progress(task_id):
+    """
+    SSE：推送单个爬取任务的进度增量
+    首次连接发送完整快照，之后发送 site / results / status 事件；
+    断线重连时根据 Last-Event-ID 补发遗漏的事件
+    """
+    from .tenders import crawl_progress_store
+    
+    if task_id not in crawl_progress_store:
         return jsonify({
             'task_id': task_id,
             'status': 'not_found',
             'message': '未找到该爬取任务'
         }), 404
+    
+    heartbeat = current_app.config.get('CRAWL_STREAM_HEARTBEAT', 15)
+    max_seconds = current_app.config.get('CRAWL_STREAM_MAX_SECONDS', 300)
+    remote_poll = current_app.config.get('CRAWL_PROGRESS_REMOTE_POLL', 1)
+    resume_from = request.headers.get('Last-Event-ID', type=int)
+    
+    if not crawl_progress_store.is_local(task_id):
+        return sse_response(remote_snapshots(task_id, heartbeat, max_seconds, remote_poll))
+    
+    def snapshot():
+        last_id = progress_events.last_event_id
+        progress = crawl_progress_store.get(task_id)
+        if progress is None:
+            return last_id, None
+        return last_id, progress_payload(task_id, progress)
+    
+    def generate():
+        yield 'retry: 3000\n\n'
+        
+        last_id = resume_from
+        events = progress_events.events_since(task_id, last_id) if last_id is not None else None
+        if events is None:
+            last_id, payload = snapshot()
+            if payload is None:
+                return
+            yield sse_message('snapshot', payload, last_id)
+            if payload['status'] in FINAL_STATUSES:
+                return
+        
+        deadline = time.time() + max_seconds
+        while time.time() < deadline:
+            if events is None:
+                events = progress_events.wait_for_task(task_id, last_id, heartbeat)
+            if events is None:
+                last_id, payload = snapshot()
+                if payload is None:
+                    return
+                yield sse_message('snapshot', payload, last_id)
+                if payload['status'] in FINAL_STATUSES:
+                    return
+            elif not events:
+                if task_id not in crawl_progress_store:
+                    return
+                yield ': keep-alive\n\n'
+            else:
+                for event_id, event, data in events:
+                    last_id = event_id
+                    yield sse_message(event, data, event_id)
+                    if event == 'status' and data.get('status') in FINAL_STATUSES:
+                        return
+            events = None
+    
+    return sse_response(generate())
+
+def remote_snapshots(task_id, heartbeat, max_seconds, poll):
+    """
+    任务由其他进程执行时，本进程收不到它的进度事件，
+    改为定期读取共享后端，版本变化时推送完整快照
+    """
+    from .tenders import crawl_progress_store
+    
+    yield 'retry: 3000\n\n'
+    version = None
+    deadline = time.time() + max_seconds
+    last_sent = time.time()
+    while time.time() < deadline:
+        progress = crawl_progress_store.get(task_id)
+        if progress is None:
+            return
+        if progress.get('version', 0) != version:
+            version = progress.get('version', 0)
+            last_sent = time.time()
+            yield sse_message('snapshot', progress_payload(task_id, progress))
+            if progress.get('status') in FINAL_STATUSES:
+                return
+        elif time.time() - last_sent >= heartbeat:
+            last_sent = time.time()
+            yield ': keep-alive\n\n'
+        time.sleep(poll)
 
 @bp.route('/crawl/preview/<task_id>', methods=['GET'])
 def preview_crawl_results(task_id):
@@ -226,11 +515,16 @@ def preview_crawl_results(task_id):
             'html': '<div class="preview-empty"><div class="empty-icon">📭</div><p>暂无爬取结果</p></div>'
         })
     
+    total = len(results)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    start = (page - 1) * per_page
+    
     html = '<div class="preview-container">'
-    html += f'<div class="preview-header"><h3>共 {len(results)} 条招标信息</h3></div>'
+    html += f'<div class="preview-header"><h3>共 {total} 条招标信息</h3></div>'
     html += '<div class="preview-list">'
     
-    for i, result in enumerate(results[:20]):
+    for i, result in enumerate(results[start:start + per_page]):
         title = result.get('title', '未知标题')
         organization = result.get('organization', '未知单位')
         publish_date = result.get('publish_date', '未知日期')
@@ -257,22 +551,26 @@ def preview_crawl_results(task_id):
             </div>
         '''
     
-    if len(results) > 20:
-        html += f'<div class="preview-more">... 还有 {len(results) - 20} 条结果未显示，点击下载查看全部</div>'
+    if total > start + per_page:
+        html += f'<div class="preview-more">... 还有 {total - start - per_page} 条结果未显示，点击下载查看全部</div>'
     
     html += '</div></div>'
     
     return jsonify({
         'has_results': True,
         'html': html,
-        'total_count': len(results)
+        'total_count': total,
+        'page': page,
+        'per_page': per_page
     })
 
 @bp.route('/crawl/download/<task_id>', methods=['GET'])
 def download_crawl_results(task_id):
+    """按页读取结果写入只写模式的工作簿，结果再多也不会一次性载入内存"""
     from .tenders import crawl_progress_store
     from flask import make_response
-    import pandas as pd
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
     from io import BytesIO
     from datetime import datetime
     
@@ -285,12 +583,7 @@ def download_crawl_results(task_id):
     if not results:
         return jsonify({'error': '暂无爬取结果'}), 404
     
-    df = pd.DataFrame(results)
-    
     columns_order = ['title', 'publish_date', 'organization', 'amount', 'location', 'category', 'summary', 'source_url', 'source_website']
-    available_columns = [col for col in columns_order if col in df.columns]
-    df = df[available_columns]
-    
     column_names = {
         'title': '招标标题',
         'publish_date': '发布日期',
@@ -302,27 +595,25 @@ def download_crawl_results(task_id):
         'source_url': '原文链接',
         'source_website': '来源网站'
     }
-    df = df.rename(columns=column_names)
     
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='招标信息')
-        
-        workbook = writer.book
-        worksheet = writer.sheets['招标信息']
-        
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+    # 列宽需要在写入数据前确定，按前 200 条估算
+    sample = results[:200]
+    available_columns = [col for col in columns_order if any(col in item for item in sample)]
+    
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('招标信息')
+    for index, col in enumerate(available_columns, start=1):
+        max_length = max([len(column_names[col])] + [len(str(item.get(col, ''))) for item in sample])
+        worksheet.column_dimensions[get_column_letter(index)].width = min(max_length + 2, 50)
     
+    worksheet.append([column_names[col] for col in available_columns])
+    page_size = 500
+    for offset in range(0, len(results), page_size):
+        for item in results[offset:offset + page_size]:
+            worksheet.append([item.get(col) for col in available_columns])
+    
+    output = BytesIO()
+    workbook.save(output)
     output.seek(0)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -2,22 +2,13 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from ..models import CrawlerTask, CrawlHistory
 from ..extensions import db
 from ..services.crawler_service import CrawlerService
-from apscheduler.schedulers.background import BackgroundScheduler
+from ..services.task_executor import task_executor
+from ..utils.pagination import keyset_paginate
 from datetime import datetime
 import uuid
 
 bp = Blueprint('crawler', __name__)
 
-scheduler = BackgroundScheduler()
-scheduler.start()
-
-def run_crawler_task(task_id):
-    with scheduler.app.app_context():
-        task = CrawlerTask.query.get(task_id)
-        if task:
-            service = CrawlerService()
-            service.run_task(task)
-
 @bp.route('/')
 def crawler_index():
     tasks = CrawlerTask.query.order_by(CrawlerTask.created_at.desc()).all()
@@ -51,7 +42,7 @@ def create_task():
         if 'start_now' in request.form:
             task.status = 'running'
             db.session.commit()
-            scheduler.add_job(run_crawler_task, args=[task.id], id=str(task.id))
+            task_executor.submit(task)
         
         flash('爬虫任务创建成功', 'success')
         return redirect(url_for('crawler.crawler_index'))
@@ -70,14 +61,16 @@ def task_detail(task_id):
 def start_task(task_id):
     task = CrawlerTask.query.get_or_404(task_id)
     
-    if task.status == 'running':
+    if task.status == 'running' and task_executor.is_running(task.id):
         return jsonify({'message': '任务已在运行中'}), 200
     
     task.status = 'running'
     db.session.commit()
-    
-    scheduler.add_job(run_crawler_task, args=[task.id], id=str(task.id), replace_existing=True)
-    
+
+    if not task_executor.submit(task):
+        # 停止后正在执行的单元尚未结束，上一次执行结束时会把状态改回 stopped
+        return jsonify({'message': '上一次执行尚未结束，请稍后再启动'}), 409
+
     return jsonify({'message': '任务已启动'})
 
 @bp.route('/<int:task_id>/stop', methods=['POST'])
@@ -87,10 +80,7 @@ def stop_task(task_id):
     task.status = 'stopped'
     db.session.commit()
     
-    try:
-        scheduler.remove_job(str(task_id))
-    except:
-        pass
+    task_executor.cancel(task_id)
     
     return jsonify({'message': '任务已停止'})
 
@@ -98,10 +88,7 @@ def stop_task(task_id):
 def delete_task(task_id):
     task = CrawlerTask.query.get_or_404(task_id)
     
-    try:
-        scheduler.remove_job(str(task_id))
-    except:
-        pass
+    task_executor.cancel(task_id)
     
     CrawlHistory.query.filter_by(task_id=task_id).delete()
     db.session.delete(task)
@@ -119,14 +106,16 @@ def run_now(task_id):
     flash('爬虫任务执行完成', 'success')
     return redirect(url_for('crawler.task_detail', task_id=task_id))
 
+@bp.route('/executor/stats')
+def executor_stats():
+    return jsonify(task_executor.stats())
+
 @bp.route('/history')
 def crawl_history():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
     
-    pagination = CrawlHistory.query\
-        .order_by(CrawlHistory.start_time.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    pagination = keyset_paginate(CrawlHistory.query, [CrawlHistory.start_time, CrawlHistory.id], cursor, per_page)
     
     return render_template('crawler/history.html', 
                          histories=pagination.items, 
@@ -1,8 +1,17 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
-from ..models import Tender, TenderFingerprint, Favorite, SearchHistory, GovernmentWebsite
+from ..models import Tender, Favorite, SearchHistory, GovernmentWebsite, SavedSearch, SavedSearchMatch
 from ..extensions import db
-from ..utils import save_search_history, get_search_history
-from ..services.crawler_service import CrawlerService
+from ..utils import save_search_history, get_search_history, update_search_history
+from ..utils.pagination import keyset_paginate
+from ..services.progress_service import progress_events, progress_status, mark_results, crawl_progress_store
+from ..services.result_spool import ResultSpool
+from ..services.crawl_item import CrawlItem, as_dict
+from ..services.ingest_service import ingest_service
+from ..services.staging_service import staging_service
+from ..services.search_service import search_service
+from ..services.search_cache import search_cache, search_key
+from ..services.facet_service import facet_service
+from ..services.percolator_service import percolator
 from datetime import datetime, timedelta
 import requests
 from bs4 import BeautifulSoup
@@ -11,87 +20,60 @@ import logging
 import uuid
 from threading import Thread
 from flask import Flask
-from werkzeug.security import generate_password_hash
 
 logger = logging.getLogger(__name__)
 
-crawl_progress_store = {}
-
-def generate_fingerprint(title, publish_date, source_url):
-    """生成招标信息的唯一指纹"""
-    content = f"{title or ''}_{publish_date or ''}_{source_url or ''}"
-    return generate_password_hash(content)[:64]
+def publish_site(task_id, idx):
+    """推送单个网站的状态变化，并更新网站和任务的版本号"""
+    progress = crawl_progress_store[task_id]
+    
+    def build(version):
+        site = progress['websites'][idx]
+        site['version'] = version
+        progress['version'] = version
+        return {'index': idx, 'site': site}
+    
+    progress_events.publish(task_id, 'site', build)
 
-def save_tenders_to_db(results, query, category=None):
+def publish_results(task_id, offset, items):
     """
-    将爬取的招标信息保存到数据库
-    返回: 保存成功的数量
+    推送新的一批结果，并记录该版本对应的结果位置
+    客户端只保留预览，超出预览范围的结果不再随事件推送
     """
-    saved_count = 0
-    skipped_count = 0
+    progress = crawl_progress_store[task_id]
+    preview_size = current_app.config.get('CRAWL_RESULTS_PREVIEW', 20)
+    items = [as_dict(item) for item in items[:max(0, preview_size - offset)]]
     
-    for item in results:
-        try:
-            title = item.get('title', '').strip()
-            if not title or len(title) < 5:
-                continue
-            
-            fingerprint = generate_fingerprint(
-                item.get('title'),
-                str(item.get('publish_date', '')),
-                item.get('source_url', '')
-            )
-            
-            existing = TenderFingerprint.query.filter_by(fingerprint=fingerprint).first()
-            if existing:
-                skipped_count += 1
-                continue
-            
-            publish_date = item.get('publish_date')
-            if isinstance(publish_date, str):
-                try:
-                    publish_date = datetime.strptime(publish_date, '%Y-%m-%d').date()
-                except ValueError:
-                    publish_date = datetime.now().date()
-            elif not publish_date:
-                publish_date = datetime.now().date()
-            
-            tender = Tender(
-                title=title,
-                publish_date=publish_date,
-                organization=item.get('organization'),
-                location=item.get('location'),
-                summary=item.get('summary', '')[:500],
-                content=item.get('content'),
-                source_url=item.get('source_url'),
-                source_website=item.get('source_website'),
-                category=item.get('category') or category or 'other',
-                status='active',
-                view_count=0
-            )
-            
-            db.session.add(tender)
-            db.session.flush()
-            
-            tender_fingerprint = TenderFingerprint(
-                tender_id=tender.id,
-                fingerprint=fingerprint
-            )
-            db.session.add(tender_fingerprint)
-            
-            saved_count += 1
-            
-        except Exception as e:
-            logger.error(f"保存招标信息失败: {str(e)}")
-            continue
+    def build(version):
+        mark_results(progress, version)
+        progress['version'] = version
+        return {'offset': offset, 'items': items}
     
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"提交数据库事务失败: {str(e)}")
+    progress_events.publish(task_id, 'results', build)
+
+def publish_status(task_id):
+    """推送任务整体状态（不含结果列表），并更新任务的版本号"""
+    progress = crawl_progress_store[task_id]
+    
+    def build(version):
+        progress['version'] = version
+        return progress_status(progress)
     
-    return saved_count, skipped_count
+    progress_events.publish(task_id, 'status', build)
+
+def save_tenders_to_db(results, query, category=None):
+    """
+    将爬取的招标信息保存到数据库
+    按批判重并批量写入，每批提交一次；已有记录内容有变化时更新
+    开启暂存写入时只追加到暂存表
+    返回: (新增和更新的数量（暂存时为写入暂存表的数量）, 重复或未变化跳过的数量)
+    """
+    items = (item for item in results if len((item.get('title') or '').strip()) >= 5)
+    if staging_service.enabled:
+        # 先写入暂存表，由后台合并，判重结果在合并时统计
+        return staging_service.append(items, default_category=category or 'other'), 0
+    result = ingest_service.ingest(items, default_category=category or 'other')
+    return result['added'] + result['updated'], result['skipped']
 
 def start_crawl_task(task_id, query, category):
     """
@@ -120,13 +102,20 @@ def start_crawl_task(task_id, query, category):
                     'estimated_remaining': None,
                     'progress_percentage': 0
                 }
+                publish_status(task_id)
                 return
             
+            results = ResultSpool.for_task(
+                app.config.get('CRAWL_RESULTS_DIR', 'data/crawl_results'),
+                task_id,
+                app.config.get('CRAWL_RESULTS_PREVIEW', 20),
+                item_type=CrawlItem
+            )
             crawl_progress_store[task_id].update({
                 'status': 'running',
                 'total': len(websites),
                 'completed': 0,
-                'results': [],
+                'results': results,
                 'message': f'开始爬取 {len(websites)} 个政府网站...',
                 'websites': [{'name': w.name, 'url': w.website, 'status': 'pending'} for w in websites],
                 'current_website': None,
@@ -137,8 +126,8 @@ def start_crawl_task(task_id, query, category):
                 'estimated_remaining': len(websites) * 3,
                 'progress_percentage': 0
             })
+            publish_status(task_id)
             
-            results = []
             start_time = datetime.now()
             successful_crawls = 0
             failed_crawls = 0
@@ -156,17 +145,21 @@ def start_crawl_task(task_id, query, category):
                     'start_datetime': website_start_time.isoformat()
                 }
                 crawl_progress_store[task_id]['message'] = f'正在爬取: {website.name} ({idx + 1}/{len(websites)})'
+                publish_site(task_id, idx)
+                publish_status(task_id)
                 
                 try:
                     website_results = crawl_single_website_fast(website, query, category)
                     crawl_progress_store[task_id]['websites'][idx]['status'] = 'completed'
                     crawl_progress_store[task_id]['websites'][idx]['completed_at'] = datetime.now().isoformat()
                     crawl_progress_store[task_id]['websites'][idx]['found'] = len(website_results)
-                    crawl_progress_store[task_id]['websites'][idx]['results'] = website_results[:5]
                     crawl_progress_store[task_id]['websites'][idx]['duration'] = round((datetime.now() - website_start_time).total_seconds(), 1)
                     successful_crawls += 1
                     
+                    offset = len(results)
                     results.extend(website_results)
+                    if website_results:
+                        publish_results(task_id, offset, website_results)
                     
                 except Exception as e:
                     crawl_progress_store[task_id]['websites'][idx]['status'] = 'failed'
@@ -176,6 +169,7 @@ def start_crawl_task(task_id, query, category):
                     failed_crawls += 1
                     logger.error(f"爬取网站 {website.name} 失败: {str(e)}")
                 
+                publish_site(task_id, idx)
                 crawl_progress_store[task_id]['completed'] = idx + 1
                 
                 elapsed_seconds = int((datetime.now() - start_time).total_seconds())
@@ -209,9 +203,9 @@ def start_crawl_task(task_id, query, category):
                 crawl_progress_store[task_id]['estimated_completion'] = estimated_completion_time
                 crawl_progress_store[task_id]['progress_percentage'] = round(progress_percentage, 1)
                 crawl_progress_store[task_id]['message'] = f'已完成 {idx + 1}/{len(websites)} 个网站 (成功{successful_crawls}, 失败{failed_crawls})，预计还需 {estimated_formatted}'
+                publish_status(task_id)
             
             crawl_progress_store[task_id]['status'] = 'completed'
-            crawl_progress_store[task_id]['results'] = results
             crawl_progress_store[task_id]['current_website'] = None
             crawl_progress_store[task_id]['estimated_completion'] = datetime.now().strftime('%H:%M:%S')
             crawl_progress_store[task_id]['progress_percentage'] = 100
@@ -228,6 +222,7 @@ def start_crawl_task(task_id, query, category):
                 update_search_history(history_id, total_results)
             
             crawl_progress_store[task_id]['message'] = f'爬取完成，共找到 {len(results)} 条招标信息，保存 {saved_count} 条 (重复跳过 {skipped_count} 条)，耗时 {crawl_progress_store[task_id]["elapsed_time"]} (成功{successful_crawls}, 失败{failed_crawls}个网站)'
+            publish_status(task_id)
             
         except Exception as e:
             logger.error(f"爬取任务出错: {str(e)}")
@@ -238,6 +233,7 @@ def start_crawl_task(task_id, query, category):
                 'current_website': None,
                 'progress_percentage': 0
             }
+            publish_status(task_id)
 
 def crawl_websites_for_query(query, category=None):
     """
@@ -305,12 +301,11 @@ def crawl_single_website(website, query, category=None):
                     items = extract_tender_items(soup, base_url)
                     
                     for item in items:
-                        if category and item.get('category') != category:
+                        if category and item.category != category:
                             continue
-                        if query.lower() not in item.get('title', '').lower():
+                        if query.lower() not in item.title.lower():
                             continue
-                        item['source_website'] = website.name
-                        item['website_url'] = website.website
+                        item.set_site(website.name, website.website)
                         results.append(item)
                     
                     break
@@ -370,11 +365,9 @@ def crawl_single_website_fast(website, query, category=None):
                     items = extract_tender_items(soup, base_url)
                     
                     for item in items:
-                        title = item.get('title', '')
-                        if query and query.lower() not in title.lower():
+                        if query and query.lower() not in item.title.lower():
                             continue
-                        item['source_website'] = website.name
-                        item['website_url'] = website.website
+                        item.set_site(website.name, website.website)
                         results.append(item)
                     
                     if results:
@@ -467,13 +460,13 @@ def extract_tender_items(soup, base_url):
                 if len(summary) > 200:
                     summary = summary[:200] + '...'
                 
-                item = {
-                    'title': title,
-                    'publish_date': publish_date,
-                    'source_url': link,
-                    'summary': summary,
-                    'category': extract_category(container),
-                }
+                item = CrawlItem(
+                    title=title,
+                    publish_date=publish_date,
+                    source_url=link,
+                    summary=summary,
+                    category=extract_category(container)
+                )
                 
                 items.append(item)
                 
@@ -551,6 +544,7 @@ def index():
 def search():
     query = request.args.get('q', '').strip()
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
     sort = request.args.get('sort', 'date')
     category = request.args.get('category', '')
@@ -565,15 +559,7 @@ def search():
     
     base_query = Tender.query.filter(Tender.status == 'active')
     
-    if query:
-        search_pattern = f'%{query}%'
-        base_query = base_query.filter(
-            db.or_(
-                Tender.title.ilike(search_pattern),
-                Tender.summary.ilike(search_pattern),
-                Tender.organization.ilike(search_pattern)
-            )
-        )
+    base_query = search_service.apply(base_query, query, sort=sort)
     
     if category:
         base_query = base_query.filter(Tender.category == category)
@@ -592,14 +578,7 @@ def search():
         except ValueError:
             pass
     
-    if sort == 'date':
-        base_query = base_query.order_by(Tender.publish_date.desc())
-    elif sort == 'relevance':
-        pass
-    
-    pagination = base_query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    if page == 1 and crawl:
+    if page == 1 and not cursor and crawl:
         task_id = str(uuid.uuid4())
         
         websites = GovernmentWebsite.query.filter_by(status='active').all()
@@ -640,11 +619,24 @@ def search():
                              task_id=task_id,
                              crawling=True)
     
+    # 总数和每页结果按查询条件缓存，有招标信息入库后失效；结果很多时总数只显示 "10,000+"
+    cache_key = search_key('search', query, category=category, date_from=date_from, date_to=date_to)
+    estimate = search_service.estimate(query)
+    
+    # 按相关度排序时结果按得分排列，只能按页码翻页；按时间排序时用 (publish_date, id) 的键集游标
+    if sort == 'relevance':
+        pagination = search_cache.paginate(base_query, page, per_page, key=cache_key, estimate=estimate, order=sort)
+    else:
+        pagination = search_cache.keyset(base_query, [Tender.publish_date, Tender.id], cursor, per_page,
+                                         key=cache_key, estimate=estimate)
+    facets = facet_service.facets(base_query, key=cache_key)
+    
     update_search_history(history_id, pagination.total)
     
     return render_template('search.html', 
                          tenders=pagination.items, 
                          pagination=pagination,
+                         facets=facets,
                          query=query,
                          sort=sort,
                          category=category,
@@ -672,15 +664,46 @@ def favorites():
 
 @bp.route('/history')
 def search_history():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
     
-    query = SearchHistory.query
-    histories = query.order_by(SearchHistory.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    histories = keyset_paginate(SearchHistory.query, [SearchHistory.created_at, SearchHistory.id], cursor, per_page)
     return render_template('history.html', histories=histories)
 
+@bp.route('/saved-searches')
+def saved_searches():
+    searches = SavedSearch.query.order_by(SavedSearch.created_at.desc()).all()
+    new_counts = percolator.new_counts(searches)
+    return render_template('saved_searches.html', searches=searches, new_counts=new_counts)
+
+@bp.route('/saved-searches', methods=['POST'])
+def create_saved_search():
+    keywords = request.form.get('q', '').strip()
+    if not keywords:
+        flash('请输入要保存的关键词', 'error')
+        return redirect(url_for('tenders.saved_searches'))
+    search = percolator.create(request.form.get('name', '').strip(), keywords, request.form.get('category', ''))
+    flash(f'已保存搜索"{search.name}"，之后入库的匹配信息会自动加入结果', 'success')
+    return redirect(url_for('tenders.saved_search', search_id=search.id))
+
+@bp.route('/saved-searches/<int:search_id>')
+def saved_search(search_id):
+    search = SavedSearch.query.get_or_404(search_id)
+    cursor = request.args.get('cursor')
+    # 匹配 id 大于上次查看位置的是新结果；查看第一页后更新查看位置
+    last_seen = search.last_seen_match_id or 0
+    matches = keyset_paginate(percolator.results(search), [SavedSearchMatch.id], cursor, 20)
+    if not cursor:
+        percolator.mark_seen(search)
+    return render_template('saved_search.html', search=search, matches=matches, last_seen=last_seen)
+
+@bp.route('/saved-searches/<int:search_id>/delete', methods=['POST'])
+def delete_saved_search(search_id):
+    search = SavedSearch.query.get_or_404(search_id)
+    percolator.delete(search)
+    flash('已删除保存的搜索', 'success')
+    return redirect(url_for('tenders.saved_searches'))
+
 @bp.route('/history/delete/<int:history_id>', methods=['POST'])
 def delete_history(history_id):
     from ..utils import delete_search_history
@@ -735,6 +758,7 @@ def save_crawl_results():
         task_data['saved_count'] = saved_count
         task_data['skipped_count'] = skipped_count
         task_data['total_in_db'] = total_in_db
+        publish_status(task_id)
         
         return jsonify({
             'status': 'success',
@@ -760,14 +784,7 @@ def export_data():
     
     base_query = Tender.query.filter(Tender.status == 'active')
     
-    if query:
-        search_pattern = f'%{query}%'
-        base_query = base_query.filter(
-            db.or_(
-                Tender.title.ilike(search_pattern),
-                Tender.summary.ilike(search_pattern)
-            )
-        )
+    base_query = search_service.apply(base_query, query, fields=('title', 'summary'))
     
     if date_from:
         try:
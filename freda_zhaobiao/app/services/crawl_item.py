@@ -0,0 +1,110 @@
+from datetime import date, datetime
+import threading
+
+# 分类代码表：条目中只保存下标，多个条目共享同一个分类字符串
+CATEGORY_CODES = ['engineering', 'goods', 'services', 'procurement', 'bidding', 'result', 'modification', 'other']
+_category_index = {code: index for index, code in enumerate(CATEGORY_CODES)}
+_category_lock = threading.Lock()
+
+# 来源网站表：同一网站的条目共享同一个 (名称, 网址) 元组
+_sites = {}
+
+def category_code(category):
+    """返回分类的下标，未知分类追加到代码表"""
+    if category is None:
+        return None
+    code = _category_index.get(category)
+    if code is None:
+        with _category_lock:
+            code = _category_index.get(category)
+            if code is None:
+                code = len(CATEGORY_CODES)
+                CATEGORY_CODES.append(category)
+                _category_index[category] = code
+    return code
+
+def intern_site(name, url):
+    key = (name, url)
+    return _sites.setdefault(key, key)
+
+class CrawlItem:
+    """
+    爬取得到的单条招标信息
+    使用 __slots__ 存储，来源网站和分类在所有条目之间共享，
+    只在写入 JSON（结果文件、接口响应）时才转换为字典；
+    提供 get() 和下标访问，可以直接交给按字典读取字段的代码
+    """
+    __slots__ = ('title', 'publish_date', 'source_url', 'summary', 'organization',
+                 'location', 'amount', 'content', '_category', '_site')
+
+    FIELDS = ('title', 'publish_date', 'organization', 'amount', 'location', 'category',
+              'summary', 'content', 'source_url', 'source_website', 'website_url')
+
+    def __init__(self, title, publish_date=None, source_url=None, summary=None, category=None,
+                 organization=None, location=None, amount=None, content=None,
+                 source_website=None, website_url=None):
+        self.title = title
+        self.publish_date = publish_date
+        self.source_url = source_url
+        self.summary = summary
+        self.organization = organization
+        self.location = location
+        self.amount = amount
+        self.content = content
+        self._category = category_code(category)
+        self._site = intern_site(source_website, website_url) if source_website or website_url else None
+
+    @property
+    def category(self):
+        return CATEGORY_CODES[self._category] if self._category is not None else None
+
+    @category.setter
+    def category(self, value):
+        self._category = category_code(value)
+
+    @property
+    def source_website(self):
+        return self._site[0] if self._site else None
+
+    @property
+    def website_url(self):
+        return self._site[1] if self._site else None
+
+    def set_site(self, name, url):
+        self._site = intern_site(name, url)
+
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS and getattr(self, key) is not None
+
+    def to_dict(self):
+        data = {}
+        for key in self.FIELDS:
+            value = getattr(self, key)
+            if value is None:
+                continue
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            data[key] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: data.get(key) for key in cls.FIELDS})
+
+    def __repr__(self):
+        return f'<CrawlItem {self.title!r}>'
+
+def as_dict(item):
+    """JSON 边界：把 CrawlItem 转换为字典，字典原样返回"""
+    return item.to_dict() if isinstance(item, CrawlItem) else item
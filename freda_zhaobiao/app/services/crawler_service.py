@@ -1,8 +1,10 @@
 import requests
 from bs4 import BeautifulSoup
-from ..models import Tender, TenderFingerprint, CrawlHistory
+from ..models import CrawlHistory
 from ..extensions import db
-import hashlib
+from .fingerprint_service import fingerprint_index
+from .ingest_service import ingest_service
+from .staging_service import staging_service
 import re
 from datetime import datetime, date
 import time
@@ -23,14 +25,11 @@ class CrawlerService:
         self.added = 0
         self.updated = 0
         self.skipped = 0
+        self.staged = 0
         self.errors = []
     
-    def generate_fingerprint(self, title, organization, publish_date):
-        content = f"{title}{organization}{str(publish_date)}"
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
-    
     def is_duplicate(self, fingerprint):
-        return TenderFingerprint.query.filter_by(fingerprint=fingerprint).first() is not None
+        return fingerprint_index.contains(fingerprint)
     
     def parse_date(self, date_str):
         if not date_str:
@@ -66,28 +65,42 @@ class CrawlerService:
         self.added = 0
         self.updated = 0
         self.skipped = 0
+        self.staged = 0
         self.errors = []
+        self.rows = []
         
         parsed_url = urlparse(website)
         base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
         
         if 'chinabidding.cn' in parsed_url.netloc:
-            self._crawl_chinabidding(website, keywords)
+            self._crawl_chinabidding(website, keywords, base_url)
         elif 'ccgp.gov.cn' in parsed_url.netloc:
-            self._crawl_ccgp(website, keywords)
+            self._crawl_ccgp(website, keywords, base_url)
         elif 'cpir.cn' in parsed_url.netloc:
-            self._crawl_cpir(website, keywords)
+            self._crawl_cpir(website, keywords, base_url)
         else:
             self._crawl_generic(website, keywords)
         
+        # 解析出的记录统一批量判重、写入；开启暂存写入时只追加到暂存表，由后台合并
+        if staging_service.enabled:
+            self.staged += staging_service.append(self.rows, default_category=category, commit=False)
+        else:
+            result = ingest_service.ingest(self.rows, default_category=category, commit=False)
+            self.added += result['added']
+            self.updated += result['updated']
+            self.skipped += result['skipped']
+            self.errors.extend(result['errors'])
+        self.rows = []
+        
         return {
             'added': self.added,
             'updated': self.updated,
             'skipped': self.skipped,
+            'staged': self.staged,
             'errors': self.errors
         }
     
-    def _crawl_chinabidding(self, url, keywords):
+    def _crawl_chinabidding(self, url, keywords, base_url):
         search_url = url
         if keywords:
             search_url = f"{url}/search?keyword={keywords}"
@@ -101,7 +114,7 @@ class CrawlerService:
                     
                     for item in items:
                         try:
-                            self._parse_chinabidding_item(item, base_url)
+                            self._collect(self._parse_chinabidding_item(item, base_url))
                         except Exception as e:
                             self.errors.append(str(e))
                     
@@ -114,7 +127,7 @@ class CrawlerService:
         
         time.sleep(self.request_delay)
     
-    def _crawl_ccgp(self, url, keywords):
+    def _crawl_ccgp(self, url, keywords, base_url):
         search_url = url
         if keywords:
             search_url = f"{url}?keyword={keywords}"
@@ -128,7 +141,7 @@ class CrawlerService:
                     
                     for item in items:
                         try:
-                            self._parse_ccgp_item(item, base_url)
+                            self._collect(self._parse_ccgp_item(item, base_url))
                         except Exception as e:
                             self.errors.append(str(e))
                     
@@ -141,7 +154,7 @@ class CrawlerService:
         
         time.sleep(self.request_delay)
     
-    def _crawl_cpir(self, url, keywords):
+    def _crawl_cpir(self, url, keywords, base_url):
         search_url = url
         if keywords:
             search_url = f"{url}?keywords={keywords}"
@@ -155,7 +168,7 @@ class CrawlerService:
                     
                     for item in items:
                         try:
-                            self._parse_cpir_item(item, base_url)
+                            self._collect(self._parse_cpir_item(item, base_url))
                         except Exception as e:
                             self.errors.append(str(e))
                     
@@ -177,7 +190,7 @@ class CrawlerService:
                     
                     for tag in soup.find_all(['li', 'tr'], class_=re.compile(r'news|tender|bid|article', re.I)):
                         try:
-                            self._parse_generic_item(tag, url)
+                            self._collect(self._parse_generic_item(tag, url))
                         except Exception as e:
                             self.errors.append(str(e))
                     
@@ -190,6 +203,10 @@ class CrawlerService:
         
         time.sleep(self.request_delay)
     
+    def _collect(self, row):
+        if row:
+            self.rows.append(row)
+    
     def _parse_chinabidding_item(self, item, base_url):
         title_elem = item.select_one('a, .title')
         date_elem = item.select_one('.date, .time, span:last-child')
@@ -207,27 +224,13 @@ class CrawlerService:
         
         publish_date = self.parse_date(date_elem.get_text() if date_elem else None)
         
-        fingerprint = self.generate_fingerprint(title, None, publish_date)
-        
-        if self.is_duplicate(fingerprint):
-            self.skipped += 1
-            return
-        
-        tender = Tender(
-            title=title,
-            publish_date=publish_date,
-            source_url=link,
-            source_website='中国采购与招标网',
-            summary=self.clean_text(item.get_text()[:200])
-        )
-        
-        db.session.add(tender)
-        db.session.flush()
-        
-        fp = TenderFingerprint(tender_id=tender.id, fingerprint=fingerprint)
-        db.session.add(fp)
-        
-        self.added += 1
+        return {
+            'title': title,
+            'publish_date': publish_date,
+            'source_url': link,
+            'source_website': '中国采购与招标网',
+            'summary': self.clean_text(item.get_text()[:200])
+        }
     
     def _parse_ccgp_item(self, item, base_url):
         title_elem = item.select_one('a, .title')
@@ -246,27 +249,13 @@ class CrawlerService:
         
         publish_date = self.parse_date(date_elem.get_text() if date_elem else None)
         
-        fingerprint = self.generate_fingerprint(title, None, publish_date)
-        
-        if self.is_duplicate(fingerprint):
-            self.skipped += 1
-            return
-        
-        tender = Tender(
-            title=title,
-            publish_date=publish_date,
-            source_url=link,
-            source_website='中国政府采购网',
-            summary=self.clean_text(item.get_text()[:200])
-        )
-        
-        db.session.add(tender)
-        db.session.flush()
-        
-        fp = TenderFingerprint(tender_id=tender.id, fingerprint=fingerprint)
-        db.session.add(fp)
-        
-        self.added += 1
+        return {
+            'title': title,
+            'publish_date': publish_date,
+            'source_url': link,
+            'source_website': '中国政府采购网',
+            'summary': self.clean_text(item.get_text()[:200])
+        }
     
     def _parse_cpir_item(self, item, base_url):
         title_elem = item.select_one('a')
@@ -282,27 +271,13 @@ class CrawlerService:
         if link and not link.startswith('http'):
             link = urljoin(base_url, link)
         
-        fingerprint = self.generate_fingerprint(title, None, date.today())
-        
-        if self.is_duplicate(fingerprint):
-            self.skipped += 1
-            return
-        
-        tender = Tender(
-            title=title,
-            publish_date=date.today(),
-            source_url=link,
-            source_website='中国招标投标公共服务平台',
-            summary=self.clean_text(item.get_text()[:200])
-        )
-        
-        db.session.add(tender)
-        db.session.flush()
-        
-        fp = TenderFingerprint(tender_id=tender.id, fingerprint=fingerprint)
-        db.session.add(fp)
-        
-        self.added += 1
+        return {
+            'title': title,
+            'publish_date': date.today(),
+            'source_url': link,
+            'source_website': '中国招标投标公共服务平台',
+            'summary': self.clean_text(item.get_text()[:200])
+        }
     
     def _parse_generic_item(self, item, base_url):
         title_elem = item.select_one('a')
@@ -318,28 +293,14 @@ class CrawlerService:
         if link and not link.startswith('http'):
             link = urljoin(base_url, link)
         
-        fingerprint = self.generate_fingerprint(title, None, date.today())
-        
-        if self.is_duplicate(fingerprint):
-            self.skipped += 1
-            return
-        
-        tender = Tender(
-            title=title,
-            publish_date=date.today(),
-            source_url=link,
-            summary=self.clean_text(item.get_text()[:200])
-        )
-        
-        db.session.add(tender)
-        db.session.flush()
-        
-        fp = TenderFingerprint(tender_id=tender.id, fingerprint=fingerprint)
-        db.session.add(fp)
-        
-        self.added += 1
+        return {
+            'title': title,
+            'publish_date': date.today(),
+            'source_url': link,
+            'summary': self.clean_text(item.get_text()[:200])
+        }
     
-    def run_task(self, task):
+    def start_history(self, task):
         history = CrawlHistory(
             task_id=task.id,
             status='running',
@@ -347,6 +308,42 @@ class CrawlerService:
         )
         db.session.add(history)
         db.session.commit()
+        return history
+    
+    def finish_history(self, history, task, result):
+        added = result.get('added', 0)
+        updated = result.get('updated', 0)
+        skipped = result.get('skipped', 0)
+        staged = result.get('staged', 0)
+        errors = result.get('errors', [])
+        
+        history.status = 'completed'
+        history.end_time = datetime.now()
+        history.items_found = added + updated + skipped + staged
+        history.items_added = added
+        history.items_updated = updated
+        history.items_skipped = skipped
+        history.error_message = '\n'.join(errors[:10]) if errors else None
+        
+        task.last_crawl_time = datetime.now()
+        task.next_crawl_time = datetime.now()
+        task.total_crawled += added
+        task.success_count += added
+        task.error_count += len(errors)
+        
+        db.session.commit()
+    
+    def fail_history(self, history, task, error):
+        history.status = 'failed'
+        history.end_time = datetime.now()
+        history.error_message = str(error)
+        
+        task.status = 'error'
+        
+        db.session.commit()
+    
+    def run_task(self, task):
+        history = self.start_history(task)
         
         try:
             result = self.crawl_website(
@@ -355,27 +352,7 @@ class CrawlerService:
                 task.category,
                 task.region
             )
-            
-            history.status = 'completed'
-            history.end_time = datetime.now()
-            history.items_found = self.added + self.skipped
-            history.items_added = self.added
-            history.items_skipped = self.skipped
-            history.error_message = '\n'.join(self.errors[:10]) if self.errors else None
-            
-            task.last_crawl_time = datetime.now()
-            task.next_crawl_time = datetime.now()
-            task.total_crawled += self.added
-            task.success_count += self.added
-            task.error_count += len(self.errors)
-            
-            db.session.commit()
+            self.finish_history(history, task, result)
             
         except Exception as e:
-            history.status = 'failed'
-            history.end_time = datetime.now()
-            history.error_message = str(e)
-            
-            task.status = 'error'
-            
-            db.session.commit()
+            self.fail_history(history, task, e)
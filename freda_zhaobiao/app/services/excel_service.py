@@ -1,7 +1,8 @@
 import pandas as pd
 from ..models import Tender, TenderFingerprint
 from ..extensions import db
-import hashlib
+from ..utils.fingerprint import tender_fingerprint
+from .fingerprint_service import fingerprint_index
 import re
 from datetime import datetime
 import os
@@ -14,17 +15,15 @@ class ExcelService:
         self.duplicates = 0
         self.errors = 0
         self.error_details = []
+        # 本次导入已加入会话的指纹：指纹在 flush 之后才进入指纹索引，文件中重复的行需要在这里判重
+        self.seen = set()
     
     def allowed_file(self, filename):
         return '.' in filename and \
             filename.rsplit('.', 1)[1].lower() in self.ALLOWED_EXTENSIONS
     
-    def generate_fingerprint(self, title, organization, publish_date):
-        content = f"{title}{organization}{str(publish_date)}"
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
-    
     def is_duplicate(self, fingerprint):
-        return TenderFingerprint.query.filter_by(fingerprint=fingerprint).first() is not None
+        return fingerprint in self.seen or fingerprint_index.contains(fingerprint)
     
     def parse_date(self, date_value):
         if isinstance(date_value, datetime):
@@ -49,6 +48,7 @@ class ExcelService:
         self.duplicates = 0
         self.errors = 0
         self.error_details = []
+        self.seen = set()
         
         try:
             ext = os.path.splitext(filepath)[1].lower()
@@ -167,7 +167,7 @@ class ExcelService:
                     category = self.clean_text(row[col])
                     break
         
-        fingerprint = self.generate_fingerprint(title, organization, publish_date)
+        fingerprint = tender_fingerprint(title, organization, publish_date)
         
         if self.is_duplicate(fingerprint):
             self.duplicates += 1
@@ -187,5 +187,6 @@ class ExcelService:
         
         fp = TenderFingerprint(tender_id=tender.id, fingerprint=fingerprint)
         db.session.add(fp)
+        self.seen.add(fingerprint)
         
         self.added += 1
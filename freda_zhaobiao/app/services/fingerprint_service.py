@@ -0,0 +1,313 @@
+from ..models import Tender, TenderFingerprint, TenderDuplicate, Favorite
+from ..extensions import db
+from sqlalchemy import text
+from ..utils.fingerprint import fingerprint_of
+import threading
+import hashlib
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+class FingerprintService:
+    # 合并重复记录时，保留记录中为空的字段从重复记录补齐
+    MERGE_FIELDS = ('organization', 'location', 'summary', 'content', 'source_url', 'source_website', 'category')
+
+    def rebuild(self, batch_size=500, dry_run=False):
+        """
+        按 id 分批重新计算所有招标信息的指纹
+        指纹相同的记录合并到 id 最小的一条（补齐空字段、累加浏览量、迁移收藏）
+        dry_run 时只统计，不写入数据库
+        """
+        stats = {'scanned': 0, 'fingerprints': 0, 'merged': 0}
+        seen = {}
+        last_id = 0
+
+        while True:
+            tenders = Tender.query.filter(Tender.id > last_id)\
+                .order_by(Tender.id)\
+                .limit(batch_size).all()
+            if not tenders:
+                break
+            last_id = tenders[-1].id
+
+            computed = [(tender, fingerprint_of(tender)) for tender in tenders]
+            new_fingerprints = [fp for _, fp in computed]
+
+            # 先删除本批记录的旧指纹，以及后面批次中已经使用新指纹的行（它们稍后会作为重复记录合并）；
+            # 前面批次中已写入的规范记录的指纹保留
+            canonical_ids = {seen[fp] for fp in new_fingerprints if fp in seen}
+            TenderFingerprint.query.filter(
+                db.or_(
+                    TenderFingerprint.tender_id.in_([tender.id for tender in tenders]),
+                    db.and_(
+                        TenderFingerprint.fingerprint.in_(new_fingerprints),
+                        TenderFingerprint.tender_id.notin_(canonical_ids)
+                    )
+                )
+            ).delete(synchronize_session=False)
+
+            for tender, fp in computed:
+                stats['scanned'] += 1
+                canonical_id = seen.get(fp)
+                if canonical_id is None:
+                    seen[fp] = tender.id
+                    db.session.add(TenderFingerprint(tender_id=tender.id, fingerprint=fp))
+                    stats['fingerprints'] += 1
+                else:
+                    self._merge(db.session.get(Tender, canonical_id), tender)
+                    stats['merged'] += 1
+
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            db.session.expunge_all()
+            logger.info(f"指纹重建进度: 已处理 {stats['scanned']} 条，合并 {stats['merged']} 条")
+
+        return stats
+
+    def convert_to_binary(self, batch_size=5000):
+        """
+        把以十六进制文本保存的指纹转换为 16 字节二进制
+        - SQLite：按 id 分批改写仍是文本的值
+        - PostgreSQL：一次性把列类型改为 bytea
+        不是 32 位十六进制的旧格式指纹先按原值哈希成 16 字节，转换后再重建指纹（重新计算并合并重复）
+        """
+        stats = {'converted': 0, 'legacy': 0, 'rebuilt': False}
+        dialect = db.engine.dialect.name
+        column_type = TenderFingerprint.__table__.c.fingerprint.type
+
+        if dialect == 'postgresql':
+            data_type = db.session.execute(text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'tender_fingerprint' AND column_name = 'fingerprint'"
+            )).scalar()
+            if data_type != 'bytea':
+                stats['converted'] = db.session.query(TenderFingerprint.id).count()
+                stats['legacy'] = db.session.execute(text(
+                    "SELECT count(*) FROM tender_fingerprint WHERE fingerprint !~ '^[0-9a-f]{32}$'"
+                )).scalar()
+                db.session.execute(text(
+                    "ALTER TABLE tender_fingerprint ALTER COLUMN fingerprint TYPE bytea USING "
+                    "CASE WHEN fingerprint ~ '^[0-9a-f]{32}$' THEN decode(fingerprint, 'hex') "
+                    "ELSE substring(sha256(convert_to(fingerprint, 'UTF8')) from 1 for 16) END"
+                ))
+                db.session.commit()
+        else:
+            last_id = 0
+            while True:
+                rows = db.session.execute(text(
+                    "SELECT id, fingerprint, typeof(fingerprint) FROM tender_fingerprint "
+                    "WHERE id > :last_id ORDER BY id LIMIT :limit"
+                ), {'last_id': last_id, 'limit': batch_size}).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                values = []
+                for row_id, value, storage in rows:
+                    if storage != 'text':
+                        continue
+                    if len(value) != 32:
+                        stats['legacy'] += 1
+                    values.append({'id': row_id, 'fingerprint': column_type.process_bind_param(value, db.engine.dialect)})
+                if values:
+                    db.session.execute(text("UPDATE tender_fingerprint SET fingerprint = :fingerprint WHERE id = :id"), values)
+                    stats['converted'] += len(values)
+                db.session.commit()
+                logger.info(f"指纹转换进度: 已处理到 id {last_id}，转换 {stats['converted']} 个")
+
+        if stats['legacy']:
+            logger.info(f"有 {stats['legacy']} 个旧格式指纹，重新计算所有指纹")
+            self.rebuild(batch_size=min(batch_size, 500))
+            stats['rebuilt'] = True
+        return stats
+
+    def _merge(self, canonical, duplicate):
+        for field in self.MERGE_FIELDS:
+            if not getattr(canonical, field) and getattr(duplicate, field):
+                setattr(canonical, field, getattr(duplicate, field))
+        canonical.view_count = (canonical.view_count or 0) + (duplicate.view_count or 0)
+
+        for favorite in Favorite.query.filter_by(tender_id=duplicate.id).all():
+            exists = Favorite.query.filter_by(user_id=favorite.user_id, tender_id=canonical.id).first()
+            if exists:
+                db.session.delete(favorite)
+            else:
+                favorite.tender_id = canonical.id
+
+        # 重复记录的转载改为链接到保留的记录；签名随重复记录一起删除（见 near_duplicate_service）
+        TenderDuplicate.query.filter_by(tender_id=duplicate.id)\
+            .update({'tender_id': canonical.id}, synchronize_session=False)
+        TenderFingerprint.query.filter_by(tender_id=duplicate.id).delete(synchronize_session=False)
+        db.session.delete(duplicate)
+
+fingerprint_service = FingerprintService()
+
+class BloomFilter:
+    """定长位数组 + k 个哈希位置（双重哈希），指纹本身已是均匀哈希，直接切分使用"""
+    def __init__(self, capacity, fp_rate=0.01):
+        self.capacity = max(int(capacity), 1000)
+        self.fp_rate = fp_rate
+        self.size = max(int(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, fingerprint):
+        try:
+            value = int(fingerprint[:32], 16)
+        except ValueError:
+            # 旧格式的指纹不是十六进制，先哈希一次
+            value = int.from_bytes(hashlib.blake2b(fingerprint.encode('utf-8'), digest_size=16).digest(), 'big')
+        h1 = value >> 64
+        h2 = (value & 0xFFFFFFFFFFFFFFFF) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, fingerprint):
+        for pos in self._positions(fingerprint):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, fingerprint):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fingerprint))
+
+    def expected_fp_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+class FingerprintIndex:
+    """
+    进程内的指纹索引
+    - 启动时从 TenderFingerprint 加载到 Bloom 过滤器，之后插入的指纹同步加入
+    - 过滤器判定不存在的指纹直接视为新记录，不查询数据库
+    - 可能存在的指纹合并成一次 IN 查询做精确确认
+    - 定期按 id 增量加载其他进程插入的指纹
+    """
+    def __init__(self, fp_rate=0.01, catch_up_interval=5, lookup_chunk=500):
+        self.fp_rate = fp_rate
+        self.catch_up_interval = catch_up_interval
+        self.lookup_chunk = lookup_chunk
+
+        self._bloom = None
+        self._needs_rebuild = False
+        self._last_id = 0
+        self._last_catch_up = 0
+        self._lock = threading.RLock()
+
+        self.lookups = 0
+        self.definite_negatives = 0
+        self.possible_hits = 0
+        self.confirmed = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+
+    def init_app(self, app):
+        self.fp_rate = app.config.get('FINGERPRINT_BLOOM_FP_RATE', self.fp_rate)
+        self.catch_up_interval = app.config.get('FINGERPRINT_INDEX_CATCH_UP', self.catch_up_interval)
+        if not db.event.contains(TenderFingerprint, 'after_insert', self._after_insert):
+            db.event.listen(TenderFingerprint, 'after_insert', self._after_insert)
+        try:
+            with app.app_context():
+                self.load()
+        except Exception as e:
+            # 表还不存在等情况下，第一次查询时再加载
+            logger.warning(f"启动时加载指纹索引失败: {str(e)}")
+
+    def _after_insert(self, mapper, connection, target):
+        self.add([target.fingerprint])
+
+    def add(self, fingerprints):
+        """把新插入的指纹加入索引（不经过 ORM 插入时需要手动调用）"""
+        with self._lock:
+            if self._bloom is None:
+                return
+            for fingerprint in fingerprints:
+                self._add(fingerprint)
+
+    def _add(self, fingerprint):
+        self._bloom.add(fingerprint)
+        if self._bloom.count > self._bloom.capacity:
+            # 超出容量后误判率上升，下次查询时按更大容量重建
+            self._needs_rebuild = True
+
+    def load(self):
+        """从数据库全量加载指纹"""
+        with self._lock:
+            total = TenderFingerprint.query.count()
+            bloom = BloomFilter(total * 2, self.fp_rate)
+            last_id = 0
+            rows = db.session.query(TenderFingerprint.id, TenderFingerprint.fingerprint)\
+                .order_by(TenderFingerprint.id).yield_per(5000)
+            for row_id, fingerprint in rows:
+                bloom.add(fingerprint)
+                last_id = row_id
+            self._bloom = bloom
+            self._needs_rebuild = False
+            self._last_id = last_id
+            self._last_catch_up = time.time()
+            self.rebuilds += 1
+            logger.info(f"指纹索引已加载: {bloom.count} 个指纹, {len(bloom.bits) / 1024:.1f} KB")
+
+    def _ensure_current(self):
+        if self._bloom is None or self._needs_rebuild:
+            self.load()
+        elif time.time() - self._last_catch_up > self.catch_up_interval:
+            rows = db.session.query(TenderFingerprint.id, TenderFingerprint.fingerprint)\
+                .filter(TenderFingerprint.id > self._last_id)\
+                .order_by(TenderFingerprint.id).all()
+            for row_id, fingerprint in rows:
+                self._add(fingerprint)
+                self._last_id = row_id
+            self._last_catch_up = time.time()
+
+    def filter_existing(self, fingerprints):
+        """返回 fingerprints 中已经存在于数据库的指纹集合"""
+        fingerprints = set(fingerprints)
+        with self._lock:
+            self._ensure_current()
+            candidates = [fp for fp in fingerprints if fp in self._bloom]
+            self.lookups += len(fingerprints)
+            self.definite_negatives += len(fingerprints) - len(candidates)
+            self.possible_hits += len(candidates)
+
+        existing = set()
+        for start in range(0, len(candidates), self.lookup_chunk):
+            chunk = candidates[start:start + self.lookup_chunk]
+            existing.update(
+                fp for (fp,) in db.session.query(TenderFingerprint.fingerprint)
+                .filter(TenderFingerprint.fingerprint.in_(chunk))
+            )
+
+        with self._lock:
+            self.confirmed += len(existing)
+            self.false_positives += len(candidates) - len(existing)
+        return existing
+
+    def contains(self, fingerprint):
+        return fingerprint in self.filter_existing([fingerprint])
+
+    def stats(self):
+        with self._lock:
+            bloom = self._bloom
+            negatives = self.definite_negatives + self.false_positives
+            return {
+                'loaded': bloom is not None,
+                'fingerprints': bloom.count if bloom else 0,
+                'capacity': bloom.capacity if bloom else 0,
+                'bits': bloom.size if bloom else 0,
+                'hashes': bloom.hashes if bloom else 0,
+                'memory_bytes': len(bloom.bits) if bloom else 0,
+                'target_fp_rate': self.fp_rate,
+                'expected_fp_rate': round(bloom.expected_fp_rate(), 6) if bloom else 0,
+                'observed_fp_rate': round(self.false_positives / negatives, 6) if negatives else 0,
+                'lookups': self.lookups,
+                'db_skipped': self.definite_negatives,
+                'db_checked': self.possible_hits,
+                'confirmed': self.confirmed,
+                'false_positives': self.false_positives,
+                'rebuilds': self.rebuilds
+            }
+
+fingerprint_index = FingerprintIndex()
@@ -0,0 +1,364 @@
+from ..models import Tender, TenderFingerprint, TenderSignature, TenderDuplicate
+from ..extensions import db
+from ..utils.fingerprint import tender_fingerprint, source_key, content_hash, url_hash
+from .fingerprint_service import fingerprint_index
+from .near_duplicate_service import near_duplicate_index
+from .percolator_service import percolator
+from .search_service import search_service
+from sqlalchemy import insert, update, bindparam
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date
+from itertools import islice
+import logging
+
+logger = logging.getLogger(__name__)
+
+TENDER_FIELDS = (
+    'title', 'publish_date', 'organization', 'location', 'summary', 'content',
+    'source_url', 'source_website', 'category', 'status', 'view_count'
+)
+
+# 重新爬取到已有记录时更新的字段（状态和浏览量由站内维护，不被覆盖）
+UPDATE_FIELDS = (
+    'title', 'publish_date', 'organization', 'location', 'summary', 'content',
+    'source_url', 'source_website', 'category'
+)
+
+def iter_batches(items, size):
+    """把可迭代对象按 size 条一组切分"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+@db.event.listens_for(Tender, 'before_insert')
+@db.event.listens_for(Tender, 'before_update')
+def _fill_url_hash(mapper, connection, target):
+    """通过 ORM 写入的记录（后台编辑、接口、Excel 导入）同样维护地址哈希"""
+    target.url_hash = url_hash(target.source_url)
+
+class IngestService:
+    """
+    批量写入招标信息
+    - 每批先按来源标识（站点 + 规范化地址）一次查出已有记录，比较内容哈希区分新增、未变化和有更新
+    - 新记录再通过指纹索引判重（只有可能重复的指纹合并成一次 IN 查询），
+      并用 MinHash LSH 查找其他站点转载的近似重复，转载链接到规范记录而不新建
+    - 招标信息用一条多行 INSERT ... RETURNING 写入并取回 id，指纹用 executemany 写入
+    - 数据库不支持批量 RETURNING 时退回到 ORM 批量 flush
+    同时适用于 SQLite（3.35+）和 PostgreSQL
+    """
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+
+    def prepare(self, item):
+        """把一条结果规范化为 Tender 的字段，缺少标题时返回 None"""
+        row = {field: item.get(field) for field in TENDER_FIELDS}
+        if not row['title']:
+            return None
+        row['title'] = str(row['title']).strip()[:500]
+        publish_date = row['publish_date']
+        if isinstance(publish_date, datetime):
+            publish_date = publish_date.date()
+        elif isinstance(publish_date, str):
+            try:
+                publish_date = datetime.strptime(publish_date.strip(), '%Y-%m-%d').date()
+            except ValueError:
+                publish_date = None
+        row['publish_date'] = publish_date if isinstance(publish_date, date) else date.today()
+        row['status'] = row['status'] or 'active'
+        row['view_count'] = row['view_count'] or 0
+        return row
+
+    def ingest(self, items, default_category=None, commit=True):
+        """
+        写入多条结果，返回总计和每批的新增/更新/跳过数量
+        items 可以是字典、CrawlItem 或其他提供 get() 的对象；
+        每批在一个保存点中写入，某一批失败时只回滚该批的保存点并记录错误，继续处理后面的批次；
+        失败批次中的原始结果放在 failed 中，调用方可以逐条重试。
+        commit=False 时由调用方提交，前面已写入但未提交的批次不受失败批次影响
+        """
+        result = {'added': 0, 'updated': 0, 'skipped': 0, 'linked': 0, 'batches': [], 'errors': [], 'failed': []}
+
+        for batch in iter_batches(items, self.batch_size):
+            rows = []
+            prepared = []
+            for item in batch:
+                row = self.prepare(item)
+                if row is None:
+                    result['skipped'] += 1
+                    continue
+                if default_category and not row['category']:
+                    row['category'] = default_category
+                rows.append(row)
+                prepared.append(item)
+
+            try:
+                with db.session.begin_nested():
+                    stats = self.ingest_batch(rows)
+                if commit:
+                    db.session.commit()
+            except Exception as e:
+                # 失败批次的写入已随保存点回滚；不提交时不能回滚整个事务，否则会丢掉前面批次的写入
+                if commit:
+                    db.session.rollback()
+                logger.error(f"批量写入招标信息失败: {str(e)}")
+                result['errors'].append(str(e))
+                result['failed'].extend(prepared)
+                continue
+
+            result['added'] += stats['added']
+            result['updated'] += stats['updated']
+            result['skipped'] += stats['skipped']
+            result['linked'] += stats['linked']
+            result['batches'].append(stats)
+
+        return result
+
+    def ingest_batch(self, rows):
+        """
+        写入一批已规范化的记录，返回 {'added': n, 'updated': n, 'skipped': n, 'linked': n}
+        - 来源标识已存在且内容哈希相同：未变化，不写数据库
+        - 来源标识已存在但内容哈希不同：批量更新该记录
+        - 其他记录按指纹判重后批量插入，近似重复的转载计入 skipped 和 linked
+        """
+        for row in rows:
+            row['source_key'] = source_key(row['source_url'], row['source_website'])
+            row['content_hash'] = content_hash(row)
+            row['url_hash'] = url_hash(row['source_url'])
+        fingerprints = [
+            tender_fingerprint(row['title'], row['organization'], row['publish_date'])
+            for row in rows
+        ]
+        existing = fingerprint_index.filter_existing(fingerprints)
+
+        try:
+            with db.session.begin_nested():
+                return self._apply(rows, fingerprints, existing)
+        except IntegrityError:
+            # 其他进程刚刚写入了相同的指纹：跳过索引直接查询数据库后重试一次
+            logger.info("批量写入遇到重复指纹，重新判重后重试")
+            existing = self._query_existing(fingerprints)
+            with db.session.begin_nested():
+                return self._apply(rows, fingerprints, existing)
+
+    def _query_existing(self, fingerprints):
+        return {
+            fp for (fp,) in db.session.query(TenderFingerprint.fingerprint)
+            .filter(TenderFingerprint.fingerprint.in_(set(fingerprints)))
+        }
+
+    def existing_url_hashes(self, hashes, chunk_size=500):
+        """返回 hashes 中已有招标信息使用的地址哈希集合（按块做 IN 查询）"""
+        hashes = [h for h in hashes if h]
+        existing = set()
+        for start in range(0, len(hashes), chunk_size):
+            existing.update(
+                h for (h,) in db.session.query(Tender.url_hash)
+                .filter(Tender.url_hash.in_(hashes[start:start + chunk_size]))
+            )
+        return existing
+
+    def _known_sources(self, keys):
+        """
+        按来源标识查出已有记录：{source_key: (id, content_hash, organization)}
+        已链接为转载的来源记为 {source_key: None}
+        """
+        known = {}
+        if not keys:
+            return known
+        for (key,) in db.session.query(TenderDuplicate.source_key).filter(TenderDuplicate.source_key.in_(keys)):
+            known[key] = None
+        rows = db.session.query(Tender.source_key, Tender.id, Tender.content_hash, Tender.organization)\
+            .filter(Tender.source_key.in_(keys))\
+            .order_by(Tender.id.desc())
+        for key, tender_id, digest, organization in rows:
+            # 历史数据中同一来源有多条时，以 id 最小的一条为准
+            known[key] = (tender_id, digest, organization)
+        return known
+
+    def _apply(self, rows, fingerprints, existing):
+        known = self._known_sources({row['source_key'] for row in rows if row['source_key']})
+        stats = {'added': 0, 'updated': 0, 'skipped': 0, 'linked': 0}
+        changes = {}
+        new_rows = []
+        new_fingerprints = []
+        seen_fingerprints = set(existing)
+        seen_urls = self.existing_url_hashes({row['url_hash'] for row in rows})
+        seen_keys = set()
+
+        for row, fp in zip(rows, fingerprints):
+            key = row['source_key']
+            if key in seen_keys:
+                # 同一批中重复出现的来源只处理第一条
+                stats['skipped'] += 1
+                continue
+            if key:
+                seen_keys.add(key)
+
+            current = known.get(key)
+            if key in known and current is None:
+                # 已经链接到规范记录的转载
+                stats['skipped'] += 1
+            elif current is None:
+                if fp in seen_fingerprints or row['url_hash'] in seen_urls:
+                    # 指纹相同，或同一地址已经以其他站点名称收录
+                    stats['skipped'] += 1
+                    continue
+                seen_fingerprints.add(fp)
+                if row['url_hash']:
+                    seen_urls.add(row['url_hash'])
+                new_rows.append(row)
+                new_fingerprints.append(fp)
+            elif current[1] == row['content_hash']:
+                stats['skipped'] += 1
+            else:
+                changes[current[0]] = (row, current[2])
+
+        if new_rows:
+            stats['added'], stats['linked'] = self._insert_new(new_rows, new_fingerprints)
+            stats['skipped'] += stats['linked']
+
+        if changes:
+            self._update_tenders(changes)
+            stats['updated'] = len(changes)
+
+        return stats
+
+    def _insert_new(self, rows, fingerprints):
+        """
+        插入新记录；与已有记录或本批前面的记录近似重复（标题中的数字也相同）的不插入，
+        记为转载并链接到规范记录。返回 (新增数量, 链接数量)
+        """
+        signatures = near_duplicate_index.signatures(rows)
+        matches = near_duplicate_index.match(rows, signatures)
+        kept = [j for j, match in enumerate(matches) if match is None]
+
+        ids = self._insert_tenders([rows[j] for j in kept]) if kept else []
+        tender_ids = dict(zip(kept, ids))
+        if kept:
+            db.session.execute(
+                insert(TenderFingerprint),
+                [{'tender_id': tender_ids[j], 'fingerprint': fingerprints[j]} for j in kept]
+            )
+            fingerprint_index.add([fingerprints[j] for j in kept])
+            if signatures is not None:
+                db.session.execute(
+                    insert(TenderSignature),
+                    [{'tender_id': tender_ids[j], 'signature': signatures[j].tobytes()} for j in kept]
+                )
+                near_duplicate_index.add(ids, [signatures[j] for j in kept])
+
+        links = [
+            {
+                'tender_id': tender_id if tender_id is not None else tender_ids[other],
+                'source_key': rows[j]['source_key'],
+                'source_url': rows[j]['source_url'],
+                'source_website': rows[j]['source_website'],
+                'title': rows[j]['title'],
+                'similarity': round(score, 4)
+            }
+            for j, match in enumerate(matches) if match is not None
+            for tender_id, other, score in [match]
+        ]
+        if links:
+            db.session.execute(insert(TenderDuplicate), links)
+        return len(kept), len(links)
+
+    def _update_tenders(self, changes):
+        """
+        按主键批量更新内容有变化的记录（空字段不覆盖已有值），
+        指纹随之变化时一并更新；新指纹已属于其他记录时保留原指纹
+        """
+        now = datetime.utcnow()
+        values = []
+        fingerprints = {}
+        for tender_id, (row, organization) in changes.items():
+            value = {field: row[field] for field in UPDATE_FIELDS if row[field] not in (None, '')}
+            value.update(id=tender_id, content_hash=row['content_hash'], updated_at=now)
+            values.append(value)
+            fingerprints[tender_id] = tender_fingerprint(
+                row['title'], row['organization'] or organization, row['publish_date']
+            )
+        db.session.execute(update(Tender), values)
+        # 批量更新不触发映射器事件，检索字段的旧索引行已由触发器删除，按更新后的内容重新写入
+        search_service.backend.index_ids(db.session.connection(), list(changes))
+
+        signatures = near_duplicate_index.signatures([row for row, _ in changes.values()])
+        if signatures is not None:
+            db.session.execute(
+                update(TenderSignature.__table__)
+                .where(TenderSignature.__table__.c.tender_id == bindparam('b_tender_id'))
+                .values(signature=bindparam('b_signature')),
+                [{'b_tender_id': tender_id, 'b_signature': signature.tobytes()}
+                 for tender_id, signature in zip(changes, signatures)]
+            )
+            near_duplicate_index.add(list(changes), signatures)
+
+        taken = fingerprint_index.filter_existing(fingerprints.values())
+        moved = {}
+        for tender_id, fp in fingerprints.items():
+            if fp not in taken:
+                moved[tender_id] = fp
+                taken.add(fp)
+        if moved:
+            db.session.execute(
+                update(TenderFingerprint.__table__)
+                .where(TenderFingerprint.__table__.c.tender_id == bindparam('b_tender_id'))
+                .values(fingerprint=bindparam('b_fingerprint')),
+                [{'b_tender_id': tender_id, 'b_fingerprint': fp} for tender_id, fp in moved.items()]
+            )
+            fingerprint_index.add(moved.values())
+
+    def _insert_tenders(self, rows):
+        if db.session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+            stmt = insert(Tender).returning(Tender.id, sort_by_parameter_order=True)
+            ids = list(db.session.scalars(stmt, rows))
+            # 批量插入不触发映射器事件，全文索引和保存的搜索在这里处理（逐条插入的分支由各自的事件处理）
+            search_service.backend.index_rows(db.session.connection(), zip(ids, rows))
+            percolator.percolate(ids, rows)
+            return ids
+
+        tenders = [Tender(**row) for row in rows]
+        db.session.add_all(tenders)
+        db.session.flush()
+        return [tender.id for tender in tenders]
+
+    def backfill_sources(self, batch_size=500, rebuild=False):
+        """
+        按 id 分批为缺少来源标识的已有记录补算来源标识、内容哈希和地址哈希
+        rebuild 时全部重新计算（地址的规范化规则调整后需要）
+        """
+        stats = {'scanned': 0, 'updated': 0}
+        last_id = 0
+
+        while True:
+            tenders = Tender.query.filter(Tender.id > last_id)\
+                .order_by(Tender.id)\
+                .limit(batch_size).all()
+            if not tenders:
+                break
+            last_id = tenders[-1].id
+
+            values = [
+                {
+                    'id': tender.id,
+                    'source_key': source_key(tender.source_url, tender.source_website),
+                    'content_hash': tender.content_hash or content_hash(tender),
+                    'url_hash': url_hash(tender.source_url)
+                }
+                for tender in tenders
+                if rebuild or tender.source_key is None or tender.content_hash is None or tender.url_hash is None
+            ]
+            stats['scanned'] += len(tenders)
+            if values:
+                db.session.execute(update(Tender), values)
+                stats['updated'] += len(values)
+            db.session.commit()
+            db.session.expunge_all()
+            logger.info(f"来源标识补算进度: 已处理 {stats['scanned']} 条，更新 {stats['updated']} 条")
+
+        return stats
+
+ingest_service = IngestService()
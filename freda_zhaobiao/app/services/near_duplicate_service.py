@@ -0,0 +1,296 @@
+from ..models import Tender, TenderSignature, TenderDuplicate
+from ..extensions import db
+from ..utils.minhash import MinHasher, MinHashLSH, similarity, title_numbers
+from sqlalchemy import insert, delete
+import numpy as np
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class NearDuplicateIndex:
+    """
+    进程内的近似重复索引（MinHash LSH）
+    - 签名保存在 TenderSignature 表中，启动时加载到 LSH 桶，之后按 tender_id 增量加载其他进程写入的签名
+    - 查询时只取与新记录至少有一段签名相同的候选，按 id 一次查出候选签名后比较相似度
+    - 同一批新记录之间也互相比较（同一次搜索常常从多个站点抓到同一条公告）
+    - 只有来源站点不同、发布日期相差不超过 date_window 天的才算转载；
+      同一站点每隔几个月发布的同名公告（定期采购）是不同的招标，不能合并
+    - 删除的记录先记在 _removed 中并从候选中排除，攒够 remove_batch 条后再从桶中一次删除
+    """
+    def __init__(self, threshold=0.8, num_perm=128, shingle_size=2, catch_up_interval=5, lookup_chunk=500,
+                 remove_batch=1000, date_window=7):
+        self.enabled = True
+        self.threshold = threshold
+        self.date_window = date_window
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.catch_up_interval = catch_up_interval
+        self.lookup_chunk = lookup_chunk
+        self.remove_batch = remove_batch
+
+        self._hasher = None
+        self._lsh = None
+        self._last_id = 0
+        self._last_catch_up = 0
+        self._local_ids = set()
+        self._removed = set()
+        self._lock = threading.RLock()
+
+        self.queries = 0
+        self.candidates = 0
+        self.matches = 0
+        self.batch_matches = 0
+        self.rebuilds = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('NEAR_DUPLICATE_ENABLED', self.enabled)
+        self.threshold = app.config.get('NEAR_DUPLICATE_THRESHOLD', self.threshold)
+        self.num_perm = app.config.get('NEAR_DUPLICATE_NUM_PERM', self.num_perm)
+        self.shingle_size = app.config.get('NEAR_DUPLICATE_SHINGLE_SIZE', self.shingle_size)
+        self.date_window = app.config.get('NEAR_DUPLICATE_DATE_WINDOW', self.date_window)
+        self.catch_up_interval = app.config.get('FINGERPRINT_INDEX_CATCH_UP', self.catch_up_interval)
+        self._hasher = None
+        self._lsh = None
+        if not self.enabled:
+            return
+        try:
+            with app.app_context():
+                self.load()
+        except Exception as e:
+            # 表还不存在等情况下，第一次查询时再加载
+            logger.warning(f"启动时加载近似重复索引失败: {str(e)}")
+
+    @property
+    def hasher(self):
+        if self._hasher is None:
+            self._hasher = MinHasher(self.num_perm, self.shingle_size)
+        return self._hasher
+
+    def signatures(self, rows):
+        """计算多条记录（字典）的签名，未启用时返回 None"""
+        if not self.enabled:
+            return None
+        return [self.hasher.signature_of(row['title'], row.get('organization')) for row in rows]
+
+    def load(self):
+        """从数据库全量加载签名"""
+        with self._lock:
+            lsh = MinHashLSH(self.threshold, self.num_perm)
+            ids = []
+            signatures = []
+            stale = 0
+            rows = db.session.query(TenderSignature.tender_id, TenderSignature.signature)\
+                .order_by(TenderSignature.tender_id).yield_per(5000)
+            for tender_id, data in rows:
+                if len(data) != self.num_perm * 4:
+                    stale += 1
+                    continue
+                ids.append(tender_id)
+                signatures.append(np.frombuffer(data, dtype=np.uint32))
+            lsh.build(ids, np.vstack(signatures) if signatures else np.empty((0, self.num_perm), dtype=np.uint32))
+            self._lsh = lsh
+            self._last_id = ids[-1] if ids else 0
+            self._local_ids = set()
+            self._removed = set()
+            self._last_catch_up = time.time()
+            self.rebuilds += 1
+            if stale:
+                logger.warning(f"{stale} 个签名的长度与配置不符，请执行 python migrate_db.py signatures --rebuild")
+            logger.info(f"近似重复索引已加载: {lsh.count} 个签名, {lsh.bands} 段 x {lsh.rows} 行")
+
+    def _ensure_current(self):
+        if self._lsh is None:
+            self.load()
+        elif time.time() - self._last_catch_up > self.catch_up_interval:
+            rows = db.session.query(TenderSignature.tender_id, TenderSignature.signature)\
+                .filter(TenderSignature.tender_id > self._last_id)\
+                .order_by(TenderSignature.tender_id).all()
+            ids = []
+            signatures = []
+            for tender_id, data in rows:
+                self._last_id = tender_id
+                if tender_id in self._local_ids or len(data) != self.num_perm * 4:
+                    continue
+                ids.append(tender_id)
+                signatures.append(np.frombuffer(data, dtype=np.uint32))
+            if ids:
+                self._lsh.add(ids, np.vstack(signatures))
+            self._local_ids = {tender_id for tender_id in self._local_ids if tender_id > self._last_id}
+            self._last_catch_up = time.time()
+
+    def add(self, ids, signatures):
+        """把本进程新写入的签名加入索引"""
+        if not self.enabled or not ids:
+            return
+        with self._lock:
+            if self._lsh is None:
+                return
+            if self._removed.intersection(ids):
+                # 删除的 id 被新记录复用，先去掉旧签名的桶键
+                self._purge()
+            self._lsh.add(list(ids), np.vstack(signatures))
+            self._local_ids.update(ids)
+
+    def remove(self, ids):
+        """从索引中删除已删除的记录"""
+        if not ids:
+            return
+        with self._lock:
+            if self._lsh is None:
+                return
+            self._removed.update(ids)
+            if len(self._removed) >= self.remove_batch:
+                self._purge()
+
+    def _purge(self):
+        self._lsh.remove(self._removed)
+        self._removed = set()
+
+    def _stored_signatures(self, tender_ids):
+        """
+        按 id 查出候选记录的签名和判断是否转载需要的字段：
+        {tender_id: (signature, (标题中的数字, 来源站点, 发布日期))}
+        """
+        stored = {}
+        tender_ids = list(tender_ids)
+        for start in range(0, len(tender_ids), self.lookup_chunk):
+            chunk = tender_ids[start:start + self.lookup_chunk]
+            rows = db.session.query(TenderSignature.tender_id, TenderSignature.signature, Tender.title,
+                                    Tender.source_website, Tender.publish_date)\
+                .join(Tender, Tender.id == TenderSignature.tender_id)\
+                .filter(TenderSignature.tender_id.in_(chunk))
+            for tender_id, data, title, source_website, publish_date in rows:
+                if len(data) == self.num_perm * 4:
+                    stored[tender_id] = (
+                        np.frombuffer(data, dtype=np.uint32), (title_numbers(title), source_website, publish_date)
+                    )
+        return stored
+
+    def _reprint_of(self, fields, other):
+        """
+        fields、other 为 (标题中的数字, 来源站点, 发布日期)：标题中的数字相同、来源站点不同、
+        发布日期相差不超过 date_window 天时可以是转载（相似度另外比较）
+        """
+        numbers, source_website, publish_date = fields
+        other_numbers, other_website, other_date = other
+        if numbers != other_numbers or source_website == other_website:
+            return False
+        if publish_date is None or other_date is None:
+            return False
+        return abs((publish_date - other_date).days) <= self.date_window
+
+    def match(self, rows, signatures):
+        """
+        为一批新记录查找其他站点的转载（相似度达到阈值，且符合 _reprint_of 的条件），
+        返回与 rows 等长的列表，每项为：
+        None（没有重复）、(tender_id, None, 相似度)（与已有记录重复）
+        或 (None, j, 相似度)（与本批中前面没有重复的第 j 条重复）
+        """
+        if not self.enabled or not signatures:
+            return [None] * len(rows)
+
+        with self._lock:
+            self._ensure_current()
+            lsh = self._lsh
+            candidates = [lsh.query(signature) - self._removed for signature in signatures]
+        stored = self._stored_signatures(set().union(*candidates))
+
+        results = []
+        batch_buckets = {}
+        batch_signatures = {}
+        for j, signature in enumerate(signatures):
+            fields = (title_numbers(rows[j]['title']), rows[j].get('source_website'), rows[j].get('publish_date'))
+            best = None
+            for tender_id in candidates[j]:
+                if tender_id not in stored or not self._reprint_of(fields, stored[tender_id][1]):
+                    continue
+                score = similarity(signature, stored[tender_id][0])
+                if score >= self.threshold and (best is None or score > best[2]):
+                    best = (tender_id, None, score)
+
+            keys = lsh.band_keys(signature)[0].tolist()
+            if best is None:
+                for other in {other for key in keys for other in batch_buckets.get(key, ())}:
+                    if not self._reprint_of(fields, batch_signatures[other][1]):
+                        continue
+                    score = similarity(signature, batch_signatures[other][0])
+                    if score >= self.threshold and (best is None or score > best[2]):
+                        best = (None, other, score)
+            if best is None:
+                for key in keys:
+                    batch_buckets.setdefault(key, []).append(j)
+                batch_signatures[j] = (signature, fields)
+            results.append(best)
+
+        with self._lock:
+            self.queries += len(signatures)
+            self.candidates += sum(len(c) for c in candidates)
+            self.matches += sum(1 for r in results if r is not None and r[0] is not None)
+            self.batch_matches += sum(1 for r in results if r is not None and r[0] is None)
+        return results
+
+    def backfill(self, batch_size=500, rebuild=False):
+        """
+        按 id 分批为没有签名的招标信息计算签名
+        rebuild 时先删除所有签名（修改签名长度或切分长度后需要）
+        """
+        stats = {'signed': 0}
+        if rebuild:
+            TenderSignature.query.delete(synchronize_session=False)
+            db.session.commit()
+
+        last_id = 0
+        while True:
+            tenders = db.session.query(Tender.id, Tender.title, Tender.organization)\
+                .outerjoin(TenderSignature, TenderSignature.tender_id == Tender.id)\
+                .filter(Tender.id > last_id, TenderSignature.tender_id.is_(None))\
+                .order_by(Tender.id)\
+                .limit(batch_size).all()
+            if not tenders:
+                break
+            last_id = tenders[-1].id
+
+            db.session.execute(insert(TenderSignature), [
+                {'tender_id': tender.id, 'signature': self.hasher.signature_of(tender.title, tender.organization).tobytes()}
+                for tender in tenders
+            ])
+            db.session.commit()
+            stats['signed'] += len(tenders)
+            logger.info(f"签名计算进度: 已处理到 id {last_id}，新增签名 {stats['signed']} 个")
+
+        if self.enabled:
+            self.load()
+        return stats
+
+    def stats(self):
+        with self._lock:
+            lsh = self._lsh
+            return {
+                'enabled': self.enabled,
+                'loaded': lsh is not None,
+                'signatures': lsh.count if lsh else 0,
+                'threshold': self.threshold,
+                'num_perm': self.num_perm,
+                'bands': lsh.bands if lsh else 0,
+                'rows': lsh.rows if lsh else 0,
+                'memory_bytes': lsh.memory_bytes() if lsh else 0,
+                'queries': self.queries,
+                'candidates': self.candidates,
+                'matches': self.matches,
+                'batch_matches': self.batch_matches,
+                'rebuilds': self.rebuilds
+            }
+
+near_duplicate_index = NearDuplicateIndex()
+
+@db.event.listens_for(Tender, 'before_delete')
+def _delete_signature(mapper, connection, target):
+    """
+    删除招标信息（接口删除、指纹重建时合并重复）时一并删除签名和链接到它的转载记录，并从索引中去掉；
+    SQLite 会复用被删除的最大 id，留下的签名会与新记录的签名主键冲突
+    """
+    connection.execute(delete(TenderSignature).where(TenderSignature.tender_id == target.id))
+    connection.execute(delete(TenderDuplicate).where(TenderDuplicate.tender_id == target.id))
+    near_duplicate_index.remove([target.id])
@@ -0,0 +1,200 @@
+from ..models import Tender, SavedSearch, SavedSearchMatch
+from ..extensions import db
+from ..utils.multi_pattern import PatternMatcher
+from ..utils.search_index import SEARCH_FIELDS, split_terms
+from .search_service import search_service
+from sqlalchemy import insert, delete, func
+from collections import Counter
+from datetime import datetime
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Percolator:
+    """
+    保存的搜索的反向索引（percolator）
+    - 所有保存的搜索的关键词编译成一个多模式串自动机，词 -> 使用它的搜索 的反向索引记录每个词属于哪些搜索
+    - 新招标信息入库时（IngestService 批量插入后显式调用，ORM 逐条插入的由 after_insert 事件调用，
+      Excel 导入、后台上传、POST /api/tenders 都走这条路径），把标题、摘要、招标单位拼起来扫描一遍，
+      得到出现的词，每个搜索的全部词都出现（并且分类相符）即为命中，追加到 SavedSearchMatch；
+      不需要为每个保存的搜索各执行一次 LIKE 查询
+    - 匹配规则与搜索相同：不区分大小写的子串匹配，多个词之间是"并且"的关系
+    - 保存的搜索在本进程增删后立即重新编译，其他进程的修改每隔 reload_interval 秒重新加载
+    - 已有记录内容更新后不重新匹配，招标信息删除时一并删除它的匹配
+    """
+    def __init__(self, reload_interval=30, backfill_limit=1000):
+        self.reload_interval = reload_interval
+        self.backfill_limit = backfill_limit
+
+        self._matcher = None
+        self._queries = {}
+        self._term_queries = {}
+        self._loaded_at = 0
+        self._lock = threading.RLock()
+
+        self.percolated = 0
+        self.matched = 0
+        self.reloads = 0
+
+    def init_app(self, app):
+        self.reload_interval = app.config.get('SAVED_SEARCH_RELOAD_INTERVAL', self.reload_interval)
+        self.backfill_limit = app.config.get('SAVED_SEARCH_BACKFILL_LIMIT', self.backfill_limit)
+
+    @staticmethod
+    def terms(keywords):
+        return tuple(dict.fromkeys(term.lower() for term in split_terms(keywords, search_service.max_terms)))
+
+    def load(self):
+        """从数据库加载所有保存的搜索，重新编译自动机"""
+        with self._lock:
+            queries = {}
+            term_queries = {}
+            for search_id, keywords, category in db.session.query(
+                    SavedSearch.id, SavedSearch.keywords, SavedSearch.category):
+                terms = self.terms(keywords)
+                if not terms:
+                    continue
+                queries[search_id] = (len(terms), category or None)
+                for term in terms:
+                    term_queries.setdefault(term, []).append(search_id)
+            self._matcher = PatternMatcher(term_queries)
+            self._queries = queries
+            self._term_queries = term_queries
+            self._loaded_at = time.time()
+            self.reloads += 1
+            logger.info(f"保存的搜索已加载: {len(queries)} 个搜索，{len(term_queries)} 个关键词")
+
+    def invalidate(self):
+        with self._lock:
+            self._matcher = None
+
+    def _ensure_current(self):
+        if self._matcher is None or time.time() - self._loaded_at > self.reload_interval:
+            self.load()
+
+    def match(self, row):
+        """row 为招标信息的字段（字典），返回命中的保存的搜索 id"""
+        text = '\n'.join(row.get(field) or '' for field in SEARCH_FIELDS).lower()
+        hits = Counter()
+        for term in self._matcher.find(text):
+            hits.update(self._term_queries[term])
+        category = row.get('category')
+        return [
+            search_id for search_id, count in hits.items()
+            if count == self._queries[search_id][0]
+            and self._queries[search_id][1] in (None, category)
+        ]
+
+    def percolate(self, ids, rows, connection=None):
+        """
+        新插入的招标信息（ids 与 rows 一一对应）与所有保存的搜索匹配，命中的写入 SavedSearchMatch（不提交）
+        connection 为映射器事件中 flush 使用的连接
+        """
+        with self._lock:
+            self._ensure_current()
+            if not self._queries:
+                return 0
+            values = [
+                {'saved_search_id': search_id, 'tender_id': tender_id}
+                for tender_id, row in zip(ids, rows)
+                if (row.get('status') or 'active') == 'active'
+                for search_id in self.match(row)
+            ]
+            self.percolated += len(rows)
+            self.matched += len(values)
+        if values:
+            (connection or db.session).execute(insert(SavedSearchMatch), values)
+        return len(values)
+
+    def create(self, name, keywords, category=None, user_id=None):
+        """
+        保存一个搜索，并用搜索服务找出已有的最近 backfill_limit 条匹配记录作为初始结果（视为已查看）
+        """
+        search = SavedSearch(name=name or keywords, keywords=keywords, category=category or None, user_id=user_id)
+        db.session.add(search)
+        db.session.flush()
+
+        query = search_service.apply(Tender.query.filter(Tender.status == 'active'), keywords)
+        if search.category:
+            query = query.filter(Tender.category == search.category)
+        recent = query.with_entities(Tender.id)\
+            .order_by(Tender.publish_date.desc(), Tender.id.desc())\
+            .limit(self.backfill_limit).all()
+        if recent:
+            # 从旧到新写入，匹配 id 的顺序与发布时间一致
+            db.session.execute(
+                insert(SavedSearchMatch),
+                [{'saved_search_id': search.id, 'tender_id': tender_id} for (tender_id,) in reversed(recent)]
+            )
+        search.last_seen_match_id = self.latest_match_id(search)
+        db.session.commit()
+        self.invalidate()
+        return search
+
+    def delete(self, search):
+        SavedSearchMatch.query.filter_by(saved_search_id=search.id).delete(synchronize_session=False)
+        db.session.delete(search)
+        db.session.commit()
+        self.invalidate()
+
+    def results(self, search):
+        """保存的搜索的结果（最新命中的在前），用 keyset_paginate 按 SavedSearchMatch.id 翻页"""
+        return SavedSearchMatch.query\
+            .filter(SavedSearchMatch.saved_search_id == search.id)\
+            .join(Tender, Tender.id == SavedSearchMatch.tender_id)\
+            .options(db.contains_eager(SavedSearchMatch.tender))
+
+    def latest_match_id(self, search):
+        return db.session.query(func.max(SavedSearchMatch.id))\
+            .filter(SavedSearchMatch.saved_search_id == search.id).scalar() or 0
+
+    def new_count(self, search):
+        """上次查看之后新命中的数量：(saved_search_id, id) 索引上的范围计数"""
+        return self.new_counts([search])[search.id]
+
+    def new_counts(self, searches):
+        """多个保存的搜索各自的新结果数量（搜索 id -> 数量），一次分组查询，不随搜索的数量增加查询次数"""
+        ids = [search.id for search in searches]
+        if not ids:
+            return {}
+        counts = dict(
+            db.session.query(SavedSearchMatch.saved_search_id, func.count(SavedSearchMatch.id))
+            .join(SavedSearch, SavedSearch.id == SavedSearchMatch.saved_search_id)
+            .filter(
+                SavedSearch.id.in_(ids),
+                SavedSearchMatch.id > func.coalesce(SavedSearch.last_seen_match_id, 0)
+            )
+            .group_by(SavedSearchMatch.saved_search_id)
+            .all()
+        )
+        return {search_id: counts.get(search_id, 0) for search_id in ids}
+
+    def mark_seen(self, search):
+        search.last_seen_match_id = self.latest_match_id(search)
+        search.last_viewed_at = datetime.utcnow()
+        db.session.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self._matcher is not None,
+                'saved_searches': len(self._queries),
+                'terms': len(self._term_queries),
+                'percolated': self.percolated,
+                'matched': self.matched,
+                'reloads': self.reloads
+            }
+
+percolator = Percolator()
+
+@db.event.listens_for(Tender, 'after_insert')
+def _percolate_inserted(mapper, connection, target):
+    # IngestService 的批量插入不触发映射器事件，由它自己调用 percolate
+    row = {field: getattr(target, field) for field in SEARCH_FIELDS + ('category', 'status')}
+    percolator.percolate([target.id], [row], connection=connection)
+
+@db.event.listens_for(Tender, 'before_delete')
+def _delete_matches(mapper, connection, target):
+    connection.execute(delete(SavedSearchMatch).where(SavedSearchMatch.tender_id == target.id))
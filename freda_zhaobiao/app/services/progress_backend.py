@@ -0,0 +1,287 @@
+from .result_spool import ResultSpool
+from datetime import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class MemoryProgressBackend:
+    """默认后端：进度只保存在当前进程内，其他进程不可见"""
+    name = 'memory'
+    shared = False
+
+    def attach(self, store):
+        pass
+
+    def mark_dirty(self, task_id):
+        pass
+
+    def exists(self, task_id):
+        return False
+
+    def load(self, task_id, with_results=True):
+        return None
+
+    def load_all(self, exclude=(), with_results=False):
+        return []
+
+    def versions(self):
+        return {}
+
+    def delete(self, task_id):
+        pass
+
+    def stats(self):
+        return {'backend': self.name}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+class SQLiteProgressBackend:
+    """
+    同一台机器上多个进程共享的进度后端（SQLite WAL 模式）
+    - 爬取线程更新进度时只把任务标记为“脏”，由后台线程每 flush_interval 秒合并写入一次，
+      单次更新的开销只是一次集合插入
+    - 结果列表单独按行追加写入，每次只写新增的部分；
+      结果已暂存到磁盘（ResultSpool）时只记录文件目录，读取方直接打开该文件
+    - 其他进程在本地找不到任务时从这里读取快照（只读）
+    """
+    name = 'sqlite'
+    shared = True
+
+    def __init__(self, path, flush_interval=0.5, prune_interval=60):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+        self.store = None
+
+        self._dirty = set()
+        self._flushed_results = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._thread = None
+        self._last_prune = 0
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_ms = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS crawl_progress (
+                task_id TEXT PRIMARY KEY,
+                pid INTEGER,
+                status TEXT,
+                version INTEGER,
+                results_count INTEGER,
+                data TEXT,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS crawl_progress_result (
+                task_id TEXT,
+                seq INTEGER,
+                data TEXT,
+                PRIMARY KEY (task_id, seq)
+            );
+        ''')
+
+    def attach(self, store):
+        """绑定本进程的进度存储，并启动后台写入线程"""
+        self.store = store
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._thread.start()
+
+    def mark_dirty(self, task_id):
+        with self._lock:
+            self._dirty.add(task_id)
+
+    def exists(self, task_id):
+        row = self._connect().execute(
+            'SELECT 1 FROM crawl_progress WHERE task_id = ?', (task_id,)
+        ).fetchone()
+        return row is not None
+
+    def _decode(self, row, with_results):
+        task_id, results_count, data = row
+        progress = json.loads(data)
+        progress['results_count'] = results_count
+        results_dir = progress.pop('results_dir', None)
+        if with_results and results_dir:
+            progress['results'] = ResultSpool.open(results_dir)
+        elif with_results:
+            progress['results'] = [
+                json.loads(r[0]) for r in self._connect().execute(
+                    'SELECT data FROM crawl_progress_result WHERE task_id = ? ORDER BY seq', (task_id,)
+                )
+            ]
+        return progress
+
+    def load(self, task_id, with_results=True):
+        row = self._connect().execute(
+            'SELECT task_id, results_count, data FROM crawl_progress WHERE task_id = ?', (task_id,)
+        ).fetchone()
+        return self._decode(row, with_results) if row else None
+
+    def load_all(self, exclude=(), with_results=False):
+        rows = self._connect().execute(
+            'SELECT task_id, results_count, data FROM crawl_progress ORDER BY updated_at'
+        ).fetchall()
+        return [(row[0], self._decode(row, with_results)) for row in rows if row[0] not in exclude]
+
+    def versions(self):
+        """返回所有任务的 (版本号) 映射，用于发现其他进程中任务的变化"""
+        return dict(self._connect().execute('SELECT task_id, version FROM crawl_progress'))
+
+    def delete(self, task_id):
+        with self._lock:
+            self._dirty.discard(task_id)
+            self._flushed_results.pop(task_id, None)
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM crawl_progress WHERE task_id = ?', (task_id,))
+            conn.execute('DELETE FROM crawl_progress_result WHERE task_id = ?', (task_id,))
+
+    def flush(self):
+        """把所有脏任务写入数据库，返回写入的任务数"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty or self.store is None:
+            return 0
+
+        started = time.time()
+        conn = self._connect()
+        written = 0
+        retry = set()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for task_id in dirty:
+                progress = self.store.local_entry(task_id)
+                if progress is None:
+                    continue
+                try:
+                    written += self._write_task(conn, task_id, progress)
+                except RuntimeError:
+                    # 爬取线程正在修改该任务的字典，下一轮再写
+                    retry.add(task_id)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            retry |= dirty
+            for task_id in dirty:
+                self._flushed_results.pop(task_id, None)
+            raise
+        finally:
+            if retry:
+                with self._lock:
+                    self._dirty |= retry
+
+        self.flushes += 1
+        self.rows_written += written
+        self.last_flush_ms = round((time.time() - started) * 1000, 2)
+        return len(dirty) - len(retry)
+
+    def _write_task(self, conn, task_id, progress):
+        results = progress.get('results', [])
+        snapshot = {k: v for k, v in progress.items() if k != 'results'}
+        if isinstance(results, ResultSpool):
+            snapshot['results_dir'] = results.directory
+            results_count = len(results)
+            results = []
+        else:
+            results = list(results)
+            results_count = len(results)
+        data = json.dumps(snapshot, ensure_ascii=False, default=_json_default)
+
+        flushed = self._flushed_results.get(task_id, 0)
+        if len(results) < flushed:
+            conn.execute('DELETE FROM crawl_progress_result WHERE task_id = ?', (task_id,))
+            flushed = 0
+        new_rows = [
+            (task_id, seq, json.dumps(item, ensure_ascii=False, default=_json_default))
+            for seq, item in enumerate(results[flushed:], start=flushed)
+        ]
+        if new_rows:
+            conn.executemany(
+                'INSERT OR REPLACE INTO crawl_progress_result (task_id, seq, data) VALUES (?, ?, ?)', new_rows
+            )
+        conn.execute(
+            'INSERT OR REPLACE INTO crawl_progress (task_id, pid, status, version, results_count, data, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (task_id, os.getpid(), progress.get('status'), progress.get('version', 0),
+             results_count, data, time.time())
+        )
+        self._flushed_results[task_id] = len(results)
+        return 1 + len(new_rows)
+
+    def prune(self, finished_ttl, stale_ttl):
+        """清理其他进程遗留的过期任务"""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT task_id FROM crawl_progress WHERE "
+                "(status IN ('completed', 'failed') AND updated_at < ?) OR updated_at < ?",
+                (now - finished_ttl, now - stale_ttl)
+            )]
+            for task_id in expired:
+                conn.execute('DELETE FROM crawl_progress WHERE task_id = ?', (task_id,))
+                conn.execute('DELETE FROM crawl_progress_result WHERE task_id = ?', (task_id,))
+        return len(expired)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if time.time() - self._last_prune > self.prune_interval:
+                    self._last_prune = time.time()
+                    self.prune(self.store.finished_ttl, self.store.stale_ttl)
+            except Exception as e:
+                logger.error(f"写入共享爬取进度失败: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._dirty)
+        return {
+            'backend': self.name,
+            'path': self.path,
+            'flush_interval': self.flush_interval,
+            'pending': pending,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'last_flush_ms': self.last_flush_ms
+        }
+
+def create_backend(app):
+    """根据 CRAWL_PROGRESS_BACKEND 配置创建进度后端"""
+    name = app.config.get('CRAWL_PROGRESS_BACKEND', 'memory')
+    if name == 'sqlite':
+        return SQLiteProgressBackend(
+            app.config.get('CRAWL_PROGRESS_DB', os.path.abspath('data/progress.db')),
+            flush_interval=app.config.get('CRAWL_PROGRESS_FLUSH_INTERVAL', 0.5)
+        )
+    if name != 'memory':
+        logger.warning(f"未知的进度存储后端 {name}，使用内存后端")
+    return MemoryProgressBackend()
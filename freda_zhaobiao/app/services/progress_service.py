@@ -0,0 +1,382 @@
+from collections import deque, OrderedDict
+from collections.abc import MutableMapping
+from bisect import bisect_right
+from .progress_backend import MemoryProgressBackend, create_backend
+from .result_spool import release_results
+import threading
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+STATUS_FIELDS = (
+    'status', 'total', 'completed', 'message', 'error', 'current_website',
+    'start_time', 'elapsed_time', 'estimated_remaining', 'estimated_completion',
+    'progress_percentage', 'saved_count', 'skipped_count', 'total_in_db'
+)
+
+FINAL_STATUSES = ('completed', 'failed')
+
+def results_count(progress):
+    """结果数量；从共享后端读取的概要不含结果列表，只带 results_count"""
+    if 'results' in progress:
+        return len(progress['results'])
+    return progress.get('results_count', 0)
+
+def progress_status(progress):
+    """提取进度中的整体状态字段，不包含网站列表和结果列表"""
+    status = {key: progress[key] for key in STATUS_FIELDS if key in progress}
+    status['results_count'] = results_count(progress)
+    status['version'] = progress.get('version', 0)
+    return status
+
+def mark_results(progress, version):
+    """记录在 version 时结果列表的长度，用于按版本计算新增结果"""
+    marks = progress.setdefault('result_marks', [])
+    marks.append((version, len(progress.get('results', []))))
+
+def results_offset(progress, since):
+    """返回客户端在 since 版本时已经拿到的结果数量"""
+    marks = progress.get('result_marks', [])
+    index = bisect_right(marks, (since, float('inf')))
+    return marks[index - 1][1] if index else 0
+
+def changed_sites(progress, since):
+    """返回 since 版本之后状态发生变化的网站（附带其在列表中的位置）"""
+    return [
+        dict(site, index=index)
+        for index, site in enumerate(progress.get('websites', []))
+        if site.get('version', 0) > since
+    ]
+
+class ProgressEventBus:
+    """
+    爬取进度事件总线
+    爬取线程在进度变化时发布增量事件（站点状态变化、新的结果批次、整体状态），
+    SSE 连接按事件序号等待并推送，避免客户端反复拉取完整进度
+    """
+    def __init__(self, max_events_per_task=1000):
+        self.max_events_per_task = max_events_per_task
+        self._events = {}
+        self._changed = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._listeners = []
+
+    @property
+    def last_event_id(self):
+        with self._cond:
+            return self._seq
+
+    def subscribe(self, callback):
+        """注册监听函数，每次发布事件后以 task_id 调用（在锁外执行）"""
+        self._listeners.append(callback)
+
+    def publish(self, task_id, event, data):
+        """
+        发布事件并返回其序号，序号同时作为进度的版本号
+        data 可以是接收版本号、返回事件数据的函数，它在分配版本号的同一把锁内执行，
+        保证版本号与事件顺序一致
+        """
+        with self._cond:
+            self._seq += 1
+            if callable(data):
+                data = data(self._seq)
+            events = self._events.get(task_id)
+            if events is None:
+                events = self._events[task_id] = deque(maxlen=self.max_events_per_task)
+            events.append((self._seq, event, data))
+            self._changed[task_id] = self._seq
+            self._cond.notify_all()
+            seq = self._seq
+        for callback in self._listeners:
+            try:
+                callback(task_id)
+            except Exception as e:
+                logger.error(f"进度事件监听函数出错: {str(e)}")
+        return seq
+
+    def discard(self, task_id):
+        with self._cond:
+            self._events.pop(task_id, None)
+            self._changed.pop(task_id, None)
+
+    def events_since(self, task_id, last_id):
+        """
+        返回 task_id 在 last_id 之后的事件
+        如果所需事件已被淘汰则返回 None，调用方应重新发送完整快照
+        """
+        with self._cond:
+            return self._events_since(task_id, last_id)
+
+    def _events_since(self, task_id, last_id):
+        events = self._events.get(task_id)
+        if not events:
+            return []
+        if events[0][0] > last_id + 1 and len(events) == events.maxlen:
+            return None
+        return [e for e in events if e[0] > last_id]
+
+    def wait_for_task(self, task_id, last_id, timeout):
+        """阻塞等待 task_id 的新事件，超时返回空列表"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                if self._changed.get(task_id, 0) > last_id:
+                    return self._events_since(task_id, last_id)
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+
+    def wait_for_any(self, last_id, timeout):
+        """阻塞等待任意任务的新事件，返回 (最新序号, 发生变化的任务ID列表)"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._seq <= last_id:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return last_id, []
+                self._cond.wait(remaining)
+            changed = [task_id for task_id, seq in self._changed.items() if seq > last_id]
+            return self._seq, changed
+
+progress_events = ProgressEventBus()
+
+class StreamLimiter:
+    """
+    同时打开的 SSE 连接数上限（每个进程）
+    gthread worker 中每个推送连接在整个推送期间都占用一个线程，不加限制时打开进度页面的用户会占满线程，
+    普通请求只能排队；超过上限的连接直接返回 503，页面退回到轮询（轮询请求立即返回，不长期占用线程）
+    """
+    def __init__(self, limit=8):
+        self.limit = limit
+        self.active = 0
+        self.peak = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.limit = app.config.get('CRAWL_STREAM_MAX_CONNECTIONS', self.limit)
+
+    def acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active = max(self.active - 1, 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'active': self.active,
+                'peak': self.peak,
+                'rejected': self.rejected
+            }
+
+stream_limiter = StreamLimiter()
+
+def estimate_size(value, sample=20):
+    """
+    估算进度数据占用的内存（字节）
+    对长列表只抽样前 sample 个元素再按长度放大，避免遍历上千条结果
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, sample) + estimate_size(v, sample) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        size = sys.getsizeof(value)
+        if not value:
+            return size
+        head = value[:sample]
+        head_size = sum(estimate_size(v, sample) for v in head)
+        return size + head_size * len(value) // len(head)
+    return sys.getsizeof(value)
+
+class CrawlProgressStore(MutableMapping):
+    """
+    有界的爬取进度存储
+    - 已结束（completed/failed）的任务在 finished_ttl 秒后淘汰
+    - 超过 max_entries 条或估算内存超过 max_bytes 时按最近最少访问淘汰
+    - 正在运行的任务不会被淘汰：爬取线程出错时也会写入 failed，本进程中未结束的任务一定还在执行，
+      淘汰后线程下一次读写进度就会出错；stale_ttl 只用于共享后端中其他进程退出后遗留的任务
+    对外保持字典接口，结构性的读写都在锁内完成；
+    配置了共享后端时，本进程的进度会异步写入后端，本地找不到的任务从后端读取只读快照
+    """
+    def __init__(self, max_entries=200, max_bytes=256 * 1024 * 1024, finished_ttl=1800,
+                 stale_ttl=6 * 3600, prune_interval=5, on_evict=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.finished_ttl = finished_ttl
+        self.stale_ttl = stale_ttl
+        self.prune_interval = prune_interval
+        self.on_evict = on_evict
+
+        self._entries = OrderedDict()
+        self._finished_at = {}
+        self._lock = threading.RLock()
+        self._last_prune = 0
+        self._estimated_bytes = 0
+        self.evictions = {'ttl': 0, 'lru': 0, 'memory': 0}
+        self.backend = MemoryProgressBackend()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('CRAWL_PROGRESS_MAX_ENTRIES', self.max_entries)
+        self.max_bytes = app.config.get('CRAWL_PROGRESS_MAX_MB', self.max_bytes // (1024 * 1024)) * 1024 * 1024
+        self.finished_ttl = app.config.get('CRAWL_PROGRESS_TTL', self.finished_ttl)
+        self.stale_ttl = app.config.get('CRAWL_PROGRESS_STALE_TTL', self.stale_ttl)
+        self.set_backend(create_backend(app))
+
+    def set_backend(self, backend):
+        self.backend = backend
+        backend.attach(self)
+
+    @property
+    def shared(self):
+        return self.backend.shared
+
+    def changed(self, task_id):
+        """进度发生变化，通知后端在下一次写入时同步"""
+        if task_id in self._entries:
+            self.backend.mark_dirty(task_id)
+
+    def is_local(self, task_id):
+        """任务是否由本进程执行（进度在本进程内存中）"""
+        with self._lock:
+            return task_id in self._entries
+
+    def local_entry(self, task_id):
+        with self._lock:
+            return self._entries.get(task_id)
+
+    def __getitem__(self, task_id):
+        with self._lock:
+            progress = self._entries.get(task_id)
+            if progress is not None:
+                self._entries.move_to_end(task_id)
+                return progress
+        progress = self.backend.load(task_id)
+        if progress is None:
+            raise KeyError(task_id)
+        return progress
+
+    def __setitem__(self, task_id, progress):
+        with self._lock:
+            previous = self._entries.get(task_id)
+            if previous is not None and previous.get('results') is not progress.get('results'):
+                release_results(previous)
+            self._entries[task_id] = progress
+            self._entries.move_to_end(task_id)
+            self._finished_at.pop(task_id, None)
+            self.prune(force=True)
+        self.backend.mark_dirty(task_id)
+
+    def __delitem__(self, task_id):
+        """删除本进程和共享后端中的进度，两边都没有时抛出 KeyError"""
+        with self._lock:
+            progress = self._entries.pop(task_id, None)
+            self._finished_at.pop(task_id, None)
+        if progress is None and not self.backend.exists(task_id):
+            raise KeyError(task_id)
+        release_results(progress)
+        self.backend.delete(task_id)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, task_id):
+        with self._lock:
+            if task_id in self._entries:
+                return True
+        return self.backend.exists(task_id)
+
+    def items(self):
+        """本进程的任务加上其他进程写入共享后端的任务（后者不含结果列表）"""
+        with self._lock:
+            self.prune()
+            local = list(self._entries.items())
+        remote = self.backend.load_all(exclude={task_id for task_id, _ in local})
+        return remote + local
+
+    def update_progress(self, task_id, **fields):
+        """在锁内一次性更新多个字段"""
+        with self._lock:
+            self._entries[task_id].update(fields)
+        self.backend.mark_dirty(task_id)
+
+    def prune(self, force=False):
+        """淘汰过期和超出容量的任务，返回本次淘汰的数量"""
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_prune < self.prune_interval:
+                return 0
+            self._last_prune = now
+            evicted = 0
+
+            for task_id, progress in list(self._entries.items()):
+                if progress.get('status') not in FINAL_STATUSES:
+                    continue
+                finished_at = self._finished_at.setdefault(task_id, now)
+                if now - finished_at > self.finished_ttl:
+                    self._evict(task_id, 'ttl')
+                    evicted += 1
+
+            sizes = {task_id: estimate_size(progress) for task_id, progress in self._entries.items()}
+            self._estimated_bytes = sum(sizes.values())
+
+            # 最近一次访问的任务总是保留
+            for task_id in list(self._entries)[:-1]:
+                over_entries = len(self._entries) > self.max_entries
+                over_bytes = self._estimated_bytes > self.max_bytes
+                if not over_entries and not over_bytes:
+                    break
+                if self._entries[task_id].get('status') not in FINAL_STATUSES:
+                    continue
+                self._evict(task_id, 'lru' if over_entries else 'memory')
+                self._estimated_bytes -= sizes.get(task_id, 0)
+                evicted += 1
+
+            return evicted
+
+    def _evict(self, task_id, reason):
+        release_results(self._entries.pop(task_id, None))
+        self._finished_at.pop(task_id, None)
+        self.evictions[reason] += 1
+        self.backend.delete(task_id)
+        if self.on_evict:
+            self.on_evict(task_id)
+
+    def stats(self):
+        with self._lock:
+            self.prune(force=True)
+            running = sum(1 for p in self._entries.values() if p.get('status') not in FINAL_STATUSES)
+            return {
+                'entries': len(self._entries),
+                'running': running,
+                'finished': len(self._entries) - running,
+                'estimated_bytes': self._estimated_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'finished_ttl': self.finished_ttl,
+                'stale_ttl': self.stale_ttl,
+                'evictions': dict(self.evictions),
+                'evicted_total': sum(self.evictions.values()),
+                'backend': self.backend.stats()
+            }
+
+crawl_progress_store = CrawlProgressStore(on_evict=progress_events.discard)
+progress_events.subscribe(crawl_progress_store.changed)
@@ -0,0 +1,146 @@
+from .crawl_item import as_dict
+from array import array
+from datetime import datetime
+import json
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+class ResultSpool:
+    """
+    爬取结果的磁盘暂存（每个任务一个目录，结果按行追加写入 results.jsonl）
+    内存中只保留结果数量、每行的文件偏移和前 preview_size 条预览，
+    读取时按页从文件加载，进程内存不随爬取规模增长
+    对外提供 len()、切片、迭代和 extend()，可以直接替代原来的结果列表；
+    指定 item_type 时读取的每一行用 item_type.from_dict 还原
+    """
+    FILENAME = 'results.jsonl'
+
+    def __init__(self, directory, preview_size=20, readonly=False, item_type=None):
+        self.directory = directory
+        self.path = os.path.join(directory, self.FILENAME)
+        self.preview_size = preview_size
+        self.readonly = readonly
+        self.decode = item_type.from_dict if item_type else (lambda data: data)
+        self.preview = []
+
+        self._offsets = array('q')
+        self._size = 0
+        self._lock = threading.Lock()
+
+        if readonly:
+            self._load_offsets()
+        else:
+            os.makedirs(directory, exist_ok=True)
+            open(self.path, 'w').close()
+
+    @classmethod
+    def for_task(cls, base_dir, task_id, preview_size=20, item_type=None):
+        return cls(os.path.join(base_dir, task_id), preview_size, item_type=item_type)
+
+    @classmethod
+    def open(cls, directory, preview_size=20):
+        """以只读方式打开其他进程写入的结果文件"""
+        return cls(directory, preview_size, readonly=True)
+
+    def _load_offsets(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            position = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # 写入方还没写完这一行
+                    break
+                self._offsets.append(position)
+                if len(self.preview) < self.preview_size:
+                    self.preview.append(self.decode(json.loads(line)))
+                position += len(line)
+            self._size = position
+
+    def append(self, item):
+        self.extend([item])
+
+    def extend(self, items):
+        if self.readonly:
+            raise TypeError('只读的结果文件不能写入')
+        items = list(items)
+        if not items:
+            return
+        lines = [
+            (json.dumps(as_dict(item), ensure_ascii=False, default=_json_default) + '\n').encode('utf-8')
+            for item in items
+        ]
+        with self._lock:
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(lines))
+            for item, line in zip(items, lines):
+                self._offsets.append(self._size)
+                self._size += len(line)
+                if len(self.preview) < self.preview_size:
+                    self.preview.append(item)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __bool__(self):
+        return len(self._offsets) > 0
+
+    def page(self, offset, limit):
+        """读取从 offset 开始的 limit 条结果"""
+        with self._lock:
+            count = len(self._offsets)
+            if offset >= count or limit <= 0:
+                return []
+            end = min(count, offset + limit)
+            if end <= len(self.preview):
+                return self.preview[offset:end]
+            start_byte = self._offsets[offset]
+            end_byte = self._offsets[end] if end < count else self._size
+        with open(self.path, 'rb') as f:
+            f.seek(start_byte)
+            data = f.read(end_byte - start_byte)
+        return [self.decode(json.loads(line)) for line in data.splitlines()]
+
+    def iter_pages(self, page_size=500):
+        offset = 0
+        while True:
+            items = self.page(offset, page_size)
+            if not items:
+                return
+            yield items
+            offset += len(items)
+
+    def __iter__(self):
+        for items in self.iter_pages():
+            yield from items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            items = self.page(start, stop - start)
+            return items[::step] if step != 1 else items
+        if index < 0:
+            index += len(self)
+        items = self.page(index, 1)
+        if not items:
+            raise IndexError(index)
+        return items[0]
+
+    def delete(self):
+        """删除任务的结果目录"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def release_results(progress):
+    """进度条目被淘汰或替换时，删除其结果文件"""
+    results = progress.get('results') if progress else None
+    if isinstance(results, ResultSpool) and not results.readonly:
+        results.delete()
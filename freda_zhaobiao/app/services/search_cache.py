@@ -0,0 +1,269 @@
+from ..models import Tender
+from ..extensions import db
+from ..utils.search_index import split_terms
+from ..utils.pagination import KeysetPagination, keyset_paginate
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 只改这些字段（浏览次数等）不影响搜索结果，不需要让缓存失效
+VOLATILE_FIELDS = {'view_count', 'updated_at'}
+
+class ResultCount(int):
+    """结果数；capped 为 True 时实际数量超过上限，只统计到上限，显示为 "10,000+" """
+    def __new__(cls, value, capped=False):
+        count = super().__new__(cls, value)
+        count.capped = capped
+        return count
+
+    @property
+    def exact(self):
+        return not self.capped
+
+    @property
+    def label(self):
+        return f'{int(self):,}+' if self.capped else f'{int(self):,}'
+
+def search_key(scope, keywords='', **filters):
+    """规范化的缓存键：关键词去重、转小写后排序（多个词是"并且"关系，顺序不影响结果），过滤条件按名称排序"""
+    terms = tuple(sorted({term.lower() for term in split_terms(keywords)}))
+    return (scope, terms) + tuple(sorted((name, str(value)) for name, value in filters.items() if value))
+
+class CachedPagination(Pagination):
+    """
+    按页码分页，接口与 Flask-SQLAlchemy 的 Pagination 相同（prev()/next()/iter_pages() 都可用），
+    本页的记录和总数经过 SearchCache 缓存；由 SearchCache.paginate() 创建
+    """
+    def _query_items(self):
+        args = self._query_args
+        query = args['query']
+        def fetch():
+            return query.limit(self.per_page).offset(self._query_offset).all()
+        variant = ('page', args['order'], self.page, self.per_page)
+        return args['cache'].page_items(query, args['key'], variant, fetch)
+
+    def _query_count(self):
+        args = self._query_args
+        return args['cache'].count(args['query'], args['key'], args['estimate'])
+
+class SearchCache:
+    """
+    搜索结果的缓存（进程内，按 LRU 淘汰）：结果数，以及每一页的记录 id
+    - 每个缓存项都记录写入时的"招标信息代数"，招标信息有新增、修改或删除并提交后代数加一，
+      旧代数的缓存项在下次读取时丢弃，失效不需要遍历缓存键
+    - 其他进程写入的数据不会让本进程的代数变化，缓存项最多保留 ttl 秒
+    - 统计结果数时最多数到 count_cap + 1 条，超过上限显示为 "10,000+"；
+      全文索引估计的上限不超过 count_cap 时直接精确统计
+    - 页面只缓存 id，命中时按主键重新读取这一页的记录，浏览次数等字段总是最新的
+    """
+    def __init__(self, count_ttl=60, result_ttl=60, count_cap=10000, max_entries=10000):
+        self.count_ttl = count_ttl
+        self.result_ttl = result_ttl
+        self.count_cap = count_cap
+        self.max_entries = max_entries
+
+        self.generation = 0
+        self._counts = OrderedDict()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.count_hits = 0
+        self.count_misses = 0
+        self.result_hits = 0
+        self.result_misses = 0
+        self.capped_counts = 0
+        self.bumps = 0
+
+    def init_app(self, app):
+        self.count_ttl = app.config.get('SEARCH_COUNT_TTL', self.count_ttl)
+        self.result_ttl = app.config.get('SEARCH_RESULT_TTL', self.result_ttl)
+        self.count_cap = app.config.get('SEARCH_COUNT_CAP', self.count_cap)
+        self.max_entries = app.config.get('SEARCH_CACHE_MAX_ENTRIES', self.max_entries)
+
+    def bump(self):
+        """招标信息变化后调用，之前缓存的结果全部失效"""
+        with self._lock:
+            self.generation += 1
+            self.bumps += 1
+
+    def _get(self, store, key):
+        entry = store.get(key)
+        if entry is None:
+            return None
+        generation, expires, value = entry
+        if generation != self.generation or expires < time.time():
+            del store[key]
+            return None
+        store.move_to_end(key)
+        return value
+
+    def _put(self, store, key, value, generation, ttl):
+        if generation != self.generation:
+            # 统计期间数据又变了，结果可能已经过时
+            return
+        store[key] = (generation, time.time() + ttl, value)
+        store.move_to_end(key)
+        while len(store) > self.max_entries:
+            store.popitem(last=False)
+
+    def count(self, query, key=None, estimate=None):
+        """
+        统计 query 的结果数，返回 ResultCount
+        key 为 search_key() 生成的缓存键，为 None 时不缓存；estimate 为全文索引估计的上限
+        """
+        with self._lock:
+            generation = self.generation
+            cached = self._get(self._counts, key) if key is not None else None
+            if cached is not None:
+                self.count_hits += 1
+                return cached
+            self.count_misses += 1
+
+        result = self._count(query.order_by(None), estimate)
+        if key is not None:
+            with self._lock:
+                self._put(self._counts, key, result, generation, self.count_ttl)
+        return result
+
+    def _count(self, query, estimate):
+        if estimate == 0:
+            return ResultCount(0)
+        if estimate is not None and estimate <= self.count_cap:
+            return ResultCount(query.count())
+        limited = query.limit(self.count_cap + 1).subquery()
+        count = db.session.query(func.count()).select_from(limited).scalar()
+        if count > self.count_cap:
+            with self._lock:
+                self.capped_counts += 1
+            return ResultCount(self.count_cap, capped=True)
+        return ResultCount(count)
+
+    def cached(self, key, compute):
+        """结果缓存：key 的缓存项未过期且代数没变时直接返回，否则调用 compute() 计算后缓存"""
+        with self._lock:
+            generation = self.generation
+            cached = self._get(self._results, key)
+            if cached is not None:
+                self.result_hits += 1
+                return cached
+            self.result_misses += 1
+
+        result = compute()
+        with self._lock:
+            self._put(self._results, key, result, generation, self.result_ttl)
+        return result
+
+    def page_items(self, query, key, variant, fetch):
+        """fetch() 读取一页记录；key 不为 None 时缓存这一页的 id，命中时按 id 重新读取"""
+        if key is None:
+            return fetch()
+        fetched = []
+        def compute():
+            fetched.extend(fetch())
+            return [item.id for item in fetched]
+        ids = self.cached((key, variant), compute)
+        return fetched if fetched else self._load(query, ids)
+
+    def _load(self, query, ids):
+        if not ids:
+            return []
+        entity = query.column_descriptions[0]['entity']
+        rows = {row.id: row for row in db.session.query(entity).filter(entity.id.in_(ids))}
+        return [rows[id_] for id_ in ids if id_ in rows]
+
+    def paginate(self, query, page, per_page, key=None, estimate=None, order=None):
+        """
+        按页码分页，返回 CachedPagination；key 为 None 时不缓存（只对总数封顶）
+        order 区分同一查询条件的不同排序方式
+        """
+        return CachedPagination(page=page, per_page=per_page, max_per_page=None, error_out=False,
+                                query=query, cache=self, key=key, estimate=estimate, order=order)
+
+    def keyset(self, query, columns, cursor=None, per_page=20, key=None, estimate=None, count=True):
+        """按 columns 倒序的键集分页（keyset_paginate），count 为 True 时同时返回总数"""
+        total = self.count(query, key, estimate) if count else None
+        if key is None:
+            return keyset_paginate(query, columns, cursor, per_page, total=total)
+
+        fetched = []
+        def compute():
+            pagination = keyset_paginate(query, columns, cursor, per_page)
+            fetched.extend(pagination.items)
+            return {
+                'ids': [item.id for item in pagination.items],
+                'has_next': pagination.has_next,
+                'has_prev': pagination.has_prev,
+                'next_cursor': pagination.next_cursor,
+                'prev_cursor': pagination.prev_cursor
+            }
+        variant = ('keyset', tuple(column.key for column in columns), cursor, per_page)
+        page = self.cached((key, variant), compute)
+        return KeysetPagination(
+            items=fetched if fetched else self._load(query, page['ids']),
+            per_page=per_page,
+            has_next=page['has_next'],
+            has_prev=page['has_prev'],
+            next_cursor=page['next_cursor'],
+            prev_cursor=page['prev_cursor'],
+            total=total
+        )
+
+    def stats(self):
+        with self._lock:
+            count_lookups = self.count_hits + self.count_misses
+            result_lookups = self.result_hits + self.result_misses
+            return {
+                'generation': self.generation,
+                'bumps': self.bumps,
+                'count_entries': len(self._counts),
+                'count_hits': self.count_hits,
+                'count_misses': self.count_misses,
+                'count_hit_rate': self.count_hits / count_lookups if count_lookups else 0.0,
+                'capped_counts': self.capped_counts,
+                'result_entries': len(self._results),
+                'result_hits': self.result_hits,
+                'result_misses': self.result_misses,
+                'result_hit_rate': self.result_hits / result_lookups if result_lookups else 0.0
+            }
+
+search_cache = SearchCache()
+
+def _tender_changed(obj):
+    if not isinstance(obj, Tender):
+        return False
+    state = inspect(obj)
+    return any(
+        attr.history.has_changes()
+        for attr in state.attrs
+        if attr.key not in VOLATILE_FIELDS
+    )
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_tender_statements(orm_execute_state):
+    # 批量 INSERT / UPDATE / DELETE（入库服务用的就是批量语句）
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) == Tender.__tablename__:
+            orm_execute_state.session.info['tender_changed'] = True
+
+@event.listens_for(Session, 'after_flush')
+def _track_tender_flush(session, flush_context):
+    if any(isinstance(obj, Tender) for obj in session.new) or \
+            any(isinstance(obj, Tender) for obj in session.deleted) or \
+            any(_tender_changed(obj) for obj in session.dirty):
+        session.info['tender_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    if session.info.pop('tender_changed', False):
+        search_cache.bump()
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_on_rollback(session):
+    session.info.pop('tender_changed', None)
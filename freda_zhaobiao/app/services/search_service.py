@@ -0,0 +1,366 @@
+from ..models import Tender
+from ..extensions import db
+from ..utils.search_index import (
+    SEARCH_FIELDS, FTS_TABLE,
+    split_terms, term_phrase, estimate_tokens, needs_recheck, match_expression,
+    create_statements, drop_statements, table_sql, index_sql, index_values, source_sql, clear_sql,
+    trigram_index_name, trigram_index_statements, drop_trigram_index_statements
+)
+from sqlalchemy import select, text, table, column, literal_column, or_, and_, case, func, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+class LikeSearchBackend:
+    """逐行 ILIKE 匹配，任何数据库都可用，但每次查询都要扫描整张表"""
+    name = 'like'
+
+    def install(self):
+        return False
+
+    def rebuild(self, recreate=False):
+        return False
+
+    def index_rows(self, connection, rows):
+        """写入 [(tender_id, {字段: 原文})] 的索引，需要应用维护索引的后端才实现"""
+
+    def index_ids(self, connection, ids):
+        """按 tender 表的当前内容重新写入这些记录的索引"""
+
+    def like_condition(self, terms, fields):
+        return and_(*[
+            or_(*[getattr(Tender, field).ilike(_like_pattern(term), escape='\\') for field in fields])
+            for term in terms
+        ])
+
+    def condition(self, terms, fields):
+        return self.like_condition(terms, fields)
+
+    def estimate(self, terms):
+        """匹配数的上限，后端无法估计时返回 None"""
+        return None
+
+    def relevance(self, terms, fields, weights):
+        """没有索引打分时按命中的字段加权计数"""
+        return sum(
+            case((getattr(Tender, field).ilike(_like_pattern(term), escape='\\'), weights.get(field, 1.0)), else_=0.0)
+            for term in terms for field in fields
+        )
+
+    def rank(self, query, terms, fields, weights):
+        """返回 (加上关键词条件的查询, 相关度表达式)，相关度越大越靠前"""
+        return query.filter(self.condition(terms, fields)), self.relevance(terms, fields, weights)
+
+class SQLiteFTSBackend(LikeSearchBackend):
+    """
+    SQLite FTS5 索引（tender_fts，保存分词后的文本）
+    中文按二元组分词（见 utils/search_index），不能用索引匹配的查询词（单个汉字等）仍按 ILIKE 过滤
+    分词在 Python 中完成：ORM 新增、修改记录时由本模块的映射器事件写入索引，IngestService 的批量写入显式调用
+    index_rows / index_ids；删除记录和修改检索字段时由触发器删掉旧的索引行。
+    其他工具直接写入的记录在下次启动（install 补齐缺少的记录）或重建索引前搜不到
+    """
+    name = 'sqlite_fts5'
+    batch_size = 1000
+
+    def __init__(self):
+        self._fts = table(FTS_TABLE, column('rowid'))
+
+    def existing_sql(self):
+        return db.session.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}
+        ).scalar()
+
+    def install(self):
+        """
+        创建索引表和触发器，返回是否新建；索引表是新建的时候从 tender 表全部导入，
+        已有时只补齐索引中没有的记录（其他工具写入的、修改后还没有重新写入的）
+        已有的索引表与当前的建表语句不同（分词方式变了）时删除后重新创建
+        """
+        existing = self.existing_sql()
+        if existing is not None and existing != table_sql():
+            logger.info("全文检索索引的分词方式已变化，重新创建索引")
+            for statement in drop_statements():
+                db.session.execute(text(statement))
+            existing = None
+        for statement in create_statements():
+            db.session.execute(text(statement))
+        filled = self._fill(missing=existing is not None)
+        if existing is not None and filled:
+            logger.info(f"全文检索索引补齐了 {filled} 条记录")
+        db.session.commit()
+        return existing is None
+
+    def index_rows(self, connection, rows):
+        values = [index_values(row_id, row) for row_id, row in rows]
+        if not values:
+            return
+        for statement in index_sql():
+            connection.execute(text(statement), values)
+
+    def index_ids(self, connection, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), self.batch_size):
+            result = connection.execute(
+                select(Tender.id, *[getattr(Tender, field) for field in SEARCH_FIELDS])
+                .where(Tender.id.in_(ids[start:start + self.batch_size]))
+            )
+            self.index_rows(connection, [(row.id, row._mapping) for row in result])
+
+    def _fill(self, missing=False):
+        """按 id 分批读取 tender 表写入索引，返回写入的记录数"""
+        connection = db.session.connection()
+        sql = text(source_sql(missing=missing))
+        last_id = 0
+        filled = 0
+        while True:
+            rows = connection.execute(sql, {'last_id': last_id, 'limit': self.batch_size}).all()
+            if not rows:
+                return filled
+            self.index_rows(connection, [(row.id, row._mapping) for row in rows])
+            last_id = rows[-1].id
+            filled += len(rows)
+
+    def rebuild(self, recreate=False):
+        if recreate:
+            for statement in drop_statements():
+                db.session.execute(text(statement))
+            db.session.commit()
+            return self.install()
+        db.session.execute(text(clear_sql()))
+        self._fill()
+        db.session.commit()
+        return True
+
+    def match_ids(self, phrases, fields):
+        return select(self._fts.c.rowid).where(
+            text(f'{FTS_TABLE} MATCH :search_match').bindparams(search_match=match_expression(phrases, fields))
+        )
+
+    def _split(self, terms):
+        phrases = []
+        like_terms = []
+        for term in terms:
+            phrase = term_phrase(term)
+            if phrase is not None:
+                phrases.append(phrase)
+            # 不能用索引的词和带标点的词按 LIKE 过滤，后者只核对索引筛出的候选
+            if phrase is None or needs_recheck(term):
+                like_terms.append(term)
+        return phrases, like_terms
+
+    def rank(self, query, terms, fields, weights):
+        """
+        按 FTS5 的 bm25() 打分：与索引表连接，每个字段的权重按索引表的列顺序传入；
+        bm25() 越小越相关，取负数作为相关度。排序和分页都在 SQLite 中完成，只取出当前页
+        """
+        phrases, like_terms = self._split(terms)
+        if not phrases:
+            return super().rank(query, terms, fields, weights)
+        column_weights = ', '.join(repr(float(weights.get(field, 1.0))) for field in SEARCH_FIELDS)
+        matches = select(
+            self._fts.c.rowid.label('tender_id'),
+            literal_column(f'bm25({FTS_TABLE}, {column_weights})').label('bm25')
+        ).where(
+            text(f'{FTS_TABLE} MATCH :search_match').bindparams(search_match=match_expression(phrases, fields))
+        ).subquery('search_matches')
+        query = query.join(matches, matches.c.tender_id == Tender.id)
+        if like_terms:
+            query = query.filter(self.like_condition(like_terms, fields))
+        return query, -matches.c.bm25
+
+    def estimate(self, terms):
+        """每条匹配的记录都包含查询词的每个二元组，文档数最少的那个词的文档数就是上限"""
+        tokens = {token for term in terms for token in estimate_tokens(term)}
+        if not tokens:
+            return None
+        return min(
+            db.session.execute(
+                text(f'SELECT doc FROM {FTS_TABLE}_vocab WHERE term = :term'), {'term': token}
+            ).scalar() or 0
+            for token in tokens
+        )
+
+    def condition(self, terms, fields):
+        phrases, like_terms = self._split(terms)
+        conditions = []
+        if phrases:
+            conditions.append(Tender.id.in_(self.match_ids(phrases, fields)))
+        if like_terms:
+            conditions.append(self.like_condition(like_terms, fields))
+        return and_(*conditions)
+
+class PostgresTrigramBackend(LikeSearchBackend):
+    """
+    PostgreSQL pg_trgm GIN 索引（utils/search_index.trigram_index_statements）
+    查询条件与 LIKE 后端相同，由查询规划器选用索引；少于 3 个字符的词提取不出 trigram，仍会扫描
+    """
+    name = 'postgres_trgm'
+
+    def existing_indexes(self):
+        return set(db.session.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = 'tender'")
+        ).scalars())
+
+    def install(self):
+        """创建 pg_trgm 扩展和缺少的索引，返回是否新建了索引"""
+        missing = {trigram_index_name(field) for field in SEARCH_FIELDS} - self.existing_indexes()
+        for statement in trigram_index_statements():
+            db.session.execute(text(statement))
+        db.session.commit()
+        return bool(missing)
+
+    def rebuild(self, recreate=False):
+        if recreate:
+            for statement in drop_trigram_index_statements():
+                db.session.execute(text(statement))
+            db.session.commit()
+            return self.install()
+        for field in SEARCH_FIELDS:
+            db.session.execute(text(f'REINDEX INDEX {trigram_index_name(field)}'))
+        db.session.commit()
+        return True
+
+    def relevance(self, terms, fields, weights):
+        """PostgreSQL 没有 BM25，用 pg_trgm 的 word_similarity（查询词与字段中最相近片段的相似度）加权求和"""
+        return sum(
+            func.word_similarity(term, func.coalesce(getattr(Tender, field), '')) * weights.get(field, 1.0)
+            for term in terms for field in fields
+        )
+
+class SearchService:
+    """
+    招标信息关键词检索的统一入口
+    根据 SQLALCHEMY_DATABASE_URI 选择检索后端（SQLite 用 FTS5，PostgreSQL 用 pg_trgm，其他数据库用 LIKE），
+    search、api.get_tenders、export_data 和 QueryOptimizer.search_tenders 都通过 apply() 加关键词条件，
+    其他过滤和排序由调用方负责
+    """
+    BACKENDS = {
+        'sqlite': SQLiteFTSBackend,
+        'postgresql': PostgresTrigramBackend
+    }
+
+    def __init__(self):
+        self.enabled = True
+        self.max_terms = 10
+        self.field_weights = {'title': 5.0, 'organization': 2.0, 'summary': 1.0}
+        self.recency_weight = 0.0
+        self.recency_half_life = 30
+        self.backend = LikeSearchBackend()
+
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.rebuilds = 0
+        self.last_rebuild_at = None
+        self.last_error = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SEARCH_INDEX_ENABLED', self.enabled)
+        self.max_terms = app.config.get('SEARCH_MAX_KEYWORDS', self.max_terms)
+        self.field_weights = app.config.get('SEARCH_FIELD_WEIGHTS', self.field_weights)
+        self.recency_weight = app.config.get('SEARCH_RECENCY_WEIGHT', self.recency_weight)
+        self.recency_half_life = app.config.get('SEARCH_RECENCY_HALF_LIFE', self.recency_half_life)
+        self.backend = LikeSearchBackend()
+        backend_class = self.BACKENDS.get(make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name())
+        if not self.enabled or backend_class is None:
+            return
+        with app.app_context():
+            try:
+                backend = backend_class()
+                if backend.install():
+                    logger.info(f"已创建全文检索索引 ({backend.name})")
+                self.backend = backend
+            except SQLAlchemyError as e:
+                # SQLite 没有编译 FTS5、没有创建 pg_trgm 扩展的权限等情况下退回 LIKE
+                db.session.rollback()
+                self.last_error = str(e)
+                logger.warning(f"创建全文检索索引失败，使用 LIKE 查询: {str(e)}")
+
+    def apply(self, query, keywords, fields=SEARCH_FIELDS, sort=None):
+        """
+        给 Tender 查询加上关键词条件，keywords 为空时原样返回
+        sort 为 'relevance' 时同时按相关度（可叠加发布日期的新近度加权）排序
+        """
+        terms = split_terms(keywords, self.max_terms)
+        if not terms:
+            return query
+        with self._lock:
+            self.queries += 1
+        if sort != 'relevance':
+            return query.filter(self.backend.condition(terms, fields))
+        query, relevance = self.backend.rank(query, terms, fields, self.field_weights)
+        return query.order_by(self.boost(relevance).desc(), Tender.publish_date.desc(), Tender.id.desc())
+
+    def estimate(self, keywords):
+        """按全文索引估计 keywords 匹配数的上限（不考虑其他过滤条件），无法估计时返回 None"""
+        terms = split_terms(keywords, self.max_terms)
+        if not terms:
+            return None
+        return self.backend.estimate(terms)
+
+    def _age_days(self):
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            age = func.julianday('now') - func.julianday(Tender.publish_date)
+        elif dialect == 'postgresql':
+            age = func.current_date() - Tender.publish_date
+        else:
+            return None
+        return case((age < 0, 0), else_=age)
+
+    def boost(self, relevance):
+        """
+        新近度加权：相关度 × (1 + 权重 × 半衰期 / (半衰期 + 发布天数))
+        当天发布的乘 1 + 权重，发布半衰期天数后乘 1 + 权重/2；权重为 0 时不加权
+        """
+        if not self.recency_weight:
+            return relevance
+        age = self._age_days()
+        if age is None:
+            return relevance
+        half_life = float(self.recency_half_life)
+        return relevance * (1 + self.recency_weight * half_life / (half_life + age))
+
+    def rebuild(self, recreate=False):
+        """按 tender 表的当前内容重建索引，recreate 时先删除索引表和触发器"""
+        started = time.time()
+        rebuilt = self.backend.rebuild(recreate=recreate)
+        with self._lock:
+            if rebuilt:
+                self.rebuilds += 1
+                self.last_rebuild_at = time.time()
+        return {'backend': self.backend.name, 'rebuilt': bool(rebuilt), 'elapsed': time.time() - started}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'backend': self.backend.name,
+                'queries': self.queries,
+                'rebuilds': self.rebuilds,
+                'last_rebuild_at': self.last_rebuild_at,
+                'last_error': self.last_error
+            }
+
+search_service = SearchService()
+
+@event.listens_for(Tender, 'after_insert')
+def _index_inserted(mapper, connection, target):
+    search_service.backend.index_rows(
+        connection, [(target.id, {field: getattr(target, field) for field in SEARCH_FIELDS})]
+    )
+
+@event.listens_for(Tender, 'after_update')
+def _index_updated(mapper, connection, target):
+    # 检索字段变化时触发器已删掉旧的索引行
+    state = db.inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in SEARCH_FIELDS):
+        search_service.backend.index_ids(connection, [target.id])
@@ -0,0 +1,250 @@
+from ..models import TenderStaging, TenderStagingError, MergeWatermark
+from ..extensions import db
+from .crawl_item import as_dict
+from .ingest_service import ingest_service
+from sqlalchemy import insert, update, delete, func
+from datetime import datetime, date
+import threading
+import logging
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+class StagingService:
+    """
+    暂存写入 + 后台合并
+    - 爬虫只把结果追加到 tender_staging（JSON，只有主键索引），不在请求线程中判重和维护 tender 的索引
+    - 后台线程按 id 顺序每次取 batch_size 条，在一个事务中判重、规范化并写入 tender / tender_fingerprint，
+      同时推进水位线并删除已合并的暂存记录，暂存表中只保留尚未合并的记录
+    - 多个进程同时合并时，水位线用条件更新（last_id 未变才更新）抢占，每批只会被合并一次
+    - 写入失败的批次逐条重试，仍然失败的记录移到 tender_staging_error，不阻塞后面的合并
+    """
+    WATERMARK = 'tender_staging'
+
+    def __init__(self, batch_size=5000, interval=2):
+        self.enabled = False
+        self.batch_size = batch_size
+        self.interval = interval
+        self.app = None
+
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.staged = 0
+        self.merged_batches = 0
+        self.merged_rows = 0
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.conflicts = 0
+        self.last_merge_at = None
+        self.last_error = None
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('INGEST_STAGING_ENABLED', self.enabled)
+        self.batch_size = app.config.get('INGEST_STAGING_BATCH_SIZE', self.batch_size)
+        self.interval = app.config.get('INGEST_STAGING_INTERVAL', self.interval)
+        if self.enabled:
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='staging-merger', daemon=True)
+            self._thread.start()
+
+    def append(self, items, default_category=None, commit=True):
+        """追加爬取结果，返回写入的条数"""
+        rows = [
+            {
+                'payload': json.dumps(as_dict(item), ensure_ascii=False, default=_json_default),
+                'default_category': default_category
+            }
+            for item in items
+        ]
+        if not rows:
+            return 0
+        db.session.execute(insert(TenderStaging), rows)
+        if commit:
+            db.session.commit()
+        with self._lock:
+            self.staged += len(rows)
+        self._wakeup.set()
+        return len(rows)
+
+    def _watermark(self):
+        watermark = db.session.get(MergeWatermark, self.WATERMARK)
+        if watermark is None:
+            watermark = MergeWatermark(name=self.WATERMARK, last_id=0, merged_total=0)
+            db.session.add(watermark)
+            db.session.commit()
+        return watermark.last_id
+
+    def pending(self):
+        """尚未合并的暂存记录数量（已合并的记录会被删除）"""
+        return db.session.query(func.count(TenderStaging.id)).scalar()
+
+    def merge_once(self):
+        """
+        合并一批暂存记录，返回本批统计；没有待合并记录时返回 None
+        水位线已被其他进程推进时放弃本批，返回 {'conflict': True}
+        """
+        last_id = self._watermark()
+        db.session.commit()
+        staged = db.session.query(TenderStaging.id, TenderStaging.payload, TenderStaging.default_category)\
+            .filter(TenderStaging.id > last_id)\
+            .order_by(TenderStaging.id)\
+            .limit(self.batch_size).all()
+        if not staged:
+            db.session.rollback()
+            return None
+        new_last_id = staged[-1].id
+
+        # 先推进水位线，取得写锁后再合并，其他进程的条件更新会落空
+        claimed = db.session.execute(
+            update(MergeWatermark)
+            .where(MergeWatermark.name == self.WATERMARK, MergeWatermark.last_id == last_id)
+            .values(
+                last_id=new_last_id,
+                merged_total=MergeWatermark.merged_total + len(staged),
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            with self._lock:
+                self.conflicts += 1
+            return {'conflict': True}
+
+        stats = self._merge(staged)
+        stats['last_id'] = new_last_id
+        logger.info(f"暂存记录合并到 id {new_last_id}: {len(staged)} 条, 新增 {stats['added']}, 更新 {stats['updated']}, 跳过 {stats['skipped']}, 失败 {stats['failed']}")
+        return stats
+
+    def merge_late(self):
+        """
+        合并 id 不大于水位线、但在水位线推进后才提交的暂存记录
+        （PostgreSQL 的序列号不保证按提交顺序分配）；重复合并由判重保证不会重复写入
+        """
+        last_id = self._watermark()
+        staged = db.session.query(TenderStaging.id, TenderStaging.payload, TenderStaging.default_category)\
+            .filter(TenderStaging.id <= last_id)\
+            .order_by(TenderStaging.id)\
+            .limit(self.batch_size).all()
+        if not staged:
+            db.session.rollback()
+            return None
+        stats = self._merge(staged)
+        logger.info(f"合并延迟提交的暂存记录 {len(staged)} 条")
+        return stats
+
+    def _merge(self, staged):
+        """
+        在当前事务中写入一批暂存记录并删除它们，然后提交
+        写入失败的批次（已随保存点回滚）逐条重试，仍然失败的记录移到 tender_staging_error，
+        否则同一条记录每次都会让整批回滚、水位线无法推进
+        """
+        # 按默认分类分组，保持组内的写入顺序
+        groups = {}
+        for row in staged:
+            groups.setdefault(row.default_category, []).append(row)
+
+        stats = {'rows': len(staged), 'added': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        failed = []
+        for category, rows in groups.items():
+            items = [json.loads(row.payload) for row in rows]
+            owners = {id(item): row for item, row in zip(items, rows)}
+            result = ingest_service.ingest(items, default_category=category, commit=False)
+            for key in ('added', 'updated', 'skipped'):
+                stats[key] += result[key]
+
+            for item in result['failed']:
+                retry = ingest_service.ingest([item], default_category=category, commit=False)
+                for key in ('added', 'updated', 'skipped'):
+                    stats[key] += retry[key]
+                if retry['errors']:
+                    row = owners[id(item)]
+                    failed.append({
+                        'staging_id': row.id,
+                        'payload': row.payload,
+                        'default_category': category,
+                        'error': retry['errors'][0]
+                    })
+
+        if failed:
+            db.session.execute(insert(TenderStagingError), failed)
+            stats['failed'] = len(failed)
+            logger.error(f"{len(failed)} 条暂存记录写入失败，已移到 tender_staging_error: {failed[0]['error']}")
+        db.session.execute(delete(TenderStaging).where(TenderStaging.id.in_([row.id for row in staged])))
+        db.session.commit()
+
+        with self._lock:
+            self.merged_batches += 1
+            self.merged_rows += len(staged)
+            self.added += stats['added']
+            self.updated += stats['updated']
+            self.skipped += stats['skipped']
+            self.failed += stats['failed']
+            self.last_merge_at = time.time()
+        return stats
+
+    def merge_all(self):
+        """合并所有待合并记录，返回合并的批次数"""
+        batches = 0
+        while True:
+            stats = self.merge_once()
+            if stats is None:
+                break
+            if not stats.get('conflict'):
+                batches += 1
+        while self.merge_late() is not None:
+            batches += 1
+        return batches
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.merge_all()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"合并暂存记录失败: {str(e)}")
+                    with self._lock:
+                        self.last_error = str(e)
+                finally:
+                    db.session.remove()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'running': bool(self._thread and self._thread.is_alive()),
+                'batch_size': self.batch_size,
+                'staged': self.staged,
+                'merged_batches': self.merged_batches,
+                'merged_rows': self.merged_rows,
+                'added': self.added,
+                'updated': self.updated,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'conflicts': self.conflicts,
+                'last_merge_at': self.last_merge_at,
+                'last_error': self.last_error
+            }
+
+staging_service = StagingService()
@@ -0,0 +1,159 @@
+from ..models import Tender, SearchHistory
+from ..extensions import db
+from ..utils.prefix_index import PrefixIndex, normalize, kind_name, KIND_TITLE, KIND_ORGANIZATION, KIND_KEYWORD
+from .search_cache import search_cache
+from sqlalchemy import func
+from collections import Counter
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class SuggestService:
+    """
+    搜索框的输入建议（/api/suggest）
+    - 启动时从招标信息的标题、招标单位和搜索历史中的关键词构建前缀索引，
+      标题和单位的权重是出现的次数，关键词被搜索过 history_min_count 次以上才作为建议，权重乘 history_weight
+    - 本进程有招标信息入库（search_cache 的代数变化）时，下一次查询前按 id 增量加载新记录；
+      其他进程入库的记录和新的搜索历史每隔 catch_up_interval 秒增量加载一次
+    - 已有记录的标题修改或删除不会从索引中去掉，重启后重新构建
+    """
+    def __init__(self, limit=10, history_min_count=2, history_weight=5.0, max_length=80,
+                 merge_threshold=2000, catch_up_interval=30):
+        self.limit = limit
+        self.history_min_count = history_min_count
+        self.history_weight = history_weight
+        self.max_length = max_length
+        self.merge_threshold = merge_threshold
+        self.catch_up_interval = catch_up_interval
+
+        self._index = None
+        self._history = Counter()
+        self._last_tender_id = 0
+        self._last_history_id = 0
+        self._last_catch_up = 0
+        self._generation = None
+        self._lock = threading.RLock()
+
+        self.lookups = 0
+        self.loads = 0
+        self.added = 0
+
+    def init_app(self, app):
+        self.limit = app.config.get('SUGGEST_LIMIT', self.limit)
+        self.history_min_count = app.config.get('SUGGEST_HISTORY_MIN_COUNT', self.history_min_count)
+        self.history_weight = app.config.get('SUGGEST_HISTORY_WEIGHT', self.history_weight)
+        self.max_length = app.config.get('SUGGEST_MAX_LENGTH', self.max_length)
+        self.merge_threshold = app.config.get('SUGGEST_MERGE_THRESHOLD', self.merge_threshold)
+        self.catch_up_interval = app.config.get('SUGGEST_CATCH_UP', self.catch_up_interval)
+        try:
+            with app.app_context():
+                self.load()
+        except Exception as e:
+            # 表还不存在等情况下，第一次查询时再加载
+            logger.warning(f"启动时加载搜索建议索引失败: {str(e)}")
+
+    def _history_weight(self, count):
+        return count * self.history_weight if count >= self.history_min_count else 0
+
+    def load(self):
+        """从数据库全量构建索引"""
+        with self._lock:
+            generation = search_cache.generation
+            entries = {}
+            def collect(text, weight, kind):
+                key = normalize(text, self.max_length)
+                if not key or weight <= 0:
+                    return
+                entry = entries.get(key)
+                if entry is None:
+                    entries[key] = [' '.join(text.split())[:self.max_length], weight, kind]
+                else:
+                    entry[1] += weight
+                    entry[2] |= kind
+
+            last_tender_id = 0
+            rows = db.session.query(Tender.id, Tender.title, Tender.organization)\
+                .order_by(Tender.id).yield_per(5000)
+            for tender_id, title, organization in rows:
+                collect(title, 1, KIND_TITLE)
+                collect(organization, 1, KIND_ORGANIZATION)
+                last_tender_id = tender_id
+
+            history = Counter()
+            for keywords, count in db.session.query(SearchHistory.keywords, func.count())\
+                    .group_by(SearchHistory.keywords):
+                history[keywords.strip()] += count
+            for keywords, count in history.items():
+                collect(keywords, self._history_weight(count), KIND_KEYWORD)
+
+            index = PrefixIndex(self.max_length, self.merge_threshold)
+            index.build(entries)
+            self._index = index
+            self._history = history
+            self._last_tender_id = last_tender_id
+            self._last_history_id = db.session.query(func.max(SearchHistory.id)).scalar() or 0
+            self._last_catch_up = time.time()
+            self._generation = generation
+            self.loads += 1
+            logger.info(f"搜索建议索引已加载: {len(index)} 个词")
+
+    def _catch_up(self):
+        generation = search_cache.generation
+        rows = db.session.query(Tender.id, Tender.title, Tender.organization)\
+            .filter(Tender.id > self._last_tender_id)\
+            .order_by(Tender.id).all()
+        for tender_id, title, organization in rows:
+            self._index.add(title or '', 1, KIND_TITLE)
+            self._index.add(organization or '', 1, KIND_ORGANIZATION)
+            self._last_tender_id = tender_id
+        self.added += len(rows)
+
+        rows = db.session.query(SearchHistory.id, SearchHistory.keywords)\
+            .filter(SearchHistory.id > self._last_history_id)\
+            .order_by(SearchHistory.id).all()
+        for history_id, keywords in rows:
+            keywords = keywords.strip()
+            before = self._history_weight(self._history[keywords])
+            self._history[keywords] += 1
+            weight = self._history_weight(self._history[keywords]) - before
+            if weight > 0:
+                self._index.add(keywords, weight, KIND_KEYWORD)
+            self._last_history_id = history_id
+
+        self._generation = generation
+        self._last_catch_up = time.time()
+
+    def _ensure_current(self):
+        if self._index is None:
+            self.load()
+        elif self._generation != search_cache.generation or \
+                time.time() - self._last_catch_up > self.catch_up_interval:
+            self._catch_up()
+
+    def suggest(self, prefix, limit=None):
+        """以 prefix 开头的建议，按权重从高到低，返回 [{'text', 'type', 'weight'}, ...]"""
+        limit = min(limit or self.limit, 50)
+        if not normalize(prefix, self.max_length):
+            return []
+        with self._lock:
+            self._ensure_current()
+            self.lookups += 1
+            results = self._index.top(prefix, limit)
+        return [{'text': text, 'type': kind_name(kind), 'weight': weight} for text, weight, kind in results]
+
+    def stats(self):
+        with self._lock:
+            index = self._index
+            return {
+                'loaded': index is not None,
+                'entries': len(index) if index else 0,
+                'pending': index.pending if index else 0,
+                'merges': index.merges if index else 0,
+                'lookups': self.lookups,
+                'loads': self.loads,
+                'added': self.added
+            }
+
+suggest_service = SuggestService()
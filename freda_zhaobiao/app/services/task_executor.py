@@ -0,0 +1,216 @@
+from ..models import CrawlerTask, CrawlHistory
+from ..extensions import db
+from .crawler_service import CrawlerService
+from collections import OrderedDict, defaultdict, deque
+from urllib.parse import urlparse
+import threading
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+def split_keywords(keywords):
+    """按逗号、分号、换行拆分任务关键词，每个关键词作为一个独立的执行单元"""
+    if not keywords:
+        return []
+    parts = re.split(r'[,，;；\n]+', str(keywords))
+    return [p.strip() for p in parts if p.strip()]
+
+class TaskRun:
+    """
+    一个爬虫任务的单次执行
+    每个任务拥有独立的 CrawlerService（独立的会话和计数器），
+    同一任务的执行单元串行执行，不同任务之间并行
+    """
+    def __init__(self, task):
+        self.task_id = task.id
+        self.website = task.website
+        self.category = task.category
+        self.region = task.region
+        self.host = urlparse(task.website).netloc or task.website
+        self.units = deque(split_keywords(task.keywords) or [None])
+        self.service = CrawlerService()
+        self.history_id = None
+        self.active = False
+        self.cancelled = False
+
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+        self.staged = 0
+        self.errors = []
+
+    def record(self, result):
+        self.added += result.get('added', 0)
+        self.updated += result.get('updated', 0)
+        self.skipped += result.get('skipped', 0)
+        self.staged += result.get('staged', 0)
+        self.errors.extend(result.get('errors', []))
+
+    def result(self):
+        return {
+            'added': self.added,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'staged': self.staged,
+            'errors': self.errors
+        }
+
+class CrawlTaskExecutor:
+    """
+    并行执行多个 CrawlerTask 的执行器
+    - max_workers: 全局并发上限
+    - per_host_limit: 同一站点的并发上限
+    - 任务之间按轮转顺序调度执行单元，避免关键词很多的任务长期占满工作线程
+    """
+    def __init__(self, max_workers=4, per_host_limit=2):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.app = None
+
+        self._runs = OrderedDict()
+        self._host_active = defaultdict(int)
+        self._cond = threading.Condition()
+        self._workers = []
+        self._completed = 0
+        self._failed = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get('CRAWLER_MAX_WORKERS', self.max_workers)
+        self.per_host_limit = app.config.get('CRAWLER_PER_HOST_LIMIT', self.per_host_limit)
+
+    def submit(self, task):
+        """提交任务，任务已在队列中时返回 False；需要先调用 init_app 绑定应用（工作线程在它的上下文中执行）"""
+        if self.app is None:
+            raise RuntimeError("任务执行器尚未绑定应用，请先调用 task_executor.init_app(app)")
+
+        with self._cond:
+            if task.id in self._runs:
+                return False
+            self._runs[task.id] = TaskRun(task)
+            self._ensure_workers()
+            self._cond.notify_all()
+        return True
+
+    def cancel(self, task_id):
+        """
+        取消尚未执行的单元，正在执行的单元会在完成后结束
+        两个单元之间取消时直接结束本次执行（已有爬取记录的写入结果），需要在应用上下文中调用
+        """
+        with self._cond:
+            run = self._runs.get(task_id)
+            if not run:
+                return False
+            run.cancelled = True
+            run.units.clear()
+            finished = not run.active
+            if finished:
+                del self._runs[task_id]
+
+        if finished and run.history_id is not None:
+            self._finish(run)
+        return True
+
+    def is_running(self, task_id):
+        with self._cond:
+            return task_id in self._runs
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_workers': self.max_workers,
+                'per_host_limit': self.per_host_limit,
+                'queued_tasks': len(self._runs),
+                'active_units': sum(1 for r in self._runs.values() if r.active),
+                'pending_units': sum(len(r.units) for r in self._runs.values()),
+                'active_hosts': {h: n for h, n in self._host_active.items() if n},
+                'completed_tasks': self._completed,
+                'failed_tasks': self._failed
+            }
+
+    def _ensure_workers(self):
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_unit(self):
+        for task_id, run in self._runs.items():
+            if run.active or not run.units:
+                continue
+            if self._host_active[run.host] >= self.per_host_limit:
+                continue
+            run.active = True
+            self._host_active[run.host] += 1
+            self._runs.move_to_end(task_id)
+            return run, run.units.popleft()
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                picked = self._next_unit()
+                while picked is None:
+                    self._cond.wait()
+                    picked = self._next_unit()
+
+            run, keyword = picked
+            with self.app.app_context():
+                try:
+                    self._run_unit(run, keyword)
+                except Exception as e:
+                    logger.error(f"执行爬虫任务 {run.task_id} 出错: {str(e)}")
+                    run.errors.append(str(e))
+                    db.session.rollback()
+                finally:
+                    self._release(run)
+                db.session.remove()
+
+    def _run_unit(self, run, keyword):
+        if run.history_id is None:
+            task = db.session.get(CrawlerTask, run.task_id)
+            history = run.service.start_history(task)
+            run.history_id = history.id
+
+        result = run.service.crawl_website(run.website, keyword, run.category, run.region)
+        db.session.commit()
+        run.record(result)
+
+    def _release(self, run):
+        with self._cond:
+            run.active = False
+            self._host_active[run.host] -= 1
+            finished = not run.units
+            if finished:
+                self._runs.pop(run.task_id, None)
+            self._cond.notify_all()
+
+        if finished:
+            self._finish(run)
+
+    def _finish(self, run):
+        task = db.session.get(CrawlerTask, run.task_id)
+        history = db.session.get(CrawlHistory, run.history_id) if run.history_id else None
+        if not task or not history:
+            return
+
+        try:
+            run.service.finish_history(history, task, run.result())
+            if task.status == 'running':
+                task.status = 'stopped' if run.cancelled else 'active'
+                db.session.commit()
+            succeeded = True
+        except Exception as e:
+            db.session.rollback()
+            run.service.fail_history(history, task, e)
+            succeeded = False
+
+        with self._cond:
+            if succeeded:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+task_executor = CrawlTaskExecutor()
@@ -56,6 +56,37 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    document.querySelectorAll('input[data-suggest-url]').forEach(input => {
+        const datalist = document.getElementById(input.getAttribute('list'));
+        let timer = null;
+        let latest = '';
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const q = input.value.trim();
+            if (!q || !datalist) {
+                return;
+            }
+            timer = setTimeout(() => {
+                latest = q;
+                fetch(`${input.dataset.suggestUrl}?q=${encodeURIComponent(q)}`)
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.query.trim() !== latest) {
+                            return;
+                        }
+                        datalist.innerHTML = '';
+                        data.suggestions.forEach(item => {
+                            const option = document.createElement('option');
+                            option.value = item.text;
+                            datalist.appendChild(option);
+                        });
+                    })
+                    .catch(() => {});
+            }, 150);
+        });
+    });
+
     const favoriteBtns = document.querySelectorAll('.favorite-btn');
     favoriteBtns.forEach(btn => {
         btn.addEventListener('click', function(e) {
@@ -1,6 +1,8 @@
 from flask import request
 from ..extensions import db, cache
 from ..models import Tender
+from ..services.search_service import search_service
+from ..services.search_cache import search_cache, search_key
 from functools import wraps
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
@@ -100,7 +102,7 @@ class QueryOptimizer:
         )
 
     @staticmethod
-    def paginate_query(query, page, per_page, error_out=False):
+    def paginate_query(query, page, per_page, error_out=False, cache_key=None, estimate=None):
         if page < 1:
             page = 1
         if per_page < 1:
@@ -108,17 +110,18 @@ class QueryOptimizer:
         if per_page > 100:
             per_page = 100
         
-        total = query.count()
-        pages = (total + per_page - 1) // per_page if total > 0 else 0
+        # 总数和本页结果按 cache_key 缓存，总数超过上限时为 "10,000+"（total_capped 为 True）
+        pagination = search_cache.paginate(query, page, per_page, key=cache_key, estimate=estimate, order='query_optimizer')
+        total = pagination.total
+        pages = pagination.pages
         
         if error_out and page > pages and pages > 0:
             return None
         
-        items = query.limit(per_page).offset((page - 1) * per_page).all()
-        
         return {
-            'items': items,
+            'items': pagination.items,
             'total': total,
+            'total_capped': total.capped,
             'page': page,
             'per_page': per_page,
             'pages': pages,
@@ -147,15 +150,7 @@ class QueryOptimizer:
     def search_tenders(query_string, filters=None, page=1, per_page=20):
         base = Tender.query.filter(Tender.status == 'active')
         
-        if query_string:
-            search = f'%{query_string}%'
-            base = base.filter(
-                db.or_(
-                    Tender.title.ilike(search),
-                    Tender.summary.ilike(search),
-                    Tender.organization.ilike(search)
-                )
-            )
+        base = search_service.apply(base, query_string)
         
         if filters:
             if filters.get('category'):
@@ -169,7 +164,9 @@ class QueryOptimizer:
         
         base = base.order_by(Tender.publish_date.desc())
         
-        return QueryOptimizer.paginate_query(base, page, per_page)
+        cache_key = search_key('search', query_string, **(filters or {}))
+        return QueryOptimizer.paginate_query(base, page, per_page, cache_key=cache_key,
+                                             estimate=search_service.estimate(query_string))
 
     @staticmethod
     def get_popular_tenders(limit=10, days=7):
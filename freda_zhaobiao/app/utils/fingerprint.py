@@ -0,0 +1,117 @@
+from datetime import date, datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote, unquote
+import hashlib
+import re
+import unicodedata
+
+# 招标信息指纹：标题 + 招标单位 + 发布日期，规范化后做 BLAKE2b（16 字节）哈希
+# 同样的内容无论来自爬虫、Excel 导入还是接口，都得到同样的指纹
+
+_whitespace = re.compile(r'\s+', re.UNICODE)
+_date_formats = ('%Y-%m-%d', '%Y/%m/%d', '%Y年%m月%d日', '%Y.%m.%d', '%Y%m%d', '%Y-%m-%d %H:%M:%S')
+
+def normalize_text(value):
+    """全角转半角（NFKC）、去掉所有空白、转小写"""
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKC', str(value))
+    return _whitespace.sub('', text).lower()
+
+def normalize_date(value):
+    """日期统一为 YYYY-MM-DD，无法解析的字符串按文本规范化"""
+    if value is None or value == '':
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    for fmt in _date_formats:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return normalize_text(text)
+
+def fingerprint_key(title, organization=None, publish_date=None):
+    """参与哈希的规范化内容"""
+    return '\x1f'.join((normalize_text(title), normalize_text(organization), normalize_date(publish_date)))
+
+def tender_fingerprint(title, organization=None, publish_date=None):
+    """返回 32 位十六进制指纹"""
+    key = fingerprint_key(title, organization, publish_date)
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+def fingerprint_of(tender):
+    """根据 Tender 记录计算指纹"""
+    return tender_fingerprint(tender.title, tender.organization, tender.publish_date)
+
+# 来源标识：同一站点上同一个地址的公告视为同一条记录，重新爬取时据此判断是新增还是更新
+# 内容哈希：参与比较的字段规范化后哈希，用来判断已有记录是否发生了变化
+
+CONTENT_FIELDS = ('title', 'organization', 'publish_date', 'location', 'summary', 'content', 'category')
+
+# 只用于统计来源、不影响页面内容的查询参数，只列出确定是跟踪用途的名称：
+# from、source、ref、share、scene 之类的通用名称在政府网站的内容管理系统中常常是真正的页面参数，去掉后不同页面会得到同一个地址哈希
+# 修改后需要执行 python migrate_db.py sources --rebuild 重新计算已有记录的来源标识和地址哈希
+TRACKING_PARAMS = frozenset((
+    'spm', 'isappinstalled', 'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid',
+    'mc_cid', 'mc_eid', 'ref_src', '_hsenc', '_hsmi'
+))
+TRACKING_PREFIXES = ('utm_',)
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def canonical_source_url(url):
+    """
+    地址的规范形式（只用于判断是否同一页面，不用于访问）：
+    http/https 统一为 https，域名转小写并去掉 www. 和默认端口，路径统一编码并去掉末尾斜杠，
+    去掉跟踪参数和锚点，其余查询参数按名称排序
+    """
+    if not url:
+        return ''
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower()
+    if scheme == 'http':
+        scheme = 'https'
+    host = (parts.hostname or '').lower().rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port not in (80, 443):
+        host = f'{host}:{port}'
+    path = quote(unquote(parts.path), safe="/:@!$&'()*+,;=-._~").rstrip('/') or '/'
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    ))
+    return urlunsplit((scheme, host, path, query, ''))
+
+def url_hash(url):
+    """规范地址的 32 位十六进制哈希，没有地址时返回 None"""
+    url = canonical_source_url(url)
+    if not url:
+        return None
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+
+def source_key(source_url, site=None):
+    """返回 32 位十六进制来源标识，没有地址时返回 None"""
+    url = canonical_source_url(source_url)
+    if not url:
+        return None
+    key = '\x1f'.join((normalize_text(site), url))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+def content_hash(row):
+    """根据记录（字典或 Tender）的内容字段计算 32 位十六进制哈希"""
+    get = row.get if isinstance(row, dict) else lambda field: getattr(row, field, None)
+    key = '\x1f'.join(
+        normalize_date(get(field)) if field == 'publish_date' else normalize_text(get(field))
+        for field in CONTENT_FIELDS
+    )
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
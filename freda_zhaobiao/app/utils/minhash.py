@@ -0,0 +1,191 @@
+import hashlib
+import re
+import unicodedata
+import numpy as np
+
+# 近似重复检测：标题 + 招标单位去掉标点后切成字符 n-gram，计算 MinHash 签名，
+# 再把签名分段（band）哈希到 LSH 桶中，只有至少一段完全相同的记录才需要精确比较
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_non_word = re.compile(r'[\W_]+', re.UNICODE)
+_digits = re.compile(r'\d+')
+
+def shingle_text(*parts):
+    """全角转半角（NFKC）、去掉空白和标点、转小写后拼接"""
+    text = unicodedata.normalize('NFKC', ''.join(str(part) for part in parts if part))
+    return _non_word.sub('', text).lower()
+
+def shingles(text, size=2):
+    """字符 n-gram 集合（中文按字切分，默认用二元组）"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def title_numbers(title):
+    """标题中的数字序列（标段号、项目编号等），数字不同的标题即使很相似也不是同一条公告"""
+    text = unicodedata.normalize('NFKC', str(title or ''))
+    return tuple(number.lstrip('0') or '0' for number in _digits.findall(text))
+
+def candidate_probability(similarity, bands, rows):
+    """相似度为 similarity 的两条记录至少有一段相同（成为候选）的概率"""
+    return 1 - (1 - similarity ** rows) ** bands
+
+def _area(y, x):
+    """梯形法求积分"""
+    return float(np.sum((y[1:] + y[:-1]) / 2 * np.diff(x)))
+
+def optimal_bands(threshold, num_perm, fp_weight=0.5, fn_weight=0.5):
+    """
+    选择分段数和每段行数：最小化相似度低于阈值却成为候选（误报）
+    和高于阈值却没有成为候选（漏报）的概率加权和
+    """
+    low = np.linspace(0, threshold, 200)
+    high = np.linspace(threshold, 1, 200)
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positive = _area(candidate_probability(low, bands, rows), low)
+            false_negative = _area(1 - candidate_probability(high, bands, rows), high)
+            error = fp_weight * false_positive + fn_weight * false_negative
+            if best is None or error < best[0]:
+                best = (error, bands, rows)
+    return best[1], best[2]
+
+def similarity(a, b):
+    """两个签名估计的 Jaccard 相似度"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+class MinHasher:
+    """用 num_perm 个 (a * x + b) mod p 的随机哈希函数计算 MinHash 签名（uint32 数组）"""
+    def __init__(self, num_perm=128, shingle_size=2, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        values = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+             for s in shingles(text, self.shingle_size)],
+            dtype=np.uint64
+        )
+        if not len(values):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # uint64 乘法溢出按 2^64 取模，与常见 MinHash 实现一致
+        hashed = ((np.outer(values, self.a) + self.b) % _MERSENNE_PRIME) & _MAX_HASH
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def signature_of(self, title, organization=None):
+        return self.signature(shingle_text(title, organization))
+
+    def from_bytes(self, data):
+        return np.frombuffer(data, dtype=np.uint32)
+
+class MinHashLSH:
+    """
+    LSH 桶：每个签名按 bands 段分别哈希成 64 位键
+    批量加载的键放在排序后的 numpy 数组中（二分查找），之后新增的键先放在字典里，
+    积累到一定数量后合并，内存占用约为 每条记录 16 字节 x 分段数
+    """
+    def __init__(self, threshold=0.8, num_perm=128, merge_size=10000, seed=2):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        self.merge_size = merge_size
+        generator = np.random.RandomState(seed)
+        self._multipliers = generator.randint(1, _MERSENNE_PRIME, self.rows, dtype=np.uint64) | np.uint64(1)
+        self._salts = generator.randint(0, _MERSENNE_PRIME, self.bands, dtype=np.uint64)
+
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._pending = {}
+        self._pending_count = 0
+        self.count = 0
+
+    def band_keys(self, signatures):
+        """(n, num_perm) 的签名矩阵 -> (n, bands) 的桶键"""
+        signatures = np.atleast_2d(signatures)
+        used = signatures[:, :self.bands * self.rows].astype(np.uint64)
+        used = used.reshape(len(signatures), self.bands, self.rows)
+        return (used * self._multipliers).sum(axis=2) ^ self._salts
+
+    def build(self, ids, signatures):
+        """用一批签名重建全部桶"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids):
+            keys = self.band_keys(signatures).ravel()
+            ids = np.repeat(ids, self.bands)
+        else:
+            keys = np.empty(0, dtype=np.uint64)
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._ids = ids[order]
+        self._pending = {}
+        self._pending_count = 0
+        self.count = len(self._keys) // self.bands
+
+    def add(self, ids, signatures):
+        if not len(ids):
+            return
+        for item_id, keys in zip(ids, self.band_keys(signatures).tolist()):
+            for key in keys:
+                self._pending.setdefault(key, []).append(item_id)
+        self._pending_count += len(ids)
+        self.count += len(ids)
+        if self._pending_count >= self.merge_size:
+            self._merge()
+
+    def remove(self, ids):
+        """删除一批记录的全部桶键（顺序扫描一遍数组，适合攒够一批后调用）"""
+        ids = np.fromiter(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        keep = ~np.isin(self._ids, ids)
+        removed = len(keep) - int(keep.sum())
+        self._keys = self._keys[keep]
+        self._ids = self._ids[keep]
+
+        removed_ids = set(ids.tolist())
+        pending_removed = 0
+        for key in list(self._pending):
+            bucket = [item_id for item_id in self._pending[key] if item_id not in removed_ids]
+            pending_removed += len(self._pending[key]) - len(bucket)
+            if bucket:
+                self._pending[key] = bucket
+            else:
+                del self._pending[key]
+        self._pending_count -= pending_removed // self.bands
+        self.count -= (removed + pending_removed) // self.bands
+
+    def _merge(self):
+        keys = []
+        ids = []
+        for key, bucket in self._pending.items():
+            keys.extend([key] * len(bucket))
+            ids.extend(bucket)
+        keys = np.concatenate([self._keys, np.array(keys, dtype=np.uint64)])
+        ids = np.concatenate([self._ids, np.array(ids, dtype=np.int64)])
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._ids = ids[order]
+        self._pending = {}
+        self._pending_count = 0
+
+    def query(self, signature):
+        """返回与 signature 至少有一段相同的记录 id 集合"""
+        keys = self.band_keys(signature)[0]
+        left = np.searchsorted(self._keys, keys, side='left')
+        right = np.searchsorted(self._keys, keys, side='right')
+        candidates = set()
+        for start, end in zip(left.tolist(), right.tolist()):
+            if end > start:
+                candidates.update(self._ids[start:end].tolist())
+        for key in keys.tolist():
+            candidates.update(self._pending.get(key, ()))
+        return candidates
+
+    def memory_bytes(self):
+        # 字典中的每个键值对按约 100 字节估算
+        return self._keys.nbytes + self._ids.nbytes + self._pending_count * self.bands * 100
@@ -0,0 +1,64 @@
+"""
+多模式串匹配（Aho-Corasick 自动机）
+只依赖标准库。一次扫描文本即可找出所有出现的模式串（包括互相重叠、互为子串的），
+耗时与文本长度成正比，与模式串的数量无关
+"""
+from collections import deque
+
+class PatternMatcher:
+    """
+    goto 为每个状态的转移表（字符 -> 状态），fail 为失配时回退的状态，
+    output 为到达该状态时匹配到的模式串（已合并沿 fail 链可达的输出）
+    """
+    def __init__(self, patterns=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self.patterns = []
+        for pattern in dict.fromkeys(patterns):
+            if pattern:
+                self._insert(pattern)
+        self._build()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def _insert(self, pattern):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] = (pattern,)
+        self.patterns.append(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """返回 text 中出现的模式串集合"""
+        found = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
@@ -0,0 +1,95 @@
+"""
+键集分页（keyset / cursor pagination）
+按 (publish_date, id) 这类排序键倒序翻页，下一页的条件是 "排序键 < 本页最后一条的排序键"，
+数据库沿索引直接定位，不需要 OFFSET 跳过前面的记录，翻到多深都一样快。
+翻页位置编码成不透明的游标字符串，模板和 JSON 接口只需原样传回
+"""
+from sqlalchemy import tuple_
+from datetime import date, datetime
+import binascii
+import base64
+import json
+
+def _dump(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _load(value, column):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+def encode_cursor(values, direction='next'):
+    payload = json.dumps([direction] + [_dump(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token, columns):
+    """返回 (方向, 排序键的值)；游标为空或无法解析时返回 None（从第一页开始）"""
+    if not token:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        direction, values = payload[0], payload[1:]
+        if direction not in ('next', 'prev') or len(values) != len(columns):
+            return None
+        return direction, [_load(value, column) for value, column in zip(values, columns)]
+    except (binascii.Error, ValueError, TypeError, IndexError, UnicodeDecodeError):
+        return None
+
+class KeysetPagination:
+    """
+    一页键集分页结果，字段与 Flask-SQLAlchemy 的 Pagination 相近（items、has_next、has_prev、total）
+    没有页码；total 由调用方统计后传入（通常经过 search_cache.count() 缓存），否则为 None
+    """
+    cursor_based = True
+
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, total=None):
+    """
+    按 columns 倒序（最新的在前）分页，columns 的最后一列必须唯一（通常是主键）
+    cursor 是上一页返回的 next_cursor / prev_cursor；total 是调用方统计好的总数，原样放进结果
+    """
+    position = decode_cursor(cursor, columns)
+    backwards = position is not None and position[0] == 'prev'
+
+    page_query = query
+    if position is not None:
+        key, values = tuple_(*columns), tuple_(*position[1])
+        page_query = page_query.filter(key > values if backwards else key < values)
+    order = [column.asc() if backwards else column.desc() for column in columns]
+    items = page_query.order_by(None).order_by(*order).limit(per_page + 1).all()
+
+    more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = position is not None, more
+
+    def keys(item):
+        return [getattr(item, column.key) for column in columns]
+
+    return KeysetPagination(
+        items=items,
+        per_page=per_page,
+        has_next=has_next and bool(items),
+        has_prev=has_prev and bool(items),
+        next_cursor=encode_cursor(keys(items[-1]), 'next') if items and has_next else None,
+        prev_cursor=encode_cursor(keys(items[0]), 'prev') if items and has_prev else None,
+        total=total
+    )
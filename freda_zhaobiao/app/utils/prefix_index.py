@@ -0,0 +1,151 @@
+"""
+搜索建议用的前缀索引
+只依赖标准库和 numpy，基准测试脚本可以直接按文件加载
+
+建议词按规范化后的文本排好序放在列表里，同一前缀的词在列表中是连续的一段，
+二分查找得到这一段后，在对应的权重数组上取权重最大的 k 个。效果等同于在字典树的每个节点上保存前 k 个词，
+但不需要为每个字符建节点（百万条标题的字典树有上千万个节点，用 Python 对象保存要占用数 GB 内存）。
+已有词的权重直接在数组上累加；新词先放进一个小的有序缓冲区，攒够一批后再合并进主数组
+"""
+from bisect import bisect_left, insort
+import heapq
+import numpy as np
+
+# 来源，按位组合：同一个词可能既是标题又是搜索过的关键词
+KIND_TITLE = 1
+KIND_ORGANIZATION = 2
+KIND_KEYWORD = 4
+KIND_NAMES = ((KIND_KEYWORD, 'keyword'), (KIND_ORGANIZATION, 'organization'), (KIND_TITLE, 'title'))
+
+_END = '\U0010ffff'
+
+def normalize(text, max_length=80):
+    """建议词的键：合并空白、转小写，过长的截断"""
+    if not text:
+        return ''
+    return ' '.join(text.split()).lower()[:max_length]
+
+def kind_name(kind):
+    for bit, name in KIND_NAMES:
+        if kind & bit:
+            return name
+    return None
+
+class PrefixIndex:
+    """
+    keys 为排好序的规范化文本，weights / kinds 与之一一对应；
+    原文与键不同（有大写字母、多余空白）时原文保存在 display 中
+    """
+    # 区间不超过这个长度时直接用 heapq 取前 k 个，更长时用 numpy 的 argpartition
+    SMALL_RANGE = 256
+
+    def __init__(self, max_length=80, merge_threshold=2000):
+        self.max_length = max_length
+        self.merge_threshold = merge_threshold
+
+        self.keys = []
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.kinds = np.zeros(0, dtype=np.uint8)
+        self.display = {}
+
+        # 新词的缓冲区：有序的键列表 + 键 -> [权重, 来源]
+        self._pending_keys = []
+        self._pending = {}
+        self.merges = 0
+
+    def __len__(self):
+        return len(self.keys) + len(self._pending_keys)
+
+    @property
+    def pending(self):
+        return len(self._pending_keys)
+
+    def build(self, entries):
+        """entries: 键 -> (原文, 权重, 来源)，一次性构建（启动时全量加载）"""
+        self.keys = sorted(entries)
+        self.weights = np.fromiter((entries[key][1] for key in self.keys), dtype=np.float64, count=len(self.keys))
+        self.kinds = np.fromiter((entries[key][2] for key in self.keys), dtype=np.uint8, count=len(self.keys))
+        self.display = {key: entries[key][0] for key in self.keys if entries[key][0] != key}
+        self._pending_keys = []
+        self._pending = {}
+
+    def _position(self, key):
+        pos = bisect_left(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            return pos
+        return None
+
+    def add(self, text, weight, kind):
+        """累加一个词的权重，新词进入缓冲区；返回是否是新词"""
+        key = normalize(text, self.max_length)
+        if not key:
+            return False
+        pos = self._position(key)
+        if pos is not None:
+            self.weights[pos] += weight
+            self.kinds[pos] |= kind
+            return False
+        entry = self._pending.get(key)
+        if entry is not None:
+            entry[0] += weight
+            entry[1] |= kind
+            return False
+        self._pending[key] = [weight, kind]
+        insort(self._pending_keys, key)
+        shown = ' '.join(text.split())[:self.max_length]
+        if shown != key:
+            self.display[key] = shown
+        if len(self._pending_keys) >= self.merge_threshold:
+            self.merge()
+        return True
+
+    def merge(self):
+        """把缓冲区的新词按顺序插入主数组（numpy.insert 与列表切片拼接，都是顺序复制）"""
+        if not self._pending_keys:
+            return
+        positions = [bisect_left(self.keys, key) for key in self._pending_keys]
+        weights = [self._pending[key][0] for key in self._pending_keys]
+        kinds = [self._pending[key][1] for key in self._pending_keys]
+
+        keys = []
+        start = 0
+        for pos, key in zip(positions, self._pending_keys):
+            keys.extend(self.keys[start:pos])
+            keys.append(key)
+            start = pos
+        keys.extend(self.keys[start:])
+
+        self.weights = np.insert(self.weights, positions, weights)
+        self.kinds = np.insert(self.kinds, positions, np.array(kinds, dtype=np.uint8))
+        self.keys = keys
+        self._pending_keys = []
+        self._pending = {}
+        self.merges += 1
+
+    def _range(self, keys, prefix):
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + _END)
+
+    def top(self, prefix, k=10):
+        """以 prefix 开头、权重最大的 k 个词，返回 [(原文, 权重, 来源), ...]"""
+        prefix = normalize(prefix, self.max_length)
+        if not prefix or k <= 0:
+            return []
+
+        lo, hi = self._range(self.keys, prefix)
+        if hi - lo <= self.SMALL_RANGE:
+            candidates = heapq.nlargest(k, range(lo, hi), key=self.weights.__getitem__)
+        else:
+            window = self.weights[lo:hi]
+            best = np.argpartition(-window, k)[:k] if hi - lo > k else np.arange(hi - lo)
+            candidates = (best + lo).tolist()
+        results = [(self.keys[i], float(self.weights[i]), int(self.kinds[i])) for i in candidates]
+
+        plo, phi = self._range(self._pending_keys, prefix)
+        results.extend(
+            (key, float(self._pending[key][0]), self._pending[key][1])
+            for key in self._pending_keys[plo:phi]
+        )
+
+        # 权重相同时短的词在前
+        results.sort(key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [(self.display.get(key, key), weight, kind) for key, weight, kind in results[:k]]
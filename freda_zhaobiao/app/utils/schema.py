@@ -0,0 +1,79 @@
+from ..extensions import db
+from .search_index import FTS_TABLE, table_sql, drop_statements
+from sqlalchemy import inspect, text
+import logging
+
+logger = logging.getLogger(__name__)
+
+def ensure_schema():
+    """
+    为已经存在的表补上模型中新增的列和索引，删除分词方式已变化的全文索引，检查是否还有以文本保存的指纹
+    db.create_all 只创建缺少的表，不会修改已有的表；新增的列都是可空的，直接 ADD COLUMN 即可
+    需要在应用上下文中调用
+    """
+    engine = db.engine
+    preparer = engine.dialect.identifier_preparer
+    inspector = inspect(engine)
+    added = []
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f'ALTER TABLE {preparer.format_table(table)} '
+                    f'ADD COLUMN {preparer.format_column(column)} {column_type}'
+                ))
+                added.append(f'{table.name}.{column.name}')
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        indexes = {index['name'] for index in inspect(engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(engine)
+                added.append(index.name)
+
+    if engine.dialect.name == 'sqlite' and drop_outdated_search_index(engine):
+        # 旧版本的触发器调用 search_tokens()，本版本不再注册这个函数，不先删除的话写入 tender 就会失败
+        added.append(f'{FTS_TABLE} 分词方式已变化，删除后由 search_service 重新创建')
+
+    if inspector.has_table('tender_fingerprint') and has_text_fingerprints(engine):
+        # 二进制的查询条件不会等于以文本保存的旧指纹，判重会失效；转换可能合并、删除记录，
+        # 不能在每个工作进程导入时并发执行，由管理员运行迁移命令（migrate_db 导入应用时也会走到这里，不能拒绝启动）
+        logger.error("指纹仍以文本保存，判重不会命中，重复记录会被直接插入；"
+                     "请停止应用后执行 python migrate_db.py fingerprints-binary")
+
+    if added:
+        logger.info(f"已补充数据库结构: {', '.join(added)}")
+    return added
+
+def drop_outdated_search_index(engine):
+    """建表语句与当前版本不同的 SQLite 全文索引表连同触发器一起删除，返回是否删除"""
+    with engine.begin() as conn:
+        existing = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+        ).scalar()
+        if existing is None or existing == table_sql():
+            return False
+        for statement in drop_statements():
+            conn.execute(text(statement))
+    return True
+
+def has_text_fingerprints(engine):
+    """指纹列中是否还有未转换为二进制的值（SQLite 按值的存储类型判断，PostgreSQL 按列类型判断）"""
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            return conn.execute(text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'tender_fingerprint' AND column_name = 'fingerprint'"
+            )).scalar() != 'bytea'
+        return conn.execute(text(
+            "SELECT 1 FROM tender_fingerprint WHERE typeof(fingerprint) = 'text' LIMIT 1"
+        )).first() is not None
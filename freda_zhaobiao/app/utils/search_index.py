@@ -0,0 +1,155 @@
+"""
+全文检索索引的 SQL 和分词（SQLite FTS5 / PostgreSQL pg_trgm）
+只依赖标准库，基准测试脚本可以直接按文件加载
+
+中文没有词边界，FTS5 自带的 unicode61 分词会把一整段汉字当成一个词。这里在写入索引和查询时
+用同一个 search_tokens() 分词：连续的汉字切成相邻两个字的二元组（"医疗设备" -> 医疗 疗设 设备），
+字母和数字分别按连续的一段切分（"ZB2025" -> zb 2025）并转小写，词之间用空格分隔后交给 unicode61 按空格切开。
+查询词按同样的方式切分后作为短语匹配，二元组位置连续，所以任意位置、至少两个字的中文子串都能命中。
+分词在 Python 中完成，索引由应用写入（见 services/search_service），数据库中不需要注册任何函数。
+"""
+import re
+
+SEARCH_FIELDS = ('title', 'summary', 'organization')
+FTS_TABLE = 'tender_fts'
+FTS_TOKENIZE = 'unicode61'
+
+_CJK = '㐀-䶿一-鿿豈-﫿'
+_TOKEN_RE = re.compile(f'([{_CJK}]+)|([^\\W\\d_{_CJK}]+|\\d+)')
+
+def _tokens(text):
+    """返回 (token, 是否汉字) 列表"""
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(text or ''):
+        if word:
+            tokens.append((word.lower(), False))
+        elif len(cjk) == 1:
+            tokens.append((cjk, True))
+        else:
+            tokens.extend((cjk[i:i + 2], True) for i in range(len(cjk) - 1))
+    return tokens
+
+def search_tokens(text):
+    """写入索引的文本：空格分隔的分词结果"""
+    if not text:
+        return ''
+    return ' '.join(token for token, _ in _tokens(text))
+
+def split_terms(query, max_terms=10):
+    """按空白拆分查询词，去掉重复的词；多个词之间是"并且"的关系"""
+    terms = []
+    for term in re.split(r'\s+', query or ''):
+        if term and term not in terms:
+            terms.append(term)
+    return terms[:max_terms]
+
+def _phrase_tokens(term):
+    """
+    查询词中用索引匹配的部分，返回 (词列表, 末尾是否按前缀匹配, 是否只是候选)，不能用索引时返回 None
+    - 查询词开头的一段可能是原文中某个词的后半部分："ZB2026" 在 "GZB2026" 中、单个汉字是一段汉字的最后一个字，
+      原文中没有对应的词。去掉开头这一段，其余部分从原文的词边界开始，按索引筛出候选后还要用 LIKE 核对
+    - 以单个汉字或字母数字结尾时用前缀匹配，"2024年" 可以命中 "2024年度" 中的 "年度"
+    """
+    tokens = _tokens(term)
+    partial = bool(tokens) and _TOKEN_RE.match(term) is not None and (not tokens[0][1] or len(tokens[0][0]) == 1)
+    if partial:
+        tokens = tokens[1:]
+    if not tokens:
+        return None
+    last, last_cjk = tokens[-1]
+    return [token for token, _ in tokens], not last_cjk or len(last) == 1, partial
+
+def term_phrase(term):
+    """把查询词转成 FTS5 短语，不能用索引匹配时（如单个字母数字或汉字）返回 None，调用方改用 LIKE"""
+    parts = _phrase_tokens(term)
+    if parts is None:
+        return None
+    tokens, prefix, _ = parts
+    phrase = '"' + ' '.join(tokens) + '"'
+    return phrase + ' *' if prefix else phrase
+
+def estimate_tokens(term):
+    """查询词中精确匹配的词（不含末尾按前缀匹配的词），用于按词的文档数估计匹配数的上限"""
+    parts = _phrase_tokens(term)
+    if parts is None:
+        return []
+    tokens, prefix, _ = parts
+    return tokens[:-1] if prefix else tokens
+
+def needs_recheck(term):
+    """索引只能筛出候选，还要用 LIKE 核对原文：查询词中有分词时丢掉的标点等字符，或开头一段没有用索引匹配"""
+    parts = _phrase_tokens(term)
+    return bool(_TOKEN_RE.sub('', term)) or (parts is not None and parts[2])
+
+def match_expression(phrases, fields=SEARCH_FIELDS):
+    """生成 MATCH 表达式：每个短语都要在 fields 的任一列中出现"""
+    expression = ' AND '.join(phrases)
+    if tuple(fields) == SEARCH_FIELDS:
+        return expression
+    return '{%s} : (%s)' % (' '.join(fields), expression)
+
+def create_statements(table='tender', fields=SEARCH_FIELDS, fts_table=FTS_TABLE, tokenize=FTS_TOKENIZE):
+    """
+    索引表保存分词后的文本，按 rowid（tender.id）就能删除，不需要旧值重新分词；
+    新增和修改的记录由应用用 index_values() 分词后写入（index_sql）。
+    触发器只做删除：任何路径删除记录、修改检索字段时都去掉旧的索引行，不调用自定义函数，
+    其他工具直接写 tender 表也不会出错，新写入的记录在下次同步（source_sql 的 missing）前搜不到
+    """
+    columns = ', '.join(fields)
+    delete_old = f"DELETE FROM {fts_table} WHERE rowid = old.id;"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({columns}, tokenize='{tokenize}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {columns} ON {table} BEGIN {delete_old} END",
+        # 每个词出现在多少条记录中（term, doc, cnt），用于估计匹配数
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table}_vocab USING fts5vocab({fts_table}, 'row')",
+    ]
+
+def table_sql(fts_table=FTS_TABLE):
+    """sqlite_master 中索引表应有的建表语句，不一致时说明分词方式变了，需要重新创建"""
+    return create_statements(fts_table=fts_table)[0].replace('IF NOT EXISTS ', '')
+
+def drop_statements(fts_table=FTS_TABLE):
+    # ai 是旧版本写入时调用 search_tokens() 的触发器
+    return [f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}" for suffix in ('ai', 'ad', 'au')] + \
+        [f"DROP TABLE IF EXISTS {fts_table}_vocab", f"DROP TABLE IF EXISTS {fts_table}"]
+
+def index_sql(fields=SEARCH_FIELDS, fts_table=FTS_TABLE):
+    """写入一条记录的索引行，参数由 index_values() 生成；先删除同一 rowid 的旧行，重复写入也不会重复"""
+    columns = ', '.join(fields)
+    values = ', '.join(f':{field}' for field in fields)
+    return [
+        f"DELETE FROM {fts_table} WHERE rowid = :rowid",
+        f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (:rowid, {values})",
+    ]
+
+def index_values(row_id, row, fields=SEARCH_FIELDS):
+    """row 为字段名到原文的映射（dict 或查询结果行的 _mapping）"""
+    values = {field: search_tokens(row.get(field)) for field in fields}
+    values['rowid'] = row_id
+    return values
+
+def source_sql(table='tender', fields=SEARCH_FIELDS, fts_table=FTS_TABLE, missing=False):
+    """按 id 顺序分批读取要写入索引的原文（参数 :last_id、:limit），missing 时只读索引中没有的记录"""
+    columns = ', '.join(fields)
+    condition = f" AND id NOT IN (SELECT rowid FROM {fts_table})" if missing else ''
+    return f"SELECT id, {columns} FROM {table} WHERE id > :last_id{condition} ORDER BY id LIMIT :limit"
+
+def clear_sql(fts_table=FTS_TABLE):
+    return f"DELETE FROM {fts_table}"
+
+def trigram_index_name(field, table='tender'):
+    return f'ix_{table}_{field}_trgm'
+
+def trigram_index_statements(table='tender', fields=SEARCH_FIELDS):
+    """
+    PostgreSQL：每个字段一个 pg_trgm 的 GIN 索引，ILIKE '%词%' 直接用索引（多个字段的 OR 走 BitmapOr）
+    不需要分词，结果与 LIKE 完全一致；汉字要按字母数字参与 trigram，数据库的 LC_CTYPE 需为 UTF-8
+    """
+    return ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+        f'CREATE INDEX IF NOT EXISTS {trigram_index_name(field, table)} ON {table} USING gin ({field} gin_trgm_ops)'
+        for field in fields
+    ]
+
+def drop_trigram_index_statements(table='tender', fields=SEARCH_FIELDS):
+    return [f'DROP INDEX IF EXISTS {trigram_index_name(field, table)}' for field in fields]
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+对比爬取条目使用字典和 CrawlItem（__slots__）时的内存占用
+"""
+import os
+import sys
+import importlib.util
+import tracemalloc
+from datetime import date
+
+# 直接加载模块文件，避免导入 app 包时初始化整个应用
+spec = importlib.util.spec_from_file_location(
+    'crawl_item',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'services', 'crawl_item.py')
+)
+crawl_item = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(crawl_item)
+CrawlItem = crawl_item.CrawlItem
+
+SITES = [(f'某某市政府采购网{i}', f'https://www.ccgp-city{i}.gov.cn') for i in range(20)]
+CATEGORIES = ['engineering', 'goods', 'services', 'procurement', 'other']
+
+def raw_fields(i):
+    """模拟一次页面解析得到的字段（每次都是新的字符串对象）"""
+    site_name, site_url = SITES[i % len(SITES)]
+    return {
+        'title': f'关于某某单位{i}号信息化建设项目的公开招标公告',
+        'publish_date': date(2024, 1 + i % 12, 1 + i % 28),
+        'source_url': f'{site_url}/notice/{i}.html',
+        'summary': ('项目概况：' + '招标内容说明' * 40)[:200] + str(i),
+        'category': ''.join(CATEGORIES[i % len(CATEGORIES)]),
+        'source_website': ''.join(site_name),
+        'website_url': ''.join(site_url),
+    }
+
+def build_dicts(n):
+    return [raw_fields(i) for i in range(n)]
+
+def build_items(n):
+    items = []
+    for i in range(n):
+        fields = raw_fields(i)
+        item = CrawlItem(
+            title=fields['title'],
+            publish_date=fields['publish_date'],
+            source_url=fields['source_url'],
+            summary=fields['summary'],
+            category=fields['category']
+        )
+        item.set_site(fields['source_website'], fields['website_url'])
+        items.append(item)
+    return items
+
+def measure(builder, n):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    data = builder(n)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return data, total
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("=" * 60)
+    print(f"爬取条目内存对比（{n} 条）")
+    print("=" * 60)
+
+    dicts, dict_bytes = measure(build_dicts, n)
+    del dicts
+    items, item_bytes = measure(build_items, n)
+
+    print(f"字典:      {dict_bytes / n:8.1f} 字节/条  共 {dict_bytes / 1024 / 1024:.2f} MB")
+    print(f"CrawlItem: {item_bytes / n:8.1f} 字节/条  共 {item_bytes / 1024 / 1024:.2f} MB")
+    print(f"节省:      {(1 - item_bytes / dict_bytes) * 100:.1f}%")
+
+    # 转换为字典的结果应与原始字段一致
+    sample = items[7].to_dict()
+    expected = dict(raw_fields(7), publish_date=raw_fields(7)['publish_date'].isoformat())
+    print(f"to_dict 一致: {sample == expected}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+对比指纹以 32 位十六进制文本和 16 字节二进制保存时的唯一索引大小和查询耗时（SQLite）
+用法: python bench_fingerprint_storage.py [指纹数量，默认 10000000] [数据库目录]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import hashlib
+import tempfile
+
+BATCH = 100000
+
+def digest(i):
+    return hashlib.blake2b(str(i).encode(), digest_size=16).digest()
+
+def build(path, n, binary):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    column = 'BLOB' if binary else 'VARCHAR(64)'
+    conn.execute(f'CREATE TABLE tender_fingerprint (id INTEGER PRIMARY KEY, tender_id INTEGER NOT NULL, '
+                 f'fingerprint {column} NOT NULL UNIQUE)')
+    started = time.perf_counter()
+    for start in range(0, n, BATCH):
+        rows = [(i, digest(i) if binary else digest(i).hex()) for i in range(start, min(n, start + BATCH))]
+        conn.execute('BEGIN')
+        conn.executemany('INSERT INTO tender_fingerprint (tender_id, fingerprint) VALUES (?, ?)', rows)
+        conn.execute('COMMIT')
+    insert_time = time.perf_counter() - started
+    return conn, insert_time
+
+def sizes(conn):
+    rows = conn.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name').fetchall()
+    index = sum(size for name, size in rows if name.startswith('sqlite_autoindex'))
+    table = sum(size for name, size in rows if name == 'tender_fingerprint')
+    return table, index
+
+def lookups(conn, n, binary, count=20000, batch=500, rounds=100):
+    rng = random.Random(1)
+    keys = [digest(rng.randrange(n)) if i % 2 else digest(n + i) for i in range(count)]
+    if not binary:
+        keys = [key.hex() for key in keys]
+
+    started = time.perf_counter()
+    for key in keys:
+        conn.execute('SELECT 1 FROM tender_fingerprint WHERE fingerprint = ?', (key,)).fetchone()
+    single = (time.perf_counter() - started) / count * 1e6
+
+    placeholders = ','.join('?' * batch)
+    started = time.perf_counter()
+    for r in range(rounds):
+        chunk = keys[(r * batch) % count:(r * batch) % count + batch]
+        conn.execute(f'SELECT fingerprint FROM tender_fingerprint WHERE fingerprint IN ({placeholders})', chunk).fetchall()
+    batched = (time.perf_counter() - started) / rounds * 1e3
+    return single, batched
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.gettempdir()
+
+    print("=" * 72)
+    print(f"指纹存储格式对比（{n:,} 个指纹）")
+    print("=" * 72)
+    print(f"{'格式':<10} {'写入s':>8} {'表MB':>8} {'唯一索引MB':>10} {'文件MB':>8} {'单条查询μs':>10} {'500条IN ms':>10}")
+    for label, binary in (('hex 文本', False), ('16 字节', True)):
+        path = os.path.join(directory, f'bench_fingerprint_{"binary" if binary else "hex"}.db')
+        conn, insert_time = build(path, n, binary)
+        table, index = sizes(conn)
+        single, batched = lookups(conn, n, binary)
+        conn.close()
+        file_size = os.path.getsize(path)
+        os.remove(path)
+        print(f"{label:<10} {insert_time:>8.1f} {table / 1048576:>8.1f} {index / 1048576:>10.1f} "
+              f"{file_size / 1048576:>8.1f} {single:>10.1f} {batched:>10.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+评估 MinHash LSH 近似重复检测：不同相似度阈值下的召回率、误合并率和查询耗时
+用法: python bench_near_duplicate.py [招标数量] [阈值,阈值,...]
+"""
+import os
+import sys
+import random
+import time
+import importlib.util
+
+# 直接加载模块文件，避免导入 app 包时初始化整个应用
+spec = importlib.util.spec_from_file_location(
+    'minhash',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'utils', 'minhash.py')
+)
+minhash = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(minhash)
+
+import numpy as np
+
+CITIES = ['北京', '上海', '广州', '深圳', '杭州', '南京', '成都', '武汉', '西安', '重庆', '天津', '苏州']
+UNITS = ['人民医院', '第一中学', '自来水公司', '交通运输局', '城市管理局', '公安局', '疾病预防控制中心', '图书馆', '职业技术学院', '住房和城乡建设局']
+PROJECTS = ['医疗设备采购', '校舍维修改造工程', '信息化系统建设', '办公家具采购', '道路养护服务', '物业管理服务',
+            '监控设备更新', '食堂食材配送', '绿化提升工程', '档案数字化服务', '空调设备采购', '车辆租赁服务']
+NOTICES = ['公开招标公告', '竞争性磋商公告', '询价公告', '招标计划', '中标候选人公示']
+PREFIXES = ['【转载】', '[省级平台]', '关于', '']
+SUFFIXES = ['（二次）', '。', ' ', '-政府采购', '']
+# 项目名中的地名、路名等专有名词，用常见字随机组合
+NAME_CHARS = '东南西北中新华明光阳春秋山水河湖海林园丰安平和兴盛长青云龙凤金银宝石桥港城湾溪岭泉'
+
+def make_tender(rng, i):
+    city = rng.choice(CITIES)
+    organization = f'{city}市{rng.choice(UNITS)}'
+    place = ''.join(rng.choice(NAME_CHARS) for _ in range(rng.randint(2, 4)))
+    title = f'{organization}{place}{rng.choice(["片区", "路", "院区", "校区", ""])}{rng.choice(PROJECTS)}项目{rng.choice(NOTICES)}'
+    if rng.random() < 0.5:
+        title = title.replace('项目', f'项目（第{rng.randint(1, 5)}标段）', 1)
+    return title, organization
+
+def republish(rng, title, organization):
+    """模拟转载：加前后缀、改标点和空格、全角半角、偶尔丢掉招标单位"""
+    text = rng.choice(PREFIXES) + title + rng.choice(SUFFIXES)
+    if rng.random() < 0.3:
+        text = text.replace('（', '(').replace('）', ')')
+    if rng.random() < 0.3:
+        text = text.replace('项目', '项目 ', 1)
+    return text, (organization if rng.random() < 0.7 else None)
+
+def other_lot(title):
+    """同一项目的另一个标段：标题几乎一样，但不是同一条公告"""
+    for lot in range(1, 6):
+        if f'第{lot}标段' in title:
+            return title.replace(f'第{lot}标段', f'第{lot % 5 + 1}标段')
+    return None
+
+def evaluate(threshold, base, queries, num_perm=128):
+    hasher = minhash.MinHasher(num_perm)
+    lsh = minhash.MinHashLSH(threshold, num_perm)
+
+    signatures = np.vstack([hasher.signature_of(title, organization) for title, organization in base])
+    numbers = [minhash.title_numbers(title) for title, _ in base]
+    started = time.perf_counter()
+    lsh.build(range(len(base)), signatures)
+    build_time = time.perf_counter() - started
+
+    found = {'dup': 0, 'lot': 0, 'new': 0}
+    totals = {'dup': 0, 'lot': 0, 'new': 0}
+    candidates = 0
+    started = time.perf_counter()
+    for kind, target, title, organization in queries:
+        signature = hasher.signature_of(title, organization)
+        title_key = minhash.title_numbers(title)
+        match = None
+        best = threshold
+        for item in lsh.query(signature):
+            candidates += 1
+            if numbers[item] != title_key:
+                continue
+            score = minhash.similarity(signature, signatures[item])
+            if score >= best:
+                match, best = item, score
+        totals[kind] += 1
+        if kind == 'dup' and match == target:
+            found['dup'] += 1
+        elif kind != 'dup' and match is not None:
+            found[kind] += 1
+    query_time = time.perf_counter() - started
+
+    return {
+        'bands': lsh.bands,
+        'rows': lsh.rows,
+        'recall': found['dup'] / max(totals['dup'], 1),
+        'lot_merged': found['lot'] / max(totals['lot'], 1),
+        'new_merged': found['new'] / max(totals['new'], 1),
+        'candidates': candidates / len(queries),
+        'query_us': query_time / len(queries) * 1e6,
+        'build_s': build_time,
+        'memory_mb': lsh.memory_bytes() / 1024 / 1024
+    }
+
+def brute_force_us(base, queries, num_perm=128, sample=200):
+    hasher = minhash.MinHasher(num_perm)
+    signatures = np.vstack([hasher.signature_of(title, organization) for title, organization in base])
+    started = time.perf_counter()
+    for _, _, title, organization in queries[:sample]:
+        signature = hasher.signature_of(title, organization)
+        (signatures == signature).mean(axis=1).argmax()
+    return (time.perf_counter() - started) / min(sample, len(queries)) * 1e6
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    thresholds = [float(t) for t in sys.argv[2].split(',')] if len(sys.argv) > 2 else [0.6, 0.7, 0.8, 0.9]
+    rng = random.Random(42)
+
+    base = []
+    seen = set()
+    while len(base) < n:
+        title, organization = make_tender(rng, len(base))
+        if title not in seen:
+            seen.add(title)
+            base.append((title, organization))
+
+    queries = []
+    for _ in range(2000):
+        target = rng.randrange(n)
+        title, organization = republish(rng, *base[target])
+        queries.append(('dup', target, title, organization))
+    for _ in range(1000):
+        target = rng.randrange(n)
+        title = other_lot(base[target][0])
+        if title and title not in seen:
+            queries.append(('lot', target, title, base[target][1]))
+    for _ in range(1000):
+        title, organization = make_tender(rng, 0)
+        if title not in seen:
+            queries.append(('new', None, title, organization))
+
+    print("=" * 78)
+    print(f"近似重复检测评估（已有 {n} 条，查询 {len(queries)} 条：转载 / 其他标段 / 新公告）")
+    print("=" * 78)
+    print(f"{'阈值':>6} {'段x行':>7} {'转载召回':>8} {'标段误合并':>10} {'新公告误合并':>12} {'候选/次':>8} {'查询μs':>8} {'内存MB':>7}")
+    for threshold in thresholds:
+        r = evaluate(threshold, base, queries)
+        print(f"{threshold:>6.2f} {r['bands']:>3}x{r['rows']:<3} {r['recall']:>8.1%} {r['lot_merged']:>10.1%} "
+              f"{r['new_merged']:>12.1%} {r['candidates']:>8.1f} {r['query_us']:>8.0f} {r['memory_mb']:>7.2f}")
+    print(f"逐条比较全部签名: {brute_force_us(base, queries):.0f} μs/次")
+
+if __name__ == '__main__':
+    main()
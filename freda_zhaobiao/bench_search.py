@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+对比关键词检索走 LIKE 全表扫描和走 FTS5 全文索引（中文二元组 / trigram 分词）的查询耗时、召回率和索引大小（SQLite）
+用法: python bench_search.py [招标信息数量，默认 1000000] [数据库目录]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import importlib.util
+from datetime import date, timedelta
+
+def load_module(name, relative_path):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), relative_path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+search_index = load_module('search_index', 'app/utils/search_index.py')
+
+BATCH = 100000
+FIELDS = search_index.SEARCH_FIELDS
+
+PLACES = ['北京市', '上海市', '广州市', '深圳市', '杭州市', '成都市', '武汉市', '西安市', '南京市', '重庆市',
+          '天津市', '苏州市', '郑州市', '长沙市', '青岛市', '合肥市', '济南市', '福州市', '昆明市', '南宁市']
+DISTRICTS = ['东城区', '西湖区', '高新区', '经开区', '滨海新区', '天河区', '江北区', '锦江区', '港务区', '雁塔区']
+UNITS = ['人民医院', '中心小学', '第一中学', '公安局', '交通运输局', '自然资源局', '水务局', '卫生健康委员会',
+         '城市管理局', '市场监督管理局', '档案馆', '图书馆', '疾病预防控制中心', '环境监测站']
+SUBJECTS = ['医疗设备', '办公家具', '信息化系统', '道路维修', '绿化养护', '物业管理服务', '食堂食材', '安防监控设备',
+            '网络安全服务', '车辆租赁', '印刷服务', '空调维保', '实验室仪器', '教学设备', '污水处理设施', '消防设施改造']
+KINDS = ['采购项目', '工程', '服务项目', '框架协议采购', '改造工程', '维保项目']
+NOTICES = ['公开招标公告', '竞争性磋商公告', '中标结果公告', '询价公告', '更正公告', '招标计划', '成交公告']
+PHRASES = ['预算金额', '投标截止时间', '资格要求', '采购需求', '联系方式', '开标地点', '评标办法', '合同履行期限']
+
+def make_row(rng, i, start_date):
+    place = rng.choice(PLACES)
+    district = rng.choice(DISTRICTS)
+    organization = f'{place}{district}{rng.choice(UNITS)}'
+    title = f'{organization}{rng.randint(2020, 2026)}年{rng.choice(SUBJECTS)}{rng.choice(KINDS)}{rng.choice(NOTICES)}'
+    summary = '，'.join(
+        f'{rng.choice(PHRASES)}{rng.randint(1, 999)}万元' if k % 2 else f'{rng.choice(PHRASES)}见{rng.choice(SUBJECTS)}附件'
+        for k in range(rng.randint(2, 5))
+    )
+    publish_date = (start_date + timedelta(days=rng.randrange(2000))).isoformat()
+    return (title, organization, summary, publish_date, 'active')
+
+TRIGRAM_TABLE = 'tender_fts_trigram'
+
+def build(path, n):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('CREATE TABLE tender (id INTEGER PRIMARY KEY, title VARCHAR(500) NOT NULL, organization VARCHAR(200), '
+                 'summary TEXT, publish_date DATE NOT NULL, status VARCHAR(20))')
+    conn.execute('CREATE INDEX ix_tender_publish_date ON tender (publish_date)')
+    rng = random.Random(1)
+    start_date = date(2021, 1, 1)
+    for start in range(0, n, BATCH):
+        rows = [make_row(rng, i, start_date) for i in range(start, min(n, start + BATCH))]
+        conn.execute('BEGIN')
+        conn.executemany('INSERT INTO tender (title, organization, summary, publish_date, status) VALUES (?, ?, ?, ?, ?)', rows)
+        conn.execute('COMMIT')
+
+    # 二元组索引（应用使用的）
+    started = time.perf_counter()
+    for statement in search_index.create_statements(fields=FIELDS):
+        conn.execute(statement)
+    # 与 SQLiteFTSBackend 相同：分批读出原文，在 Python 中分词后写入
+    conn.row_factory = sqlite3.Row
+    delete_sql, insert_sql = search_index.index_sql(fields=FIELDS)
+    last_id = 0
+    while True:
+        rows = conn.execute(search_index.source_sql(fields=FIELDS), {'last_id': last_id, 'limit': BATCH}).fetchall()
+        if not rows:
+            break
+        conn.executemany(insert_sql, [search_index.index_values(row['id'], dict(row), FIELDS) for row in rows])
+        last_id = rows[-1]['id']
+    conn.row_factory = None
+    conn.commit()
+    bigram_time = time.perf_counter() - started
+
+    # 对照：trigram 分词的外部内容表
+    started = time.perf_counter()
+    columns = ', '.join(FIELDS)
+    conn.execute(f"CREATE VIRTUAL TABLE {TRIGRAM_TABLE} USING fts5({columns}, content='tender', "
+                 f"content_rowid='id', tokenize='trigram')")
+    conn.execute(f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('rebuild')")
+    conn.commit()
+    trigram_time = time.perf_counter() - started
+    return conn, bigram_time, trigram_time
+
+def sizes(conn):
+    rows = conn.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name').fetchall()
+    table = sum(size for name, size in rows if name == 'tender')
+    trigram = sum(size for name, size in rows if name.startswith(TRIGRAM_TABLE))
+    bigram = sum(size for name, size in rows if name.startswith(search_index.FTS_TABLE)) - trigram
+    return table, bigram, trigram
+
+def like_where(terms):
+    if not terms:
+        return '1', []
+    clauses = ['(' + ' OR '.join(f"{field} LIKE ?" for field in FIELDS) + ')' for _ in terms]
+    params = [f'%{term}%' for term in terms for _ in FIELDS]
+    return ' AND '.join(clauses), params
+
+def bigram_where(terms):
+    """与 SearchService 的 SQLite 后端相同的条件"""
+    phrases = [phrase for phrase in map(search_index.term_phrase, terms) if phrase is not None]
+    like_terms = [term for term in terms if search_index.term_phrase(term) is None or search_index.needs_recheck(term)]
+    where, params = like_where(like_terms)
+    if phrases:
+        where = f'id IN (SELECT rowid FROM {search_index.FTS_TABLE} WHERE {search_index.FTS_TABLE} MATCH ?) AND {where}'
+        params = [search_index.match_expression(phrases, FIELDS)] + params
+    return where, params
+
+def trigram_where(terms):
+    """trigram 索引：不少于 3 个字符的词走索引，其余按 LIKE"""
+    indexed = [term for term in terms if len(term) >= 3]
+    where, params = like_where([term for term in terms if len(term) < 3])
+    if indexed:
+        expression = ' AND '.join('"' + term.replace('"', '""') + '"' for term in indexed)
+        where = f'id IN (SELECT rowid FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH ?) AND {where}'
+        params = [expression] + params
+    return where, params
+
+def timed(conn, sql, params, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - started) / repeat * 1e3, result
+
+def run_query(conn, where, params, repeat):
+    count_ms, count = timed(conn, f"SELECT COUNT(*) FROM tender WHERE status = 'active' AND {where}", params, repeat)
+    page_ms, page = timed(conn, f"SELECT id FROM tender WHERE status = 'active' AND {where} "
+                                f"ORDER BY publish_date DESC, id DESC LIMIT 20", params, repeat)
+    return count[0][0], count_ms, page_ms, [row[0] for row in page]
+
+def matched_ids(conn, where, params):
+    return {row[0] for row in conn.execute(f'SELECT id FROM tender WHERE {where}', params)}
+
+def sample_queries(conn, n, count, rng):
+    """从随机招标信息的标题和摘要中截取 2-6 个字符作为查询词"""
+    queries = []
+    while len(queries) < count:
+        title, summary = conn.execute('SELECT title, summary FROM tender WHERE id = ?', (rng.randint(1, n),)).fetchone()
+        text = rng.choice([title, summary])
+        length = rng.randint(2, 6)
+        start = rng.randrange(max(1, len(text) - length))
+        query = text[start:start + length].strip()
+        if query:
+            queries.append(query)
+    return queries
+
+def recall(conn, queries):
+    """以 LIKE 的结果为准，统计两种索引的召回率和多出的记录"""
+    totals = {'like': 0, 'bigram': 0, 'trigram': 0, 'bigram_extra': 0, 'trigram_extra': 0}
+    for query in queries:
+        terms = search_index.split_terms(query)
+        expected = matched_ids(conn, *like_where(terms))
+        totals['like'] += len(expected)
+        for name, where in (('bigram', bigram_where), ('trigram', trigram_where)):
+            found = matched_ids(conn, *where(terms))
+            totals[name] += len(found & expected)
+            totals[f'{name}_extra'] += len(found - expected)
+    return totals
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.gettempdir()
+    path = os.path.join(directory, 'bench_search.db')
+
+    print("=" * 96)
+    print(f"关键词检索 LIKE 与 FTS5 二元组 / trigram 索引对比（{n:,} 条招标信息）")
+    print("=" * 96)
+    started = time.perf_counter()
+    conn, bigram_time, trigram_time = build(path, n)
+    table, bigram_size, trigram_size = sizes(conn)
+    print(f"生成数据 {time.perf_counter() - started - bigram_time - trigram_time:.1f}s，表 {table / 1048576:.1f}MB")
+    print(f"二元组索引: 建索引 {bigram_time:.1f}s，{bigram_size / 1048576:.1f}MB")
+    print(f"trigram 索引: 建索引 {trigram_time:.1f}s，{trigram_size / 1048576:.1f}MB")
+    print()
+
+    queries = ['医疗', '医疗设备', '西湖区人民医院', '网络安全服务 2024', '物业管理服务 框架协议', '投标截止时间', '不存在的关键词']
+    print(f"{'查询':<20} {'命中':>9} {'LIKE计数ms':>11} {'二元组计数ms':>12} {'trigram计数ms':>13} "
+          f"{'LIKE首页ms':>11} {'二元组首页ms':>12} {'一致':>4}")
+    for query in queries:
+        terms = search_index.split_terms(query)
+        repeat = 3
+        like_count, like_count_ms, like_page_ms, like_page = run_query(conn, *like_where(terms), repeat)
+        fts_count, fts_count_ms, fts_page_ms, fts_page = run_query(conn, *bigram_where(terms), repeat)
+        _, trigram_count_ms, _, _ = run_query(conn, *trigram_where(terms), repeat)
+        same = like_count == fts_count and like_page == fts_page
+        print(f"{query:<20} {fts_count:>9,} {like_count_ms:>11.1f} {fts_count_ms:>12.1f} {trigram_count_ms:>13.1f} "
+              f"{like_page_ms:>11.1f} {fts_page_ms:>12.1f} {'是' if same else '否':>4}")
+    print()
+
+    samples = sample_queries(conn, n, 40, random.Random(2))
+    cjk_samples = [query for query in samples if search_index.term_phrase(query) and '\u4e00' <= query[0] <= '\u9fff']
+    for label, queries in (('随机截取的', samples), ('其中以汉字开头的', cjk_samples)):
+        totals = recall(conn, queries)
+        print(f"{label} {len(queries)} 个查询词（LIKE 共命中 {totals['like']:,} 条）:")
+        for name, index_label in (('bigram', '二元组'), ('trigram', 'trigram')):
+            rate = totals[name] / totals['like'] if totals['like'] else 1.0
+            print(f"  {index_label:<8} 召回率 {rate:.2%}，多出 {totals[f'{name}_extra']:,} 条")
+
+    conn.close()
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
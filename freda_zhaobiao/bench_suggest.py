@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+搜索建议前缀索引的构建耗时、查询延迟（p50 / p99）和增量加入新标题的耗时
+用法: python bench_suggest.py [标题数量，默认 1000000]
+"""
+import os
+import sys
+import time
+import random
+import importlib.util
+from collections import Counter
+from datetime import date
+
+def load_module(name, relative_path):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), relative_path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+prefix_index = load_module('prefix_index', 'app/utils/prefix_index.py')
+bench_search = load_module('bench_search', 'bench_search.py')
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(1)
+    start_date = date(2021, 1, 1)
+
+    print("=" * 72)
+    print(f"搜索建议前缀索引（{n:,} 条标题）")
+    print("=" * 72)
+    rows = [bench_search.make_row(rng, i, start_date) for i in range(n)]
+    titles = Counter(row[0] for row in rows)
+    organizations = Counter(row[1] for row in rows)
+    keywords = Counter(rng.choice(bench_search.SUBJECTS + bench_search.UNITS) for _ in range(5000))
+
+    started = time.perf_counter()
+    entries = {}
+    for counter, kind, factor in ((titles, prefix_index.KIND_TITLE, 1),
+                                  (organizations, prefix_index.KIND_ORGANIZATION, 1),
+                                  (keywords, prefix_index.KIND_KEYWORD, 5)):
+        for text, count in counter.items():
+            key = prefix_index.normalize(text)
+            entry = entries.setdefault(key, [text, 0, 0])
+            entry[1] += count * factor
+            entry[2] |= kind
+    index = prefix_index.PrefixIndex()
+    index.build(entries)
+    print(f"构建 {time.perf_counter() - started:.1f}s，{len(index):,} 个词")
+
+    queries = []
+    for _ in range(20000):
+        text = rng.choice(rows)[rng.choice((0, 1))]
+        queries.append(text[:rng.randint(1, 8)])
+    for label, sample in (('全部前缀', queries), ('1-2 个字的前缀', [q for q in queries if len(q) <= 2])):
+        timings = []
+        for query in sample:
+            started = time.perf_counter()
+            index.top(query, 10)
+            timings.append((time.perf_counter() - started) * 1e3)
+        print(f"{label:<14} {len(sample):>6} 次查询  p50 {percentile(timings, 0.5):.3f}ms  "
+              f"p99 {percentile(timings, 0.99):.3f}ms  最大 {max(timings):.3f}ms")
+
+    new_rows = [bench_search.make_row(rng, i, start_date) for i in range(20000)]
+    started = time.perf_counter()
+    for title, organization, _, _, _ in new_rows:
+        index.add(title, 1, prefix_index.KIND_TITLE)
+        index.add(organization, 1, prefix_index.KIND_ORGANIZATION)
+    elapsed = time.perf_counter() - started
+    print(f"增量加入 {len(new_rows):,} 条: {elapsed:.2f}s（平均 {elapsed / len(new_rows) * 1e3:.3f}ms / 条，合并 {index.merges} 次）")
+
+    top = index.top(new_rows[-1][0][:6], 3)
+    print(f"示例: {new_rows[-1][0][:6]!r} -> {[text for text, _, _ in top]}")
+
+if __name__ == '__main__':
+    main()
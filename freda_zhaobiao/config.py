@@ -28,6 +28,47 @@ CRAWLER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.
 CRAWLER_REQUEST_DELAY = 2
 CRAWLER_MAX_RETRY = 3
 CRAWLER_TIMEOUT = 30
+CRAWLER_MAX_WORKERS = 4
+CRAWLER_PER_HOST_LIMIT = 2
+
+# 爬取进度推送配置（SSE）
+CRAWL_STREAM_HEARTBEAT = 15
+CRAWL_STREAM_MAX_SECONDS = 300
+# 每个进程同时打开的推送连接上限：gthread worker 中每个连接占用一个线程，需小于 gunicorn 的 --threads，
+# 给普通请求留出线程；超过上限的页面改用轮询。观看人数多时同时调大 --threads 和这个值，或增加 worker
+CRAWL_STREAM_MAX_CONNECTIONS = int(os.environ.get('CRAWL_STREAM_MAX_CONNECTIONS', '8'))
+
+# 爬取进度存储配置
+CRAWL_PROGRESS_MAX_ENTRIES = 200
+CRAWL_PROGRESS_MAX_MB = 256
+CRAWL_PROGRESS_TTL = 1800
+CRAWL_PROGRESS_STALE_TTL = 21600
+# memory: 只在当前进程内；sqlite: 同一台机器上的多个 worker 共享（WAL 模式）
+CRAWL_PROGRESS_BACKEND = os.environ.get('CRAWL_PROGRESS_BACKEND', 'memory')
+CRAWL_PROGRESS_DB = os.path.abspath('data/progress.db')
+CRAWL_PROGRESS_FLUSH_INTERVAL = 0.5
+CRAWL_PROGRESS_REMOTE_POLL = 1
+# 爬取结果按任务写入磁盘（JSONL），内存中只保留前 N 条预览
+CRAWL_RESULTS_DIR = os.path.abspath('data/crawl_results')
+CRAWL_RESULTS_PREVIEW = 20
+
+# 指纹索引配置（Bloom 过滤器目标误判率、增量加载其他进程新指纹的间隔秒数）
+FINGERPRINT_BLOOM_FP_RATE = 0.01
+FINGERPRINT_INDEX_CATCH_UP = 5
+
+# 近似重复检测（MinHash LSH）：相似度阈值越低召回越高、误合并越多，可用 bench_near_duplicate.py 评估
+# 修改签名长度或切分长度后需要执行 python migrate_db.py signatures --rebuild
+NEAR_DUPLICATE_ENABLED = True
+NEAR_DUPLICATE_THRESHOLD = 0.8
+NEAR_DUPLICATE_NUM_PERM = 128
+NEAR_DUPLICATE_SHINGLE_SIZE = 2
+# 只有来源站点不同、发布日期相差不超过这么多天的才算转载，同一站点定期发布的同名公告不合并
+NEAR_DUPLICATE_DATE_WINDOW = 7
+
+# 暂存写入：开启后爬取结果先追加到 tender_staging，由后台线程按批（一个事务）合并到 tender
+INGEST_STAGING_ENABLED = os.environ.get('INGEST_STAGING', 'False').lower() == 'true'
+INGEST_STAGING_BATCH_SIZE = 5000
+INGEST_STAGING_INTERVAL = 2
 
 # 日志配置
 LOG_LEVEL = INFO
@@ -38,9 +79,34 @@ LOG_BACKUP_COUNT = 5
 # 搜索配置
 SEARCH_PER_PAGE = 20
 SEARCH_MAX_KEYWORDS = 10
+# 关键词检索使用全文索引（SQLite 用 FTS5，PostgreSQL 用 pg_trgm 的 GIN 索引），关闭后退回 LIKE 逐行匹配
+SEARCH_INDEX_ENABLED = True
+# 按相关度排序时各字段的权重（SQLite 传给 bm25()），标题命中比摘要命中更重要
+SEARCH_FIELD_WEIGHTS = {'title': 5.0, 'organization': 2.0, 'summary': 1.0}
+# 相关度的新近度加权：0 表示不加权；为 1 时当天发布的相关度翻倍，发布 SEARCH_RECENCY_HALF_LIFE 天后乘 1.5
+SEARCH_RECENCY_WEIGHT = float(os.environ.get('SEARCH_RECENCY_WEIGHT', '0'))
+SEARCH_RECENCY_HALF_LIFE = 30
+# 结果总数和每页结果缓存的秒数（本进程入库后立即失效）；总数超过 SEARCH_COUNT_CAP 时只显示 "10,000+"
+SEARCH_COUNT_TTL = 60
+SEARCH_RESULT_TTL = 60
+SEARCH_COUNT_CAP = 10000
+SEARCH_CACHE_MAX_ENTRIES = 10000
+# 搜索结果旁显示的分面（category、source_website、location、month），每个分面最多显示的值
+SEARCH_FACETS = ('category', 'source_website', 'location', 'month')
+SEARCH_FACET_SIZE = 10
+
+# 搜索建议：返回条数；搜索历史中的关键词至少被搜索几次才作为建议，及其权重倍数（标题和单位每出现一次计 1）
+SUGGEST_LIMIT = 10
+SUGGEST_HISTORY_MIN_COUNT = 2
+SUGGEST_HISTORY_WEIGHT = 5.0
+SUGGEST_CATCH_UP = 30
+
+# 保存的搜索：创建时最多把最近多少条已有记录作为初始结果；其他进程修改保存的搜索后多久重新加载（秒）
+SAVED_SEARCH_BACKFILL_LIMIT = 1000
+SAVED_SEARCH_RELOAD_INTERVAL = 30
 
 # 缓存配置
-CACHE_TYPE = "simple"
+CACHE_TYPE = "SimpleCache"
 CACHE_DEFAULT_TIMEOUT = 300
 
 # 阿里云域名配置（可选）
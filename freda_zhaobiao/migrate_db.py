@@ -2,10 +2,20 @@
 """
 数据库迁移脚本
 用于将应用从SQLite迁移到PostgreSQL
+
+用法:
+    python migrate_db.py                 迁移到PostgreSQL
+    python migrate_db.py fingerprints    重新计算招标信息指纹并合并重复记录
+    python migrate_db.py fingerprints-binary  把指纹转换为 16 字节二进制存储
+    python migrate_db.py sources         补算来源标识、内容哈希和地址哈希
+    python migrate_db.py signatures      计算近似重复检测用的签名
+    python migrate_db.py merge-staging   合并暂存表中的爬取结果
+    python migrate_db.py search-index    重建关键词检索的全文索引
 """
 
 import os
 import sys
+import argparse
 import logging
 from dotenv import load_dotenv
 
@@ -65,7 +75,72 @@ def migrate_data():
             logger.error(f"数据迁移失败: {str(e)}")
             return False
 
-if __name__ == '__main__':
+def rebuild_fingerprints(batch_size, dry_run):
+    """重新计算所有招标信息的指纹，合并指纹相同的重复记录"""
+    from app.services.fingerprint_service import fingerprint_service
+    
+    with app.app_context():
+        logger.info(f"开始重建指纹 (每批 {batch_size} 条{', 仅统计' if dry_run else ''})...")
+        stats = fingerprint_service.rebuild(batch_size=batch_size, dry_run=dry_run)
+        logger.info(f"指纹重建完成: 扫描 {stats['scanned']} 条, 指纹 {stats['fingerprints']} 个, 合并重复 {stats['merged']} 条")
+        return stats
+
+def convert_fingerprints(batch_size):
+    """把十六进制文本指纹转换为 16 字节二进制，旧格式指纹转换后重新计算"""
+    from app.services.fingerprint_service import fingerprint_service, fingerprint_index
+    
+    with app.app_context():
+        logger.info(f"开始转换指纹存储格式 (每批 {batch_size} 条)...")
+        stats = fingerprint_service.convert_to_binary(batch_size=batch_size)
+        fingerprint_index.load()
+        logger.info(f"指纹转换完成: 转换 {stats['converted']} 个, 旧格式 {stats['legacy']} 个{', 已重建指纹' if stats['rebuilt'] else ''}")
+        return stats
+
+def backfill_sources(batch_size, rebuild):
+    """为已有招标信息补算来源标识、内容哈希和地址哈希，重新爬取时据此识别更新"""
+    from app.services.ingest_service import ingest_service
+    
+    with app.app_context():
+        logger.info(f"开始补算来源标识 (每批 {batch_size} 条)...")
+        stats = ingest_service.backfill_sources(batch_size=batch_size, rebuild=rebuild)
+        logger.info(f"来源标识补算完成: 扫描 {stats['scanned']} 条, 更新 {stats['updated']} 条")
+        return stats
+
+def build_signatures(batch_size, rebuild):
+    """为已有招标信息计算 MinHash 签名，用于近似重复检测"""
+    from app.services.near_duplicate_service import near_duplicate_index
+    
+    with app.app_context():
+        logger.info(f"开始计算签名 (每批 {batch_size} 条{', 重建全部' if rebuild else ''})...")
+        stats = near_duplicate_index.backfill(batch_size=batch_size, rebuild=rebuild)
+        logger.info(f"签名计算完成: 新增签名 {stats['signed']} 个")
+        return stats
+
+def merge_staging():
+    """把暂存表中尚未合并的爬取结果全部合并到招标信息表"""
+    from app.services.staging_service import staging_service
+    
+    with app.app_context():
+        logger.info(f"待合并暂存记录: {staging_service.pending()} 条")
+        batches = staging_service.merge_all()
+        stats = staging_service.stats()
+        logger.info(f"合并完成: {batches} 批, 新增 {stats['added']}, 更新 {stats['updated']}, 跳过 {stats['skipped']}, 失败 {stats['failed']}（见 tender_staging_error 表）")
+        return stats
+
+def rebuild_search_index(recreate):
+    """按招标信息表的当前内容重建全文检索索引"""
+    from app.services.search_service import search_service
+    
+    with app.app_context():
+        logger.info(f"开始重建全文检索索引 (后端 {search_service.backend.name}{', 重新创建索引表' if recreate else ''})...")
+        stats = search_service.rebuild(recreate=recreate)
+        if stats['rebuilt']:
+            logger.info(f"全文检索索引重建完成: 耗时 {stats['elapsed']:.1f}s")
+        else:
+            logger.info("当前检索后端没有需要重建的索引")
+        return stats
+
+def migrate_postgres():
     logger.info("开始数据库迁移流程...")
     logger.info(f"当前数据库URL: {app.config['SQLALCHEMY_DATABASE_URI']}")
     
@@ -77,4 +152,47 @@ if __name__ == '__main__':
     init_database()
     migrate_data()
     
-    logger.info("数据库迁移流程完成!")
\ No newline at end of file
+    logger.info("数据库迁移流程完成!")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='数据库迁移与维护')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    subparsers.add_parser('postgres', help='迁移到PostgreSQL（默认）')
+    
+    fingerprints_parser = subparsers.add_parser('fingerprints', help='重新计算指纹并合并重复记录')
+    fingerprints_parser.add_argument('--batch-size', type=int, default=500)
+    fingerprints_parser.add_argument('--dry-run', action='store_true', help='只统计，不写入')
+    
+    binary_parser = subparsers.add_parser('fingerprints-binary', help='把指纹转换为 16 字节二进制存储')
+    binary_parser.add_argument('--batch-size', type=int, default=5000)
+    
+    sources_parser = subparsers.add_parser('sources', help='补算来源标识、内容哈希和地址哈希')
+    sources_parser.add_argument('--batch-size', type=int, default=500)
+    sources_parser.add_argument('--rebuild', action='store_true', help='按当前的地址规范化规则全部重新计算')
+    
+    signatures_parser = subparsers.add_parser('signatures', help='计算近似重复检测用的 MinHash 签名')
+    signatures_parser.add_argument('--batch-size', type=int, default=500)
+    signatures_parser.add_argument('--rebuild', action='store_true', help='删除已有签名后全部重新计算')
+    
+    subparsers.add_parser('merge-staging', help='合并暂存表中的爬取结果')
+    
+    search_parser = subparsers.add_parser('search-index', help='重建关键词检索的全文索引')
+    search_parser.add_argument('--recreate', action='store_true', help='删除索引表和触发器后重新创建（分词方式变化时使用）')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'fingerprints':
+        rebuild_fingerprints(args.batch_size, args.dry_run)
+    elif args.command == 'fingerprints-binary':
+        convert_fingerprints(args.batch_size)
+    elif args.command == 'sources':
+        backfill_sources(args.batch_size, args.rebuild)
+    elif args.command == 'signatures':
+        build_signatures(args.batch_size, args.rebuild)
+    elif args.command == 'merge-staging':
+        merge_staging()
+    elif args.command == 'search-index':
+        rebuild_search_index(args.recreate)
+    else:
+        migrate_postgres()
\ No newline at end of file
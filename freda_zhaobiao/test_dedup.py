@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+去重回归测试：Excel 导入、批量入库、删除后再入库
+使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_dedup.py 或 python test_dedup.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.extensions import db
+from app.models import Tender, TenderFingerprint, TenderSignature, TenderDuplicate
+from app.services.ingest_service import ingest_service
+from app.services.excel_service import ExcelService
+from app.services.fingerprint_service import fingerprint_index
+from app.services.near_duplicate_service import near_duplicate_index
+
+app.config['WTF_CSRF_ENABLED'] = False
+
+
+def reset_database():
+    """清空所有表并重新加载进程内的索引"""
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        fingerprint_index.load()
+        near_duplicate_index.load()
+
+
+def write_csv(name, lines):
+    path = os.path.join(TEST_DIR, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+
+def test_excel_import_duplicate_rows():
+    """同一个文件中重复的行（前一行的指纹尚未写入数据库）只导入一次，不因指纹唯一约束回滚整个导入"""
+    reset_database()
+    path = write_csv('duplicates.csv', [
+        '标题,日期,单位',
+        '办公设备采购项目,2026-01-05,某某市财政局',
+        '办公设备采购项目,2026-01-05,某某市财政局',
+        ' 办公设备采购项目 ,2026/01/05,某某市财政局',
+        '道路维修工程招标,2026-01-06,某某区交通局',
+    ])
+
+    with app.app_context():
+        result = ExcelService().import_from_file(path)
+        assert result['added'] == 2, result
+        assert result['duplicates'] == 2, result
+        assert result['errors'] == 0, result
+        assert Tender.query.count() == 2
+        assert TenderFingerprint.query.count() == 2
+
+        # 再次导入同一个文件，全部是已有记录
+        result = ExcelService().import_from_file(path)
+        assert result['added'] == 0, result
+        assert result['duplicates'] == 4, result
+
+
+def test_ingest_after_delete():
+    """删除招标信息后，SQLite 复用它的 id，新记录的签名不能与留下的旧签名冲突"""
+    reset_database()
+    client = app.test_client()
+
+    with app.app_context():
+        result = ingest_service.ingest([{
+            'title': '某某医院医疗设备采购公告', 'organization': '某某医院',
+            'publish_date': '2026-02-01', 'source_url': 'http://a.gov.cn/1', 'source_website': 'A'
+        }])
+        assert result['added'] == 1, result
+        tender_id = Tender.query.one().id
+        # 其他站点转载的同一条公告链接到这条记录
+        result = ingest_service.ingest([{
+            'title': '某某医院医疗设备采购公告', 'organization': '某某医院',
+            'publish_date': '2026-02-02', 'source_url': 'http://b.gov.cn/9', 'source_website': 'B'
+        }])
+        assert result['linked'] == 1, result
+
+    response = client.delete(f'/api/tenders/{tender_id}')
+    assert response.status_code == 200, response.get_json()
+
+    with app.app_context():
+        assert TenderSignature.query.count() == 0
+        assert TenderDuplicate.query.count() == 0
+        assert TenderFingerprint.query.count() == 0
+        row = {'title': '某某医院医疗设备采购公告', 'organization': '某某医院'}
+        assert near_duplicate_index.match([row], near_duplicate_index.signatures([row])) == [None]
+
+        for n in range(3):
+            result = ingest_service.ingest([{
+                'title': f'道路养护工程第{n}标段招标公告', 'organization': '某某区交通局',
+                'publish_date': '2026-02-03', 'source_url': f'http://c.gov.cn/{n}', 'source_website': 'C'
+            }])
+            assert result['added'] == 1 and not result['errors'], result
+        assert Tender.query.count() == 3
+
+
+def test_recurring_tender_same_site():
+    """同一站点定期发布的同名公告是不同的招标，不能当作转载合并；其他站点几天内的同名公告才是转载"""
+    reset_database()
+    row = {'title': '某某区教育局办公用品采购公告', 'organization': '某某区教育局', 'source_website': 'A'}
+
+    with app.app_context():
+        result = ingest_service.ingest([dict(row, publish_date='2025-01-10', source_url='http://a.gov.cn/jan')])
+        assert result['added'] == 1, result
+        result = ingest_service.ingest([dict(row, publish_date='2025-09-10', source_url='http://a.gov.cn/sep')])
+        assert result['added'] == 1 and result['linked'] == 0, result
+        assert Tender.query.count() == 2
+
+        # 其他站点转载九月的公告
+        result = ingest_service.ingest([dict(row, publish_date='2025-09-11', source_url='http://b.gov.cn/9',
+                                             source_website='B')])
+        assert result['added'] == 0 and result['linked'] == 1, result
+        # 同一批中同一站点的两期公告也不合并
+        result = ingest_service.ingest([
+            dict(row, publish_date='2026-01-10', source_url='http://a.gov.cn/jan26'),
+            dict(row, publish_date='2026-04-10', source_url='http://a.gov.cn/apr26'),
+        ])
+        assert result['added'] == 2 and result['linked'] == 0, result
+        assert Tender.query.count() == 4
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分面统计回归测试：一条 GROUP BY 查询汇总出的各个分面与逐个字段分别统计的结果相同
+使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_facets.py 或 python test_facets.py
+"""
+
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.extensions import db
+from app.models import Tender
+from app.services.facet_service import facet_service
+from sqlalchemy import event
+
+CATEGORIES = ['工程', '货物', '服务', None]
+WEBSITES = ['A', 'B', 'C']
+LOCATIONS = ['北京', '上海', '']
+
+
+def reset_tenders():
+    """按固定规律写入 48 条招标信息，其中一半的标题含"采购" """
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.add_all([
+            Tender(
+                title=f'{"采购" if n % 2 else "维修"}项目{n}',
+                publish_date=date(2026, 1 + n % 5, 1 + n % 27),
+                category=CATEGORIES[n % 4], source_website=WEBSITES[n % 3], location=LOCATIONS[n % 3]
+            )
+            for n in range(48)
+        ])
+        db.session.commit()
+
+
+def expected_facets(tenders):
+    counters = {
+        'category': Counter(t.category for t in tenders if t.category),
+        'source_website': Counter(t.source_website for t in tenders if t.source_website),
+        'location': Counter(t.location for t in tenders if t.location),
+        'month': Counter(t.publish_date.strftime('%Y-%m') for t in tenders),
+    }
+    return {field: dict(counter) for field, counter in counters.items()}
+
+
+def test_facets_one_query():
+    """所有分面只执行一条查询，空值不计入，每个分面的计数与逐条统计相同"""
+    reset_tenders()
+    with app.app_context():
+        query = Tender.query.filter(Tender.title.like('%采购%'))
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            facets = facet_service.compute(query, ('category', 'source_website', 'location', 'month'))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        assert len(statements) == 1 and 'GROUP BY' in statements[0]
+        expected = expected_facets(query.all())
+        for field, entries in facets.items():
+            assert {entry['value']: entry['count'] for entry in entries} == expected[field], field
+
+        months = [entry['value'] for entry in facets['month']]
+        assert months == sorted(months, reverse=True)
+        february = next(entry for entry in facets['month'] if entry['value'] == '2026-02')
+        assert february['date_from'] == '2026-02-01' and february['date_to'] == '2026-02-28'
+
+
+def test_facets_size_and_api():
+    """每个分面最多 size 个值（按条数从多到少），/api/tenders 的 facets 参数选择要统计的分面"""
+    reset_tenders()
+    size = facet_service.size
+    facet_service.size = 2
+    try:
+        with app.app_context():
+            facets = facet_service.compute(Tender.query, ('category', 'month'))
+        assert len(facets['category']) == 2 and len(facets['month']) == 2
+        counts = [entry['count'] for entry in facets['category']]
+        assert counts == sorted(counts, reverse=True)
+    finally:
+        facet_service.size = size
+
+    client = app.test_client()
+    data = client.get('/api/tenders?q=采购&facets=source_website').get_json()
+    assert list(data['facets']) == ['source_website']
+    assert sum(entry['count'] for entry in data['facets']['source_website']) == 24
+    assert client.get('/api/tenders?q=采购&facets=').get_json()['facets'] == {}
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+进度推送回归测试：推送连接数达到上限时返回 503，连接关闭后释放名额
+使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_progress_stream.py 或 python test_progress_stream.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.services.progress_service import crawl_progress_store, stream_limiter
+
+TASK_ID = 'test-stream-task'
+
+
+def add_completed_task():
+    """已完成的任务：推送完快照后连接就结束"""
+    crawl_progress_store[TASK_ID] = {
+        'status': 'completed',
+        'total': 1,
+        'completed': 1,
+        'results': [],
+        'websites': [],
+        'message': '爬取完成',
+        'current_website': None,
+        'start_time': datetime.now().isoformat(),
+        'start_datetime': datetime.now(),
+        'elapsed_time': '1秒'
+    }
+
+
+def test_stream_limit():
+    """超过上限的连接返回 503 和 Retry-After，不占用名额；已打开的连接关闭后名额释放"""
+    add_completed_task()
+    client = app.test_client()
+    limit = stream_limiter.limit
+    stream_limiter.limit = 1
+    try:
+        active = stream_limiter.active
+        rejected = stream_limiter.rejected
+        first = client.get(f'/crawl/stream/{TASK_ID}')
+        assert first.status_code == 200 and first.mimetype == 'text/event-stream'
+        assert stream_limiter.active == active + 1
+
+        for url in (f'/crawl/stream/{TASK_ID}', '/crawl/tasks/stream'):
+            busy = client.get(url)
+            assert busy.status_code == 503, url
+            assert busy.headers['Retry-After'] == '30'
+            assert busy.get_json()['status'] == 'busy'
+        assert stream_limiter.rejected == rejected + 2
+        assert stream_limiter.active == active + 1
+
+        body = first.get_data(as_text=True)
+        assert 'event: snapshot' in body and 'completed' in body
+        first.close()
+        assert stream_limiter.active == active
+
+        again = client.get(f'/crawl/stream/{TASK_ID}')
+        assert again.status_code == 200
+        again.close()
+        assert stream_limiter.active == active
+        assert stream_limiter.stats()['peak'] >= 1
+    finally:
+        stream_limiter.limit = limit
+        del crawl_progress_store[TASK_ID]
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+保存的搜索回归测试：各个入库路径都与保存的搜索匹配、删除招标信息时删除匹配
+使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_saved_search.py 或 python test_saved_search.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.extensions import db
+from app.models import SavedSearch, SavedSearchMatch, Tender
+from app.services.excel_service import ExcelService
+from app.services.ingest_service import ingest_service
+from app.services.percolator_service import percolator
+from app.services.fingerprint_service import fingerprint_index
+from app.services.near_duplicate_service import near_duplicate_index
+
+app.config['WTF_CSRF_ENABLED'] = False
+
+
+def reset_database():
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        fingerprint_index.load()
+        near_duplicate_index.load()
+        percolator.invalidate()
+
+
+def test_percolate_all_insert_paths():
+    """Excel 导入、POST /api/tenders 和批量入库的新记录都写入匹配，每条只写一次"""
+    reset_database()
+    client = app.test_client()
+    with app.app_context():
+        search_id = percolator.create('医疗设备', '医疗设备').id
+        other_id = percolator.create('道路维修', '道路 维修').id
+
+        path = os.path.join(TEST_DIR, 'tenders.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('标题,日期,单位\n医疗设备采购项目,2026-01-05,某某医院\n道路维修工程,2026-01-06,某某区交通局\n')
+        assert ExcelService().import_from_file(path)['added'] == 2
+
+    response = client.post('/api/tenders', json={
+        'title': '医疗设备维保服务', 'publish_date': '2026-02-01', 'organization': '某某县医院'
+    })
+    assert response.status_code == 201, response.get_json()
+
+    with app.app_context():
+        result = ingest_service.ingest([{
+            'title': '医疗设备第三批采购公告', 'organization': '某某妇幼保健院',
+            'publish_date': '2026-03-02', 'source_url': 'http://a.gov.cn/3', 'source_website': 'A'
+        }])
+        assert result['added'] == 1, result
+
+        assert percolator.new_counts(SavedSearch.query.all()) == {search_id: 3, other_id: 1}
+        assert SavedSearchMatch.query.count() == 4
+
+
+def test_delete_tender_removes_matches():
+    reset_database()
+    client = app.test_client()
+    with app.app_context():
+        search = percolator.create('医疗设备', '医疗设备')
+        ingest_service.ingest([{
+            'title': '医疗设备采购公告', 'organization': '某某医院',
+            'publish_date': '2026-02-01', 'source_url': 'http://a.gov.cn/1', 'source_website': 'A'
+        }])
+        tender_id = Tender.query.one().id
+        assert percolator.new_count(search) == 1
+
+    response = client.delete(f'/api/tenders/{tender_id}')
+    assert response.status_code == 200, response.get_json()
+
+    with app.app_context():
+        assert SavedSearchMatch.query.count() == 0
+        assert percolator.new_count(SavedSearch.query.one()) == 0
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')
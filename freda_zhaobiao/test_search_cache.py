@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+搜索缓存回归测试：结果数封顶、招标信息变化后缓存按代数失效
+使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_search_cache.py 或 python test_search_cache.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.extensions import db
+from app.models import Tender
+from app.services.ingest_service import ingest_service
+from app.services.search_cache import search_cache, search_key
+from app.services.fingerprint_service import fingerprint_index
+from app.services.near_duplicate_service import near_duplicate_index
+
+
+def reset_tenders(count):
+    """清空所有表后写入 count 条标题含"维修"的招标信息"""
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.add_all([
+            Tender(title=f'第{n}号道路维修工程', publish_date=date(2026, 1, 1 + n % 28), organization='某某区交通局')
+            for n in range(count)
+        ])
+        db.session.commit()
+        fingerprint_index.load()
+        near_duplicate_index.load()
+
+
+def test_count_cap():
+    """超过上限的只数到上限，标记为 capped；全文索引估计的上限不超过 count_cap 时精确统计"""
+    reset_tenders(12)
+    cap = search_cache.count_cap
+    search_cache.count_cap = 5
+    try:
+        with app.app_context():
+            query = Tender.query.filter(Tender.title.like('%维修%'))
+            total = search_cache.count(query)
+            assert total == 5 and total.capped and total.label == '5+'
+
+            # 估计的上限不超过 count_cap 时不封顶，直接 COUNT
+            total = search_cache.count(query, estimate=5)
+            assert total == 12 and total.exact
+
+            total = search_cache.count(query.filter(Tender.title.like('第1%')))
+            assert total == 3 and not total.capped and total.label == '3'
+
+            assert search_cache.count(query, estimate=0) == 0
+    finally:
+        search_cache.count_cap = cap
+
+
+def test_generation_bump():
+    """招标信息新增、修改、删除提交后缓存的结果数失效；只改浏览次数不失效，回滚也不失效"""
+    reset_tenders(3)
+    key = search_key('test', '维修')
+    with app.app_context():
+        query = Tender.query.filter(Tender.title.like('%维修%'))
+        assert search_cache.count(query, key) == 3
+
+        db.session.add(Tender(title='桥梁维修工程', publish_date=date(2026, 2, 1)))
+        db.session.rollback()
+        generation = search_cache.generation
+        assert search_cache.count(query, key) == 3
+
+        # 不经过会话写入（相当于其他进程）的记录在缓存过期或代数变化前不计入
+        with db.engine.begin() as connection:
+            connection.execute(Tender.__table__.insert().values(title='隧道维修工程', publish_date=date(2026, 2, 1)))
+        assert search_cache.generation == generation
+        assert search_cache.count(query, key) == 3
+
+        tender = Tender.query.first()
+        tender.view_count = (tender.view_count or 0) + 1
+        db.session.commit()
+        assert search_cache.generation == generation
+
+        db.session.add(Tender(title='桥梁维修工程', publish_date=date(2026, 2, 1)))
+        db.session.commit()
+        assert search_cache.generation == generation + 1
+        assert search_cache.count(query, key) == 5
+
+        # 入库服务的批量插入
+        result = ingest_service.ingest([{
+            'title': '河道维修工程', 'organization': '某某区水务局', 'publish_date': '2026-02-02',
+            'source_url': 'http://a.gov.cn/1', 'source_website': 'A'
+        }])
+        assert result['added'] == 1, result
+        assert search_cache.generation == generation + 2
+        assert search_cache.count(query, key) == 6
+
+        db.session.delete(Tender.query.filter_by(title='桥梁维修工程').one())
+        db.session.commit()
+        assert search_cache.count(query, key) == 5
+
+
+def test_result_pages():
+    """每一页只缓存 id：命中时按 id 重新读取记录（浏览次数是最新的），入库后按新的代数重新查询"""
+    reset_tenders(3)
+    client = app.test_client()
+
+    first = client.get('/api/tenders?q=维修&page=1&per_page=2').get_json()
+    hits = search_cache.result_hits
+    second = client.get('/api/tenders?q=维修&page=1&per_page=2').get_json()
+    assert search_cache.result_hits > hits
+    assert [t['id'] for t in second['tenders']] == [t['id'] for t in first['tenders']]
+    assert second['total'] == 3
+
+    with app.app_context():
+        tender = db.session.get(Tender, first['tenders'][0]['id'])
+        tender.view_count = 42
+        db.session.commit()
+    cached = client.get('/api/tenders?q=维修&page=1&per_page=2').get_json()
+    assert cached['tenders'][0]['view_count'] == 42
+
+    with app.app_context():
+        db.session.add(Tender(title='桥梁维修工程', publish_date=date(2026, 3, 1)))
+        db.session.commit()
+    fresh = client.get('/api/tenders?q=维修&page=1&per_page=2').get_json()
+    assert fresh['tenders'][0]['title'] == '桥梁维修工程'
+    assert fresh['total'] == 4
+
+    # 关键词顺序和大小写不同的同一查询共用缓存项
+    client.get('/api/tenders?q=维修%20工程&page=1&per_page=2')
+    misses = search_cache.result_misses
+    client.get('/api/tenders?q=工程%20维修&page=1&per_page=2')
+    assert search_cache.result_misses == misses
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+全文检索回归测试：索引的结果与 LIKE 一致、其他工具直接写 tender 表
+使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_search_index.py 或 python test_search_index.py
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.extensions import db
+from app.models import Tender
+from app.services.search_service import search_service, LikeSearchBackend
+from app.utils.search_index import SEARCH_FIELDS, split_terms
+
+
+def reset_tenders(*titles):
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        tenders = [Tender(title=title, publish_date=date(2026, 1, 1), organization='某某市公共资源交易中心')
+                   for title in titles]
+        db.session.add_all(tenders)
+        db.session.commit()
+        return [tender.id for tender in tenders]
+
+
+def search_ids(keywords):
+    return {tender.id for tender in search_service.apply(Tender.query, keywords)}
+
+
+def like_ids(keywords):
+    condition = LikeSearchBackend().condition(split_terms(keywords), SEARCH_FIELDS)
+    return {tender.id for tender in Tender.query.filter(condition)}
+
+
+def test_fragments_match_like():
+    """从词的中间开始的字母数字和汉字片段（"ZB2026" 在 "GZB2026" 中）与 LIKE 的结果相同"""
+    reset_tenders('GZB2026-011 第11包 医疗设备采购', '2024年度道路维修工程', '办公家具采购项目')
+    with app.app_context():
+        assert search_service.backend.name == 'sqlite_fts5'
+        for keywords in ('ZB2026', '026', '1包', 'GZB2026', '2026-011', '疗设备', '4年度', '医疗设备 11包', '家'):
+            assert search_ids(keywords) == like_ids(keywords), keywords
+            assert search_ids(keywords), keywords
+
+
+def test_external_writer():
+    """其他工具直接写 tender 表不需要注册函数，写入的记录在补齐索引后能搜到，删除的记录同时从索引中删除"""
+    tender_id, = reset_tenders('医疗设备采购项目')
+    with app.app_context():
+        path = db.engine.url.database
+
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO tender (title, publish_date, status) VALUES ('档案数字化加工服务', '2026-01-02', 'active')")
+    connection.execute('DELETE FROM tender WHERE id = ?', (tender_id,))
+    connection.commit()
+    connection.close()
+
+    with app.app_context():
+        assert not search_ids('医疗设备')
+        assert not search_ids('档案数字化')
+        search_service.backend.install()
+        assert search_ids('档案数字化') == like_ids('档案数字化')
+        assert search_ids('档案数字化')
+
+
+def test_relevance_and_estimate():
+    """按相关度排序时标题命中排在只有单位或摘要命中的前面；估计的匹配数不小于实际匹配数"""
+    reset_tenders()
+    with app.app_context():
+        rows = [
+            Tender(title='办公用品采购项目', organization='某某市医疗设备管理中心', publish_date=date(2026, 1, 3)),
+            Tender(title='医疗设备采购项目', organization='某某医院', publish_date=date(2026, 1, 1)),
+            Tender(title='食堂服务项目', summary='含少量医疗设备维护', publish_date=date(2026, 1, 2)),
+            Tender(title='道路维修工程', organization='某某区交通局', publish_date=date(2026, 1, 4)),
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+
+        ranked = [tender.title for tender in search_service.apply(Tender.query, '医疗设备', sort='relevance')]
+        assert ranked[0] == '医疗设备采购项目', ranked
+        assert set(ranked) == {'医疗设备采购项目', '办公用品采购项目', '食堂服务项目'}
+        assert {t.id for t in search_service.apply(Tender.query, '医疗设备', sort='relevance')} == like_ids('医疗设备')
+
+        for keywords in ('医疗设备', '采购', '道路维修', '医疗设备 采购'):
+            estimate = search_service.estimate(keywords)
+            assert estimate is not None and estimate >= len(like_ids(keywords)), keywords
+        assert search_service.estimate('档案数字化') == 0
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')
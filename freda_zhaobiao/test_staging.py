@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+暂存合并回归测试：水位线抢占、其他进程已推进水位线时放弃本批、写入失败的记录移到 tender_staging_error
+使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_staging.py 或 python test_staging.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.extensions import db
+from app.models import Tender, TenderStaging, TenderStagingError, MergeWatermark
+from app.services.ingest_service import ingest_service
+from app.services.staging_service import staging_service
+from app.services.fingerprint_service import fingerprint_index
+from app.services.near_duplicate_service import near_duplicate_index
+from sqlalchemy import update
+
+
+def reset_database():
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        fingerprint_index.load()
+        near_duplicate_index.load()
+
+
+def items(start, count, title='道路维修工程第{}标段'):
+    return [
+        {'title': title.format(n), 'organization': '某某区交通局', 'publish_date': '2026-03-01',
+         'source_url': f'http://a.gov.cn/{n}', 'source_website': 'A'}
+        for n in range(start, start + count)
+    ]
+
+
+def watermark():
+    return db.session.get(MergeWatermark, staging_service.WATERMARK)
+
+
+def test_watermark_claim():
+    """每批推进水位线并删除已合并的暂存记录；水位线之前才提交的记录由 merge_late 补上"""
+    reset_database()
+    batch_size = staging_service.batch_size
+    staging_service.batch_size = 3
+    try:
+        with app.app_context():
+            assert staging_service.append(items(0, 5), default_category='工程') == 5
+            first_ids = [row.id for row in TenderStaging.query.order_by(TenderStaging.id)]
+
+            stats = staging_service.merge_once()
+            assert stats['rows'] == 3 and stats['added'] == 3, stats
+            assert stats['last_id'] == first_ids[2]
+            assert watermark().last_id == first_ids[2] and watermark().merged_total == 3
+            assert staging_service.pending() == 2
+
+            stats = staging_service.merge_once()
+            assert stats['rows'] == 2 and stats['last_id'] == first_ids[4], stats
+            assert staging_service.merge_once() is None
+            assert staging_service.pending() == 0
+            assert Tender.query.count() == 5
+            assert {t.category for t in Tender.query} == {'工程'}
+
+            # 序列号先分配、后提交的记录 id 小于水位线
+            db.session.add(TenderStaging(id=first_ids[1], payload=json.dumps(items(5, 1)[0], ensure_ascii=False)))
+            db.session.commit()
+            assert staging_service.merge_once() is None
+            assert staging_service.merge_all() == 1
+            assert staging_service.pending() == 0
+            assert Tender.query.count() == 6
+            assert watermark().last_id == first_ids[4]
+    finally:
+        staging_service.batch_size = batch_size
+
+
+def test_watermark_conflict():
+    """读取水位线之后其他进程已经合并了这一批：条件更新落空，放弃本批且不写入"""
+    reset_database()
+    watermark_of = staging_service._watermark
+    def advanced_elsewhere():
+        last_id = watermark_of()
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(MergeWatermark)
+                .where(MergeWatermark.name == staging_service.WATERMARK)
+                .values(last_id=MergeWatermark.last_id + 2)
+            )
+        return last_id
+
+    with app.app_context():
+        staging_service.append(items(0, 2))
+        conflicts = staging_service.conflicts
+        staging_service._watermark = advanced_elsewhere
+        try:
+            assert staging_service.merge_once() == {'conflict': True}
+        finally:
+            del staging_service._watermark
+        assert staging_service.conflicts == conflicts + 1
+        assert Tender.query.count() == 0
+        assert staging_service.pending() == 2
+
+        # 水位线已越过这两条，由 merge_late 合并
+        assert staging_service.merge_once() is None
+        assert staging_service.merge_all() == 1
+        assert Tender.query.count() == 2
+
+
+def test_failed_rows_moved():
+    """写入失败的批次逐条重试，仍然失败的记录移到 tender_staging_error，其余记录照常合并"""
+    reset_database()
+    ingest_batch = ingest_service.ingest_batch
+    def reject_bad(rows):
+        if any(row['title'].startswith('坏') for row in rows):
+            raise ValueError('无法写入的记录')
+        return ingest_batch(rows)
+
+    with app.app_context():
+        staging_service.append(items(0, 2) + items(0, 1, title='坏数据{}') + items(2, 1))
+        bad_id = TenderStaging.query.order_by(TenderStaging.id).all()[2].id
+        failed = staging_service.failed
+        ingest_service.ingest_batch = reject_bad
+        try:
+            stats = staging_service.merge_once()
+        finally:
+            del ingest_service.ingest_batch
+        assert stats['added'] == 3 and stats['failed'] == 1, stats
+        assert staging_service.failed == failed + 1
+        assert staging_service.pending() == 0
+        assert Tender.query.count() == 3
+
+        error = TenderStagingError.query.one()
+        assert error.staging_id == bad_id
+        assert json.loads(error.payload)['title'] == '坏数据0'
+        assert '无法写入的记录' in error.error
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')
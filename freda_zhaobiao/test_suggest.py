@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+搜索建议回归测试：入库后前缀索引按 id 增量加载新记录，搜索历史够次数后才作为建议
+使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_suggest.py 或 python test_suggest.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.extensions import db
+from app.models import Tender, SearchHistory, User
+from app.services.ingest_service import ingest_service
+from app.services.suggest_service import suggest_service
+from app.services.fingerprint_service import fingerprint_index
+from app.services.near_duplicate_service import near_duplicate_index
+
+
+def reset_database():
+    """清空所有表，写入两条招标信息后全量构建索引"""
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.add_all([
+            Tender(title='道路维修工程', publish_date=date(2026, 1, 5), organization='某某区交通局'),
+            Tender(title='道路绿化养护项目', publish_date=date(2026, 1, 6), organization='某某区交通局'),
+        ])
+        db.session.commit()
+        fingerprint_index.load()
+        near_duplicate_index.load()
+        suggest_service.load()
+
+
+def texts(prefix):
+    with app.app_context():
+        return [item['text'] for item in suggest_service.suggest(prefix)]
+
+
+def test_catch_up_after_ingest():
+    """本进程入库后代数变化，下一次查询前增量加载新记录，不重新全量构建"""
+    reset_database()
+    catch_up_interval = suggest_service.catch_up_interval
+    suggest_service.catch_up_interval = 3600
+    try:
+        loads = suggest_service.loads
+        assert texts('道路') == ['道路维修工程', '道路绿化养护项目']
+        assert texts('某某区') == ['某某区交通局']
+
+        with app.app_context():
+            result = ingest_service.ingest([
+                {'title': '道路照明设施改造工程', 'organization': '某某区城管局', 'publish_date': '2026-02-01',
+                 'source_url': 'http://a.gov.cn/1', 'source_website': 'A'},
+                {'title': '学校食堂食材配送服务', 'organization': '某某区交通局', 'publish_date': '2026-02-02',
+                 'source_url': 'http://a.gov.cn/2', 'source_website': 'A'},
+            ])
+            assert result['added'] == 2, result
+
+        added = suggest_service.added
+        assert '道路照明设施改造工程' in texts('道路')
+        assert suggest_service.added == added + 2
+        assert suggest_service.loads == loads
+
+        # 已有的词累加权重：交通局出现了 3 次，排在城管局前面
+        with app.app_context():
+            suggestions = suggest_service.suggest('某某区')
+        assert [item['text'] for item in suggestions] == ['某某区交通局', '某某区城管局']
+        assert suggestions[0]['weight'] == 3 and suggestions[0]['type'] == 'organization'
+
+        # 没有新的入库时不再增量加载
+        texts('道路')
+        assert suggest_service.added == added + 2
+    finally:
+        suggest_service.catch_up_interval = catch_up_interval
+
+
+def test_history_catch_up():
+    """其他进程写入的记录和搜索历史按 catch_up_interval 增量加载，关键词搜索够次数后才出现"""
+    reset_database()
+    catch_up_interval = suggest_service.catch_up_interval
+    suggest_service.catch_up_interval = 0
+    try:
+        with app.app_context():
+            user = User(username='tester', email='tester@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            db.session.add(SearchHistory(user_id=user.id, keywords='道路 维修'))
+            with db.engine.begin() as connection:
+                connection.execute(Tender.__table__.insert().values(title='道路清扫保洁服务',
+                                                                    publish_date=date(2026, 2, 3)))
+            db.session.commit()
+
+        assert '道路清扫保洁服务' in texts('道路')
+        assert '道路 维修' not in texts('道路')
+
+        with app.app_context():
+            db.session.add(SearchHistory(user_id=User.query.one().id, keywords=' 道路 维修 '))
+            db.session.commit()
+        with app.app_context():
+            suggestions = suggest_service.suggest('道路')
+        assert suggestions[0]['text'] == '道路 维修' and suggestions[0]['type'] == 'keyword'
+        assert suggestions[0]['weight'] == 2 * suggest_service.history_weight
+    finally:
+        suggest_service.catch_up_interval = catch_up_interval
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+爬虫任务执行器回归测试：同一站点的并发上限、两个执行单元之间取消任务
+爬取用替身代替（不访问网络），使用临时目录中的 SQLite 数据库，不影响 data/tender.db
+运行: python -m pytest test_task_executor.py 或 python test_task_executor.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix='zhaobiao-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+from app import app
+from app.extensions import db
+from app.models import CrawlerTask, CrawlHistory
+from app.services.crawler_service import CrawlerService
+from app.services.task_executor import CrawlTaskExecutor
+
+
+class FakeCrawl:
+    """代替 CrawlerService.crawl_website：记录每个站点同时执行的单元数，gates 中的关键词等到放行才返回"""
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.gates = {}
+        self.started = defaultdict(threading.Event)
+        self.calls = []
+        self.active = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.peak_total = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, website, keyword, category=None, region=None):
+        host = urlparse(website).netloc
+        with self._lock:
+            self.calls.append(keyword)
+            self.active[host] += 1
+            self.peak[host] = max(self.peak[host], self.active[host])
+            self.peak_total = max(self.peak_total, sum(self.active.values()))
+        self.started[keyword].set()
+        try:
+            gate = self.gates.get(keyword)
+            if gate is not None:
+                assert gate.wait(10), keyword
+            else:
+                time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.active[host] -= 1
+        return {'added': 1}
+
+
+def reset_tasks(*tasks):
+    """清空所有表，写入状态为 running 的任务（与启动任务的接口一致），返回任务 id"""
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        rows = [CrawlerTask(name=f'任务{n}', website=website, keywords=keywords, status='running')
+                for n, (website, keywords) in enumerate(tasks)]
+        db.session.add_all(rows)
+        db.session.commit()
+        return [row.id for row in rows]
+
+
+def new_executor(max_workers, per_host_limit):
+    executor = CrawlTaskExecutor()
+    executor.init_app(app)
+    executor.max_workers = max_workers
+    executor.per_host_limit = per_host_limit
+    return executor
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, '等待超时'
+        time.sleep(0.01)
+
+
+def run_with(fake, body):
+    crawl_website = CrawlerService.crawl_website
+    CrawlerService.crawl_website = lambda service, *args: fake(*args)
+    try:
+        body()
+    finally:
+        CrawlerService.crawl_website = crawl_website
+
+
+def test_submit_requires_app():
+    """未绑定应用的执行器拒绝提交任务"""
+    task_id, = reset_tasks(('http://a.gov.cn/list', '维修'))
+    with app.app_context():
+        try:
+            CrawlTaskExecutor().submit(db.session.get(CrawlerTask, task_id))
+        except RuntimeError as e:
+            assert 'init_app' in str(e)
+        else:
+            assert False, '应当抛出 RuntimeError'
+
+
+def test_per_host_limit():
+    """同一站点同时只执行 per_host_limit 个单元，不同站点并行；每个任务写一条执行记录"""
+    task_ids = reset_tasks(
+        ('http://a.gov.cn/list', 'a1,a2,a3'),
+        ('http://a.gov.cn/news', 'a4，a5'),
+        ('http://b.gov.cn/list', 'b1;b2;b3'),
+    )
+    fake = FakeCrawl()
+    executor = new_executor(max_workers=4, per_host_limit=1)
+
+    def body():
+        with app.app_context():
+            for task_id in task_ids:
+                assert executor.submit(db.session.get(CrawlerTask, task_id))
+            assert not executor.submit(db.session.get(CrawlerTask, task_ids[0]))
+        wait_until(lambda: not any(executor.is_running(task_id) for task_id in task_ids))
+    run_with(fake, body)
+
+    assert sorted(fake.calls) == ['a1', 'a2', 'a3', 'a4', 'a5', 'b1', 'b2', 'b3']
+    assert fake.peak['a.gov.cn'] == 1 and fake.peak['b.gov.cn'] == 1
+    assert fake.peak_total == 2
+    with app.app_context():
+        wait_until(lambda: executor.stats()['completed_tasks'] == 3)
+        assert [t.total_crawled for t in CrawlerTask.query.order_by(CrawlerTask.id)] == [3, 2, 3]
+        assert {t.status for t in CrawlerTask.query} == {'active'}
+        assert [h.status for h in CrawlHistory.query] == ['completed'] * 3
+
+
+def test_cancel_between_units():
+    """任务在两个单元之间（等待站点空出）取消时立即结束，只保留已执行单元的结果"""
+    first_id, second_id = reset_tasks(
+        ('http://a.gov.cn/list', 'k1,k2,k3'),
+        ('http://a.gov.cn/news', 'other'),
+    )
+    fake = FakeCrawl()
+    fake.gates = {'k1': threading.Event(), 'k2': threading.Event(), 'other': threading.Event()}
+    executor = new_executor(max_workers=2, per_host_limit=1)
+
+    def body():
+        with app.app_context():
+            executor.submit(db.session.get(CrawlerTask, first_id))
+            assert fake.started['k1'].wait(10)
+            executor.submit(db.session.get(CrawlerTask, second_id))
+            fake.gates['k1'].set()
+            assert fake.started['k2'].wait(10)
+            # k2 结束后轮转到等待中的第二个任务，第一个任务等站点空出
+            fake.gates['k2'].set()
+            assert fake.started['other'].wait(10)
+            wait_until(lambda: executor.stats()['active_units'] == 1)
+
+            assert executor.cancel(first_id)
+            assert not executor.is_running(first_id)
+            task = db.session.get(CrawlerTask, first_id)
+            history = CrawlHistory.query.filter_by(task_id=first_id).one()
+            assert task.status == 'stopped' and task.total_crawled == 2
+            assert history.status == 'completed' and history.items_added == 2
+
+            fake.gates['other'].set()
+            wait_until(lambda: not executor.is_running(second_id))
+    run_with(fake, body)
+
+    assert fake.calls == ['k1', 'k2', 'other']
+    assert fake.peak['a.gov.cn'] == 1
+    with app.app_context():
+        wait_until(lambda: executor.stats()['completed_tasks'] == 2)
+        assert db.session.get(CrawlerTask, second_id).status == 'active'
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'{name}: 通过')